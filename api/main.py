@@ -1,18 +1,96 @@
-from fastapi import FastAPI
+import json, logging, time
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Callable, List
+from fastapi import FastAPI, HTTPException, Request
+from fastapi.responses import JSONResponse, PlainTextResponse, StreamingResponse
 from pydantic import BaseModel
-from rag.answer import answer
-from recommender.engine import pick_electives
+from rag.answer import answer, answer_batch
+from rag.retrieve import get_retriever
+from recommender.compare import PROGRAMS as COMPARE_PROGRAMS, compare_programs
+from recommender.engine import pick_electives, plan_electives
 from recommender.rules import Profile
+from utils import env
+from workers import BoundedExecutor, Overloaded
+from warmup import PROGRAMS, warm as warm_all
+import metrics
 
-app = FastAPI(title="ITMO Masters Advisor API")
+log = logging.getLogger("api")
+
+# Retrieval and embedding inference run here, not on the event loop or Starlette's shared threadpool
+executor = BoundedExecutor(
+    max_workers=int(env("API_THREADS", "4")),
+    max_queue=int(env("API_QUEUE", "64")),
+    name="api",
+)
+
+# Plain JSON batches are answered in one piece; larger ones must be streamed as NDJSON
+BATCH_MAX = int(env("API_BATCH_MAX", "64"))
+STREAM_MAX = int(env("API_STREAM_MAX", "1024"))
+STREAM_CHUNK = int(env("API_STREAM_CHUNK", "32"))
+NDJSON = "application/x-ndjson"
+
+metrics.register(lambda: [(f"api_executor_{k}", "counter" if k in ("completed", "rejected") else "gauge", {}, v)
+                          for k, v in executor.stats().items()])
+
+# Readiness as reported by /healthz; filled in by warm()
+state = {"ready": False, "warmup": {}, "errors": {}}
+
+def warm() -> None:
+    # Pay every lazy load before the first request: embedding model, indexes, plans
+    timings, errors = warm_all(PROGRAMS)
+    state["warmup"].update(timings)
+    state["errors"].update(errors)
+    state["ready"] = not state["errors"]
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Uvicorn starts accepting connections only after this returns
+    await executor.run(warm)
+    yield
+
+app = FastAPI(title="ITMO Masters Advisor API", lifespan=lifespan)
+
+@app.middleware("http")
+async def observe(request: Request, call_next):
+    if not metrics.enabled:
+        return await call_next(request)
+    t0 = time.perf_counter()
+    status = 500
+    try:
+        response = await call_next(request)
+        status = response.status_code
+        return response
+    finally:
+        # Route templates, not raw paths, keep label cardinality bounded
+        route = request.scope.get("route")
+        path = getattr(route, "path", "unmatched")
+        metrics.inc("http_requests_total", method=request.method, path=path, status=status)
+        metrics.observe("http_request_seconds", time.perf_counter() - t0, path=path)
+
+@app.get("/metrics")
+async def metrics_endpoint():
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4")
+
+@app.exception_handler(Overloaded)
+async def overloaded(request: Request, exc: Overloaded):
+    return JSONResponse({"detail": "overloaded, retry later"}, status_code=503, headers={"Retry-After": "1"})
+
+async def run(fn, *args):
+    # Shed instead of queueing without bound when the pool and its queue are full
+    return await executor.run(fn, *args, block=False)
+
+@app.get("/healthz")
+async def healthz():
+    body = {**state, "version": get_retriever().snapshot().version if state["ready"] else None, "executor": executor.stats()}
+    return JSONResponse(body, status_code=200 if state["ready"] else 503)
 
 class Ask(BaseModel):
     query: str
     program: str | None = None
 
 @app.post("/ask")
-def ask(a: Ask):
-    return answer(a.query, a.program)
+async def ask(a: Ask):
+    return await run(answer, a.query, a.program)
 
 class RecReq(BaseModel):
     background: list[str]
@@ -21,11 +99,85 @@ class RecReq(BaseModel):
     workload: str
     program: str
 
+def _profile(r: RecReq) -> Profile:
+    return Profile(r.background, r.level, r.interests, r.workload)
+
 @app.post("/recommend")
-def recommend(r: RecReq):
-    prof = Profile(r.background, r.level, r.interests, r.workload)
-    return pick_electives(prof, r.program)
+async def recommend(r: RecReq):
+    return await run(pick_electives, _profile(r), r.program)
+
+@app.post("/recommend/plan")
+async def recommend_plan(r: RecReq):
+    return await run(plan_electives, _profile(r), r.program)
+
+@app.get("/compare")
+async def compare(a: str = COMPARE_PROGRAMS[0], b: str = COMPARE_PROGRAMS[1]):
+    # Names end up in plan file paths: only known programs get that far
+    unknown = [p for p in (a, b) if p not in COMPARE_PROGRAMS]
+    if unknown:
+        raise HTTPException(status_code=404, detail=f"unknown program {unknown[0]!r}")
+    # Materialized once per plan version; repeat calls are a dict lookup
+    try:
+        return (await run(compare_programs, a, b)).data
+    except FileNotFoundError:
+        raise HTTPException(status_code=404, detail=f"unknown program {a!r} or {b!r}")
+
+def _wants_stream(request: Request, stream: bool) -> bool:
+    return stream or NDJSON in request.headers.get("accept", "")
+
+def _check_size(n: int, streaming: bool) -> None:
+    limit = STREAM_MAX if streaming else BATCH_MAX
+    if n > limit:
+        hint = "" if streaming else f"; use ?stream=true for up to {STREAM_MAX}"
+        raise HTTPException(status_code=413, detail=f"batch of {n} exceeds the limit of {limit}{hint}")
+
+def _ndjson(n: int, work: Callable[[int, int], List[dict]]) -> StreamingResponse:
+    # Work is done chunk by chunk so the first lines go out before the batch is finished.
+    # Admission is decided up front; once streaming, chunks wait for a worker instead of failing.
+    if executor.saturated():
+        raise Overloaded("executor saturated")
+    async def lines() -> AsyncIterator[str]:
+        for start in range(0, n, STREAM_CHUNK):
+            chunk = await executor.run(work, start, min(n, start + STREAM_CHUNK))
+            for i, res in enumerate(chunk, start=start):
+                yield json.dumps({"index": i, **res}, ensure_ascii=False) + "\n"
+    return StreamingResponse(lines(), media_type=NDJSON)
+
+class AskBatch(BaseModel):
+    items: list[Ask]
+
+@app.post("/ask/batch")
+async def ask_batch(b: AskBatch, request: Request, stream: bool = False):
+    streaming = _wants_stream(request, stream)
+    _check_size(len(b.items), streaming)
+    pairs = [(a.query, a.program) for a in b.items]
+    if streaming:
+        return _ndjson(len(pairs), lambda s, e: answer_batch(pairs[s:e]))
+    return await run(answer_batch, pairs)
+
+class RecBatch(BaseModel):
+    items: list[RecReq]
+
+def _recommend_many(items: List[RecReq]) -> List[dict]:
+    out = []
+    for r in items:
+        try:
+            out.append(pick_electives(_profile(r), r.program))
+        except FileNotFoundError:
+            out.append({"error": f"unknown program {r.program!r}"})
+    return out
+
+@app.post("/recommend/batch")
+async def recommend_batch(b: RecBatch, request: Request, stream: bool = False):
+    streaming = _wants_stream(request, stream)
+    _check_size(len(b.items), streaming)
+    if streaming:
+        return _ndjson(len(b.items), lambda s, e: _recommend_many(b.items[s:e]))
+    return await run(_recommend_many, b.items)
 
 if __name__ == "__main__":
     import uvicorn
-    uvicorn.run(app, host="0.0.0.0", port=8000)
+    # Each worker process warms up on its own; BM25 arrays are memory-mapped, so the
+    # index pages are shared between workers rather than copied into each one
+    uvicorn.run("api.main:app", host=env("API_HOST", "0.0.0.0"), port=int(env("API_PORT", "8000")),
+                workers=int(env("API_WORKERS", "1")))
@@ -0,0 +1,194 @@
+"""Offline bot load test against a local Telegram Bot API stand-in.
+
+    EMBEDDINGS_PROVIDER=mock python -m bench.bot [--mode webhook|polling] [--updates 2000] [--concurrency 64] [--out FILE]
+
+``FakeTelegram`` answers the Bot API methods the bot uses (getMe,
+sendMessage, getUpdates, setWebhook, ...) and records every reply. The
+replay runs the real dispatcher in-process against it: in webhook mode
+synthetic updates are POSTed to the webhook app by ``--concurrency``
+connections (like Telegram's max_connections), in polling mode they are
+handed out by getUpdates. Latency is from delivering an update to the
+bot's reply in that chat.
+"""
+import argparse, asyncio, itertools, json, logging, sys, time
+from pathlib import Path
+from typing import Dict, List, Optional
+from aiohttp import ClientSession, TCPConnector, web
+from bench.run import QUERIES, free_port, summarize
+
+TOKEN = "123456:BENCH"
+TEXTS = QUERIES + ["/plan", "/compare", "/electives", "/help", "погода в Питере?"]
+
+
+def synthetic_updates(n: int, users: Optional[int] = None) -> List[Dict]:
+    users = users or n
+    now = int(time.time())
+    out = []
+    for i, text in zip(range(n), itertools.cycle(TEXTS)):
+        uid = 10_000 + i % users
+        out.append({"update_id": i + 1, "message": {
+            "message_id": i + 1, "date": now, "text": text,
+            "chat": {"id": uid, "type": "private"},
+            "from": {"id": uid, "is_bot": False, "first_name": f"user{uid}"},
+        }})
+    return out
+
+
+class FakeTelegram:
+    """Just enough of the Bot API for the bot, with per-chat reply timestamps."""
+
+    def __init__(self):
+        self.updates: List[Dict] = []
+        self.offset = 0
+        self.delivered: Dict[int, List[float]] = {}  # chat id -> delivery times not yet answered
+        self.latencies: List[float] = []
+        self.sent = 0
+        self.calls: Dict[str, int] = {}
+        self._new = asyncio.Event()
+        self._runner: Optional[web.AppRunner] = None
+        self.url = ""
+
+    async def start(self, port: int = 0) -> "FakeTelegram":
+        app = web.Application()
+        app.router.add_route("*", "/bot{token}/{method}", self._call)
+        self._runner = web.AppRunner(app)
+        await self._runner.setup()
+        port = port or free_port()
+        await web.TCPSite(self._runner, "127.0.0.1", port).start()
+        self.url = f"http://127.0.0.1:{port}"
+        return self
+
+    async def stop(self) -> None:
+        if self._runner is not None:
+            await self._runner.cleanup()
+
+    def push(self, updates: List[Dict]) -> None:
+        self.updates.extend(updates)
+        self._new.set()
+
+    def mark_delivered(self, update: Dict) -> None:
+        chat = update["message"]["chat"]["id"]
+        self.delivered.setdefault(chat, []).append(time.perf_counter())
+
+    async def _call(self, request: web.Request) -> web.Response:
+        method = request.match_info["method"]
+        self.calls[method] = self.calls.get(method, 0) + 1
+        if request.content_type == "application/json":
+            params = await request.json()
+        else:
+            params = dict(await request.post())
+        handler = getattr(self, f"_m_{method}", None)
+        result = await handler(params) if handler else True
+        return web.json_response({"ok": True, "result": result})
+
+    async def _m_getMe(self, params) -> Dict:
+        return {"id": 1, "is_bot": True, "first_name": "Bench", "username": "bench_bot"}
+
+    async def _m_sendMessage(self, params) -> Dict:
+        chat = int(params["chat_id"])
+        self.sent += 1
+        pending = self.delivered.get(chat)
+        if pending:
+            self.latencies.append(time.perf_counter() - pending.pop(0))
+        return {"message_id": self.sent, "date": int(time.time()), "text": params.get("text", ""),
+                "chat": {"id": chat, "type": "private"}}
+
+    async def _m_getUpdates(self, params) -> List[Dict]:
+        offset = int(params.get("offset") or 0)
+        limit = int(params.get("limit") or 100)
+        timeout = float(params.get("timeout") or 0)
+        if offset:
+            self.offset = max(self.offset, offset)
+        batch = [u for u in self.updates if u["update_id"] >= self.offset][:limit]
+        if not batch and timeout:
+            self._new.clear()
+            try:
+                await asyncio.wait_for(self._new.wait(), timeout)
+            except asyncio.TimeoutError:
+                return []
+            batch = [u for u in self.updates if u["update_id"] >= self.offset][:limit]
+        for u in batch:
+            self.mark_delivered(u)
+        # Unlike Telegram, hand every update out once, so latencies are not counted twice
+        self.offset = max([self.offset] + [u["update_id"] + 1 for u in batch])
+        return batch
+
+
+async def _wait_replies(fake: FakeTelegram, n: int, timeout: float) -> None:
+    deadline = time.perf_counter() + timeout
+    while len(fake.latencies) < n and time.perf_counter() < deadline:
+        await asyncio.sleep(0.01)
+
+
+async def replay(mode: str, n: int, concurrency: int, users: Optional[int] = None, timeout: float = 120.0) -> Dict:
+    fake = await FakeTelegram().start()
+    from bot.main import dp, make_bot
+    bot = make_bot(TOKEN, api=fake.url)
+    updates = synthetic_updates(n, users)
+    status: Dict[str, int] = {}
+    start = time.perf_counter()
+    try:
+        if mode == "webhook":
+            from bot.webhook import PATH, build_app
+            runner = web.AppRunner(build_app(dp, bot, limit=concurrency))
+            await runner.setup()
+            port = free_port()
+            await web.TCPSite(runner, "127.0.0.1", port).start()
+            queue = iter(updates)
+            start = time.perf_counter()
+            async with ClientSession(connector=TCPConnector(limit=concurrency)) as client:
+                async def connection():
+                    for update in queue:
+                        fake.mark_delivered(update)
+                        while True:
+                            async with client.post(f"http://127.0.0.1:{port}{PATH}", json=update) as r:
+                                status[str(r.status)] = status.get(str(r.status), 0) + 1
+                            if r.status != 503:
+                                break
+                            # Shed by the backlog limit; Telegram would redeliver later too
+                            await asyncio.sleep(0.05)
+                await asyncio.gather(*(connection() for _ in range(concurrency)))
+            await _wait_replies(fake, n, timeout)
+            elapsed = time.perf_counter() - start
+            await runner.cleanup()
+        else:
+            fake.push(updates)
+            start = time.perf_counter()
+            polling = asyncio.create_task(dp.start_polling(bot, handle_signals=False, polling_timeout=1))
+            await _wait_replies(fake, n, timeout)
+            elapsed = time.perf_counter() - start
+            await dp.stop_polling()
+            await polling
+            await bot.session.close()
+    finally:
+        await fake.stop()
+    res = summarize(fake.latencies, elapsed, mode=mode, updates=n, replies=len(fake.latencies),
+                    concurrency=concurrency, calls=fake.calls)
+    if status:
+        res["status"] = status
+    return res
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--mode", choices=["webhook", "polling"], default="webhook")
+    ap.add_argument("--updates", type=int, default=2000)
+    ap.add_argument("--concurrency", type=int, default=64, help="webhook connections / handler limit")
+    ap.add_argument("--users", type=int, default=None, help="distinct chats (default: one per update)")
+    ap.add_argument("--timeout", type=float, default=120.0)
+    ap.add_argument("--out", type=Path, default=None)
+    args = ap.parse_args(argv)
+    for name in ("aiogram", "aiohttp.access", "bot"):
+        logging.getLogger(name).setLevel(logging.WARNING)
+    result = asyncio.run(replay(args.mode, args.updates, args.concurrency, args.users, args.timeout))
+    text = json.dumps(result, ensure_ascii=False, indent=2)
+    if args.out:
+        args.out.parent.mkdir(parents=True, exist_ok=True)
+        args.out.write_text(text, encoding="utf-8")
+        print(f"[i] Wrote {args.out}", file=sys.stderr)
+    else:
+        print(text)
+
+
+if __name__ == "__main__":
+    main()
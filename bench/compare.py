@@ -0,0 +1,54 @@
+"""Diff two bench.run result files and flag regressions.
+
+    python -m bench.compare old.json new.json [--metric p95_ms] [--threshold 0.2]
+
+Exits with status 1 when any case got slower than ``threshold`` (relative).
+"""
+import argparse, json, sys
+from pathlib import Path
+from typing import Dict, Iterator, Tuple
+
+
+def cases(result: Dict) -> Iterator[Tuple[str, Dict]]:
+    for section in ("functions", "api"):
+        for name, stats in result.get(section, {}).items():
+            yield f"{section}:{name}", stats
+    for scale, stats in result.get("indexer", {}).items():
+        yield f"indexer:x{scale}", stats
+    for scale, backends in result.get("vectors", {}).items():
+        for backend, stats in backends.items():
+            yield f"vectors:x{scale}:{backend}", stats
+
+def compare(old: Dict, new: Dict, metric: str, threshold: float) -> Tuple[list, bool]:
+    before = dict(cases(old))
+    rows, regressed = [], False
+    for name, stats in cases(new):
+        key = "build_s" if name.startswith("indexer:") else metric
+        if name not in before or key not in stats or key not in before[name]:
+            continue
+        a, b = before[name][key], stats[key]
+        change = (b - a) / a if a else 0.0
+        # For throughput a drop is the regression; for latency/time it is a rise
+        bad = -change > threshold if key == "qps" else change > threshold
+        regressed |= bad
+        rows.append((name, key, a, b, change, bad))
+    return rows, regressed
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser()
+    ap.add_argument("old", type=Path)
+    ap.add_argument("new", type=Path)
+    ap.add_argument("--metric", default="p95_ms")
+    ap.add_argument("--threshold", type=float, default=0.2)
+    args = ap.parse_args(argv)
+    old = json.loads(args.old.read_text(encoding="utf-8"))
+    new = json.loads(args.new.read_text(encoding="utf-8"))
+    rows, regressed = compare(old, new, args.metric, args.threshold)
+    for name, key, a, b, change, bad in rows:
+        print(f"{'!!' if bad else '  '} {name:<28} {key:<8} {a:>10.3f} -> {b:>10.3f}  {change:+.0%}")
+    sys.exit(1 if regressed else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,60 @@
+"""Micro-benchmark: /recommend scoring before (read JSON + scan) and after (catalog postings).
+
+    python -m bench.recommend [--seconds 2]
+"""
+import argparse, itertools, json, time
+from recommender.engine import pick_electives
+from recommender.rules import KEYWORDS, Profile
+from scraper.store import NORM
+
+PROFILES = [
+    Profile(background=["math-strong", "coding-strong"], level="middle", interests=["nlp", "mlops"], workload="medium"),
+    Profile(background=["product"], level="junior", interests=["analytics", "recsys"], workload="low"),
+    Profile(background=["coding-strong"], level="senior", interests=["cv", "security"], workload="high"),
+]
+PROGRAMS = ["AI", "AI Product"]
+
+
+def legacy_pick_electives(profile: Profile, program: str):
+    # The pre-catalog implementation, kept verbatim for comparison
+    p = NORM / f"{program.replace(' ','_')}.json"
+    plan = json.loads(p.read_text(encoding="utf-8"))
+    electives = [c for c in plan["courses"] if c["type"] == "elective"]
+    def score_course(c):
+        name = c["name"].lower()
+        score = 0
+        for key in profile.background + profile.interests:
+            for kw in KEYWORDS.get(key, []):
+                if kw in name:
+                    score += 2
+        return score
+    scored = sorted([(score_course(c), c) for c in electives], key=lambda x: x[0], reverse=True)
+    return {
+        "primary": [c for s,c in scored if s>=2][:3],
+        "secondary": [c for s,c in scored if 1<=s<2][:3],
+        "stretch": [c for s,c in scored if s==0][:3],
+    }
+
+
+def rate(fn, seconds: float) -> float:
+    cases = itertools.cycle(itertools.product(PROFILES, PROGRAMS))
+    n, start = 0, time.perf_counter()
+    while time.perf_counter() - start < seconds:
+        fn(*next(cases))
+        n += 1
+    return n / (time.perf_counter() - start)
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--seconds", type=float, default=2.0)
+    args = ap.parse_args()
+    for profile, program in itertools.product(PROFILES, PROGRAMS):
+        assert pick_electives(profile, program) == legacy_pick_electives(profile, program)
+    before = rate(legacy_pick_electives, args.seconds)
+    after = rate(pick_electives, args.seconds)
+    print(json.dumps({"before_rps": round(before), "after_rps": round(after), "speedup": round(after / before, 1)}))
+
+
+if __name__ == "__main__":
+    main()
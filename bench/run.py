@@ -0,0 +1,241 @@
+"""Latency/throughput benchmarks for the ask and recommend paths.
+
+    EMBEDDINGS_PROVIDER=mock python -m bench.run [--seconds 2] [--concurrency 8] [--scales 1,4,16] [--out FILE]
+
+Builds a throwaway index from data/normalized, then measures p50/p95/p99
+latency and QPS of retrieval, answering, recommendations, the FastAPI
+endpoints under concurrent load (in-process uvicorn, so client and server
+share the machine), indexer build time on synthetically scaled plans and
+the flat vs Chroma vector backends on the same scaled indexes.
+Results are one JSON document; diff two runs with ``python -m bench.compare``.
+"""
+import argparse, asyncio, contextlib, io, itertools, json, logging, os, platform, socket, subprocess, sys, tempfile, threading, time
+from pathlib import Path
+from typing import Callable, Dict, List, Sequence
+import numpy as np
+
+BASE = Path(__file__).resolve().parent.parent
+NORM = BASE / "data" / "normalized"
+PLAN_FILES = ["AI.json", "AI_Product.json"]
+QUERIES = [
+    "какие выборные курсы есть по машинному обучению",
+    "сколько ECTS в первом семестре",
+    "чем отличается программа",
+    "план обучения по семестрам",
+    "дисциплины по обработке естественного языка",
+    "курс компьютерное зрение модуль",
+]
+PROFILES = [
+    {"background": ["math-strong", "coding-strong"], "level": "middle", "interests": ["nlp", "mlops"], "workload": "medium"},
+    {"background": ["product"], "level": "junior", "interests": ["analytics", "recsys"], "workload": "low"},
+    {"background": ["coding-strong"], "level": "senior", "interests": ["cv", "security"], "workload": "high"},
+]
+PROGRAMS = ["AI", "AI Product"]
+
+
+def summarize(latencies: Sequence[float], elapsed: float, **extra) -> Dict:
+    ms = np.asarray(latencies, dtype=np.float64) * 1000
+    if not len(ms):
+        return {"n": 0, **extra}
+    p50, p95, p99 = np.percentile(ms, [50, 95, 99]).tolist()
+    return {"n": len(ms), "qps": round(len(ms) / elapsed, 1), "mean_ms": round(float(ms.mean()), 3),
+            "p50_ms": round(p50, 3), "p95_ms": round(p95, 3), "p99_ms": round(p99, 3), **extra}
+
+def measure(fn: Callable, cases: Sequence[tuple], seconds: float, warmup: int = 3) -> Dict:
+    cycle = itertools.cycle(cases)
+    for _ in range(warmup):
+        fn(*next(cycle))
+    lat: List[float] = []
+    start = time.perf_counter()
+    while time.perf_counter() - start < seconds:
+        args = next(cycle)
+        t0 = time.perf_counter()
+        fn(*args)
+        lat.append(time.perf_counter() - t0)
+    return summarize(lat, time.perf_counter() - start)
+
+
+def scaled_plans(dest: Path, scale: int) -> None:
+    # Copies of every course with distinct refs/names, so the corpus grows ``scale`` times
+    dest.mkdir(parents=True, exist_ok=True)
+    for name in PLAN_FILES:
+        plan = json.loads((NORM / name).read_text(encoding="utf-8"))
+        base = plan["courses"]
+        plan["courses"] = [
+            dict(c, name=c["name"] if k == 0 else f"{c['name']} {k}", source_ref=f"{c['source_ref']}#{k}")
+            for k in range(scale) for c in base
+        ]
+        (dest / name).write_text(json.dumps(plan, ensure_ascii=False), encoding="utf-8")
+
+def build_index(norm: Path, idx: Path) -> float:
+    from rag import indexer
+    idx.mkdir(parents=True, exist_ok=True)
+    saved = indexer.NORM, indexer.IDX, indexer.DB
+    indexer.NORM, indexer.IDX, indexer.DB = norm, idx, norm / "plans.sqlite"
+    try:
+        t0 = time.perf_counter()
+        with contextlib.redirect_stdout(io.StringIO()):
+            indexer.build(full=True)
+        return time.perf_counter() - t0
+    finally:
+        indexer.NORM, indexer.IDX, indexer.DB = saved
+
+
+def bench_functions(retriever, seconds: float) -> Dict:
+    from rag.answer import answer, cache
+    from recommender.engine import pick_electives, plan_electives
+    from recommender.rules import Profile
+    queries = [(q,) for q in QUERIES]
+    def answer_cold(q, program):
+        cache.clear()
+        return answer(q, program, retriever=retriever)
+    asks = [(q, p) for q in QUERIES for p in (None, "AI")]
+    recs = [(Profile(**p), prog) for p in PROFILES for prog in PROGRAMS]
+    return {
+        "bm25_search": measure(lambda q: retriever.bm25_search(q, 8), queries, seconds),
+        "vector_search": measure(lambda q: retriever.vector_search(q, 8), queries, seconds),
+        "hybrid": measure(lambda q: retriever.hybrid(q, 6), queries, seconds),
+        "answer": measure(lambda q, p: answer(q, p, retriever=retriever), asks, seconds),
+        "answer_uncached": measure(answer_cold, asks, seconds),
+        "pick_electives": measure(pick_electives, recs, seconds),
+        "plan_electives": measure(plan_electives, recs, seconds),
+    }
+
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+async def _load(url: str, bodies: List[Dict], seconds: float, concurrency: int) -> Dict:
+    import httpx
+    lat: List[float] = []
+    status: Dict[str, int] = {}
+    deadline = time.perf_counter() + seconds
+    async with httpx.AsyncClient(timeout=30, limits=httpx.Limits(max_connections=concurrency)) as client:
+        async def user(offset: int):
+            for body in itertools.islice(itertools.cycle(bodies), offset, None):
+                if time.perf_counter() >= deadline:
+                    return
+                t0 = time.perf_counter()
+                r = await client.post(url, json=body)
+                lat.append(time.perf_counter() - t0)
+                status[str(r.status_code)] = status.get(str(r.status_code), 0) + 1
+        start = time.perf_counter()
+        await asyncio.gather(*(user(i) for i in range(concurrency)))
+    return summarize(lat, time.perf_counter() - start, concurrency=concurrency, status=status)
+
+def bench_api(seconds: float, concurrency: int) -> Dict:
+    import uvicorn
+    from api.main import app
+    port = free_port()
+    server = uvicorn.Server(uvicorn.Config(app, host="127.0.0.1", port=port, log_level="warning"))
+    thread = threading.Thread(target=server.run, daemon=True)
+    thread.start()
+    while not server.started:
+        time.sleep(0.05)
+    base = f"http://127.0.0.1:{port}"
+    recs = [dict(p, program=prog) for p in PROFILES for prog in PROGRAMS]
+    endpoints = {
+        "/ask": [{"query": q} for q in QUERIES],
+        "/recommend": recs,
+        "/recommend/plan": recs,
+        "/ask/batch": [{"items": [{"query": q} for q in QUERIES]}],
+    }
+    try:
+        return {path: asyncio.run(_load(base + path, bodies, seconds, concurrency)) for path, bodies in endpoints.items()}
+    finally:
+        server.should_exit = True
+        thread.join(10)
+
+
+def bench_indexer(scales: List[int], tmp: Path) -> Dict:
+    out = {}
+    for scale in scales:
+        norm = tmp / f"scale{scale}" / "normalized"
+        scaled_plans(norm, scale)
+        n = sum(len(json.loads((norm / f).read_text(encoding="utf-8"))["courses"]) for f in PLAN_FILES)
+        out[str(scale)] = {"chunks": n, "build_s": round(build_index(norm, tmp / f"scale{scale}" / "index"), 3)}
+    return out
+
+
+def bench_vectors(scales: List[int], tmp: Path, seconds: float) -> Dict:
+    from rag.retrieve import Retriever
+    out = {}
+    cases = [(q, p) for q in QUERIES for p in (None, "AI")]
+    for scale in scales:
+        norm, idx = tmp / f"scale{scale}" / "normalized", tmp / f"scale{scale}" / "index"
+        if not (idx / "VERSION").exists():
+            scaled_plans(norm, scale)
+            build_index(norm, idx)
+        row = {}
+        for backend in ("flat", "chroma"):
+            r = Retriever(idx_dir=idx, norm_dir=norm, backend=backend)
+            r.refresh()
+            row[backend] = measure(lambda q, p: r.vector_search(q, 8, p), cases, seconds)
+        out[str(scale)] = row
+    return out
+
+
+def meta() -> Dict:
+    from rag import embeddings
+    try:
+        rev = subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=BASE, capture_output=True, text=True).stdout.strip()
+    except OSError:
+        rev = ""
+    return {
+        "time": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+        "git": rev,
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpus": os.cpu_count(),
+        "embeddings_provider": os.getenv("EMBEDDINGS_PROVIDER", "local"),
+        "embeddings_model": embeddings.MODEL_NAME,
+    }
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--seconds", type=float, default=2.0, help="measuring time per case")
+    ap.add_argument("--concurrency", type=int, default=8)
+    ap.add_argument("--scales", default="1,4,16", help="corpus multipliers for the indexer benchmark")
+    ap.add_argument("--only", default="functions,api,indexer,vectors")
+    ap.add_argument("--out", type=Path, default=None, help="write JSON here instead of stdout")
+    args = ap.parse_args(argv)
+    only = set(args.only.split(","))
+    logging.getLogger("httpx").setLevel(logging.WARNING)
+
+    from rag import retrieve
+    result: Dict = {"meta": meta(), "params": {"seconds": args.seconds, "concurrency": args.concurrency}}
+    with tempfile.TemporaryDirectory() as tmp:
+        tmp = Path(tmp)
+        idx = tmp / "index"
+        result["params"]["index_build_s"] = round(build_index(NORM, idx), 3)
+        # Point the process-wide retriever (used by the API) at the throwaway index
+        retriever = retrieve._retriever = retrieve.Retriever(idx_dir=idx, norm_dir=NORM)
+        retriever.refresh()
+        if "functions" in only:
+            print("[i] functions", file=sys.stderr)
+            result["functions"] = bench_functions(retriever, args.seconds)
+        if "api" in only:
+            print("[i] api", file=sys.stderr)
+            result["api"] = bench_api(args.seconds, args.concurrency)
+        if "indexer" in only:
+            print("[i] indexer", file=sys.stderr)
+            result["indexer"] = bench_indexer([int(s) for s in args.scales.split(",")], tmp)
+        if "vectors" in only:
+            print("[i] vectors", file=sys.stderr)
+            result["vectors"] = bench_vectors([int(s) for s in args.scales.split(",")], tmp, args.seconds)
+        retrieve._retriever = None
+
+    text = json.dumps(result, ensure_ascii=False, indent=2)
+    if args.out:
+        args.out.parent.mkdir(parents=True, exist_ok=True)
+        args.out.write_text(text, encoding="utf-8")
+        print(f"[i] Wrote {args.out}", file=sys.stderr)
+    else:
+        print(text)
+
+
+if __name__ == "__main__":
+    main()
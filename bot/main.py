@@ -1,13 +1,22 @@
-import asyncio, os, json
+import asyncio, logging, os, json
+from typing import Optional
 from aiogram import Bot, Dispatcher, F
+from aiogram.client.default import DefaultBotProperties
+from aiogram.client.session.aiohttp import AiohttpSession
+from aiogram.client.telegram import TelegramAPIServer
 from aiogram.filters import Command
 from aiogram.types import Message, ReplyKeyboardMarkup, KeyboardButton
 from dotenv import load_dotenv
-from rag.answer import answer
-from recommender.engine import pick_electives
+from rag.answer import aanswer, PLAN_QUERY
+from recommender.compare import acompare_programs
+from recommender.engine import aplan_electives
 from recommender.rules import Profile
+from bot.middleware import UserConcurrencyMiddleware
+from warmup import warm
 
+log = logging.getLogger("bot")
 dp = Dispatcher()
+dp.message.outer_middleware(UserConcurrencyMiddleware(limit=int(os.getenv("BOT_USER_CONCURRENCY", "1"))))
 
 KB_MAIN = ReplyKeyboardMarkup(
     keyboard=[[KeyboardButton(text="/compare")],
@@ -29,38 +38,63 @@ async def help_cmd(m: Message):
 
 @dp.message(Command("compare"))
 async def compare(m: Message):
-    a1 = answer("чем отличается программа", program="AI")["text"]
-    a2 = answer("чем отличается программа", program="AI Product")["text"]
-    await m.answer("<b>AI</b>\n" + a1 + "\n\n<b>AI Product</b>\n" + a2)
+    await m.answer((await acompare_programs("AI", "AI Product")).text)
 
 @dp.message(Command("plan"))
 async def plan(m: Message):
-    txt = answer("план обучения по семестрам", program=None)["text"]
+    txt = (await aanswer(PLAN_QUERY, program=None))["text"]
     await m.answer(txt)
 
 @dp.message(Command("electives"))
 async def electives(m: Message):
     # simple interactive shortcut: assume some defaults
     profile = Profile(background=["product"], level="junior", interests=["analytics"], workload="medium")
-    rec = pick_electives(profile, "AI Product")
+    rec = await aplan_electives(profile, "AI Product")
     def fmt(lst):
-        return "\n".join([f"• {c['name']} (сем {c['semester']}, {c['ects']} ECTS) — {c['source_ref']}" for c in lst])
-    txt = "<b>Рекомендации выборных (AI Product)</b>\n"               "<i>primary</i>\n" + fmt(rec["primary"]) + "\n\n" +               "<i>secondary</i>\n" + fmt(rec["secondary"]) + "\n\n" +               "<i>stretch</i>\n" + fmt(rec["stretch"])
-    await m.answer(txt)
+        return "\n".join([f"• {c['name']} ({c['ects']} ECTS) — {c['source_ref']}" for c in lst])
+    parts = ["<b>План выборных (AI Product)</b>"]
+    for sem, s in rec["semesters"].items():
+        if s["courses"]:
+            parts.append(f"<i>семестр {sem}: {s['elective_ects']:g} ECTS выборных</i>\n" + fmt(s["courses"]))
+    parts.append(f"Итого выборных: {rec['elective_ects']:g} ECTS (минимум {rec['min_electives_ects']})")
+    if not rec["feasible"]:
+        parts.append("⚠️ " + "; ".join(rec["warnings"]))
+    await m.answer("\n\n".join(parts))
 
 @dp.message()
 async def generic(m: Message):
     q = m.text or ""
-    res = answer(q)
+    res = await aanswer(q, block=False)
     await m.answer(res["text"])
 
+def make_bot(token: str, api: Optional[str] = None) -> Bot:
+    # TELEGRAM_API_URL points the bot at a self-hosted Bot API server (or bench.bot's stand-in)
+    api = api or os.getenv("TELEGRAM_API_URL")
+    session = AiohttpSession(api=TelegramAPIServer.from_base(api)) if api else None
+    return Bot(token, session=session, default=DefaultBotProperties(parse_mode="HTML"))
+
 async def main():
     load_dotenv()
     token = os.getenv("TELEGRAM_TOKEN")
     if not token:
         raise RuntimeError("TELEGRAM_TOKEN is not set")
-    bot = Bot(token, parse_mode="HTML")
-    await dp.start_polling(bot)
+    # Start serving right away; the first handlers wait on the same lazy loads if they win the race
+    warming = asyncio.get_running_loop().run_in_executor(None, warm)
+    warming.add_done_callback(_warmed)
+    bot = make_bot(token)
+    if os.getenv("BOT_MODE", "polling") == "webhook":
+        from bot.webhook import serve
+        await serve(dp, bot)
+    else:
+        await bot.delete_webhook()
+        await dp.start_polling(bot)
+
+def _warmed(fut: asyncio.Future) -> None:
+    if fut.exception():
+        log.error("warm-up failed: %r", fut.exception())
+        return
+    timings, errors = fut.result()
+    log.info("warm-up done in %.2fs %s", sum(timings.values()), errors or "")
 
 if __name__ == "__main__":
     asyncio.run(main())
@@ -0,0 +1,67 @@
+import asyncio
+from typing import Any, Awaitable, Callable, Dict
+import structlog
+from aiogram import BaseMiddleware
+from aiogram.types import Message, TelegramObject
+from workers import Overloaded, get_executor
+import metrics
+
+log = structlog.get_logger("bot")
+
+BUSY_TEXT = "⏳ Ещё обрабатываю ваш предыдущий запрос, подождите немного."
+OVERLOADED_TEXT = "Сейчас много запросов, попробуйте, пожалуйста, через минуту."
+
+
+class UserConcurrencyMiddleware(BaseMiddleware):
+    """Caps in-flight updates per user so one chat cannot occupy every worker.
+
+    Messages over the limit get a short "busy" reply instead of queuing.
+    ``Overloaded`` from the shared executor is turned into a polite refusal.
+    """
+
+    def __init__(self, limit: int = 1):
+        self.limit = limit
+        self.inflight: Dict[int, int] = {}
+
+    async def __call__(self, handler: Callable[[TelegramObject, Dict[str, Any]], Awaitable[Any]],
+                       event: TelegramObject, data: Dict[str, Any]) -> Any:
+        user = getattr(getattr(event, "from_user", None), "id", None)
+        if user is None:
+            return await handler(event, data)
+        if self.inflight.get(user, 0) >= self.limit:
+            if isinstance(event, Message):
+                await event.answer(BUSY_TEXT)
+            return None
+        self.inflight[user] = self.inflight.get(user, 0) + 1
+        loop = asyncio.get_running_loop()
+        started = loop.time()
+        outcome = "ok"
+        with metrics.trace() as spans:
+            try:
+                return await handler(event, data)
+            except Overloaded:
+                outcome = "overloaded"
+                if isinstance(event, Message):
+                    await event.answer(OVERLOADED_TEXT)
+                return None
+            except Exception:
+                outcome = "error"
+                raise
+            finally:
+                left = self.inflight[user] - 1
+                if left:
+                    self.inflight[user] = left
+                else:
+                    del self.inflight[user]
+                took = loop.time() - started
+                metrics.inc("bot_updates_total", outcome=outcome)
+                metrics.observe("bot_update_seconds", took)
+                stats = get_executor().stats()
+                log.info("update", user=user, command=_command(event), outcome=outcome, took_ms=round(took * 1000, 1),
+                         stages_ms=metrics.summarize(spans), users_inflight=len(self.inflight),
+                         queued=stats["queued"], running=stats["running"])
+
+
+def _command(event: TelegramObject) -> str:
+    text = getattr(event, "text", None) or ""
+    return text.split()[0] if text.startswith("/") else "text"
@@ -0,0 +1,116 @@
+import asyncio, logging, signal
+from typing import Any, Dict, Optional
+from aiohttp import web
+from aiogram import Bot, Dispatcher
+from aiogram.webhook.aiohttp_server import SimpleRequestHandler, setup_application
+from utils import env
+import metrics
+
+log = logging.getLogger("bot.webhook")
+
+HOST = env("BOT_WEBHOOK_HOST", "0.0.0.0")
+PORT = int(env("BOT_WEBHOOK_PORT", "8080"))
+PATH = env("BOT_WEBHOOK_PATH", "/telegram")
+# Public URL Telegram should call; when empty the webhook is assumed to be set up elsewhere
+URL = env("BOT_WEBHOOK_URL", "")
+SECRET = env("BOT_WEBHOOK_SECRET", "")
+CONCURRENCY = int(env("BOT_WEBHOOK_CONCURRENCY", "64"))
+BACKLOG = int(env("BOT_WEBHOOK_BACKLOG", "256"))
+DRAIN_TIMEOUT = float(env("BOT_WEBHOOK_DRAIN_S", "25"))
+
+
+class BoundedRequestHandler(SimpleRequestHandler):
+    """Webhook endpoint handling at most ``limit`` updates at once.
+
+    Updates are acknowledged immediately and handled in background tasks. Up
+    to ``backlog`` more wait for a slot; past that, and while shutting down,
+    Telegram gets 503 and redelivers the update later. ``close`` drains
+    in-flight updates before closing the bot session.
+    """
+
+    def __init__(self, dispatcher: Dispatcher, bot: Bot, limit: int = CONCURRENCY, backlog: int = BACKLOG,
+                 drain_timeout: float = DRAIN_TIMEOUT, **kwargs: Any):
+        super().__init__(dispatcher, bot, handle_in_background=True, **kwargs)
+        self.limit = limit
+        self.backlog = backlog
+        self.drain_timeout = drain_timeout
+        self._slots = asyncio.Semaphore(limit)
+        self.closing = False
+        self.rejected = 0
+
+    @property
+    def pending(self) -> int:
+        return len(self._background_feed_update_tasks)
+
+    async def _background_feed_update(self, bot: Bot, update: Dict[str, Any]) -> None:
+        async with self._slots:
+            try:
+                await super()._background_feed_update(bot, update)
+            except Exception:
+                log.exception("update %s failed", update.get("update_id"))
+
+    async def handle(self, request: web.Request) -> web.Response:
+        if self.closing or self.pending >= self.limit + self.backlog:
+            self.rejected += 1
+            metrics.inc("bot_webhook_rejected_total")
+            return web.Response(status=503, headers={"Retry-After": "1"})
+        return await super().handle(request)
+
+    async def drain(self) -> None:
+        self.closing = True
+        tasks = set(self._background_feed_update_tasks)
+        if tasks:
+            log.info("draining %d updates", len(tasks))
+            _, left = await asyncio.wait(tasks, timeout=self.drain_timeout)
+            if left:
+                log.warning("dropping %d updates still running after %.0fs", len(left), self.drain_timeout)
+                for task in left:
+                    task.cancel()
+
+    async def close(self) -> None:
+        await self.drain()
+        await super().close()
+
+
+def build_app(dp: Dispatcher, bot: Bot, **handler_kwargs: Any) -> web.Application:
+    app = web.Application()
+    handler = BoundedRequestHandler(dp, bot, secret_token=SECRET or None, **handler_kwargs)
+    handler.register(app, path=PATH)
+
+    async def healthz(request: web.Request) -> web.Response:
+        return web.json_response({"pending": handler.pending, "limit": handler.limit, "closing": handler.closing})
+
+    async def set_webhook(app: web.Application) -> None:
+        if URL:
+            await bot.set_webhook(URL + PATH, secret_token=SECRET or None, max_connections=min(handler.limit, 100))
+
+    app.router.add_get("/healthz", healthz)
+    app.on_startup.append(set_webhook)
+    setup_application(app, dp, bot=bot)
+    global _handler
+    _handler = handler
+    return app
+
+_handler: Optional[BoundedRequestHandler] = None  # the latest app's, for the pending gauge
+metrics.register(lambda: [("bot_webhook_pending", "gauge", {}, _handler.pending)] if _handler is not None else [])
+
+
+async def serve(dp: Dispatcher, bot: Bot, host: str = HOST, port: int = PORT,
+                stop: Optional[asyncio.Event] = None) -> None:
+    """Run the webhook server until SIGINT/SIGTERM (or ``stop``), then drain and exit."""
+    runner = web.AppRunner(build_app(dp, bot), shutdown_timeout=DRAIN_TIMEOUT)
+    await runner.setup()
+    await web.TCPSite(runner, host, port).start()
+    log.info("webhook listening on %s:%d%s", host, port, PATH)
+    stop = stop or asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        try:
+            loop.add_signal_handler(sig, stop.set)
+        except (NotImplementedError, RuntimeError):
+            pass
+    try:
+        await stop.wait()
+    finally:
+        # Stops accepting connections, then on_shutdown drains in-flight updates
+        await runner.cleanup()
@@ -0,0 +1,165 @@
+import contextvars, threading, time
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+from utils import env
+
+# Latency buckets (seconds) shared by every histogram
+BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+Labels = Tuple[Tuple[str, str], ...]
+Sample = Tuple[str, str, Dict[str, str], float]  # name, type, labels, value
+
+enabled = env("METRICS", "1") not in ("0", "false", "no")
+
+_lock = threading.Lock()
+_counters: Dict[Tuple[str, Labels], float] = {}
+_gauges: Dict[Tuple[str, Labels], float] = {}
+_hists: Dict[Tuple[str, Labels], List[float]] = {}  # bucket counts..., sum, count
+_collectors: List[Callable[[], Iterable[Sample]]] = []
+_help: Dict[str, str] = {}
+# Spans of the current request, when someone is tracing it (see ``trace``)
+_trace: contextvars.ContextVar[Optional[List[Tuple[str, float]]]] = contextvars.ContextVar("trace", default=None)
+
+
+def _key(name: str, labels: Dict[str, str]) -> Tuple[str, Labels]:
+    return name, tuple(sorted((k, str(v)) for k, v in labels.items()))
+
+def inc(name: str, value: float = 1.0, **labels) -> None:
+    if not enabled:
+        return
+    key = _key(name, labels)
+    with _lock:
+        _counters[key] = _counters.get(key, 0.0) + value
+
+def gauge(name: str, value: float, **labels) -> None:
+    if not enabled:
+        return
+    with _lock:
+        _gauges[_key(name, labels)] = float(value)
+
+def observe(name: str, seconds: float, **labels) -> None:
+    if not enabled:
+        return
+    key = _key(name, labels)
+    with _lock:
+        h = _hists.get(key)
+        if h is None:
+            h = _hists[key] = [0.0] * (len(BUCKETS) + 2)
+        for i, bound in enumerate(BUCKETS):
+            if seconds <= bound:
+                h[i] += 1
+        h[-2] += seconds
+        h[-1] += 1
+
+def describe(name: str, text: str) -> None:
+    _help[name] = text
+
+def register(collector: Callable[[], Iterable[Sample]]) -> None:
+    """Add a callback sampled at scrape time (for state that already keeps its own counts)."""
+    _collectors.append(collector)
+
+
+class _Span:
+    __slots__ = ("name", "t0")
+
+    def __init__(self, name: str):
+        self.name = name
+
+    def __enter__(self):
+        self.t0 = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        took = time.perf_counter() - self.t0
+        observe("stage_seconds", took, stage=self.name)
+        spans = _trace.get()
+        if spans is not None:
+            spans.append((self.name, took))
+        return False
+
+
+class _NullSpan:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+_NULL = _NullSpan()
+
+def span(name: str):
+    """Time a stage into the ``stage_seconds`` histogram (and the current trace, if any)."""
+    return _Span(name) if enabled else _NULL
+
+
+class trace:
+    """Collect the spans run inside this block, including those in executor threads."""
+
+    def __enter__(self) -> List[Tuple[str, float]]:
+        self.spans: List[Tuple[str, float]] = []
+        self._token = _trace.set(self.spans)
+        return self.spans
+
+    def __exit__(self, *exc):
+        _trace.reset(self._token)
+        return False
+
+def summarize(spans: List[Tuple[str, float]]) -> Dict[str, float]:
+    # Milliseconds per stage, summed over repeated stages
+    out: Dict[str, float] = {}
+    for name, took in spans:
+        out[name] = out.get(name, 0.0) + took * 1000
+    return {k: round(v, 2) for k, v in out.items()}
+
+
+def _fmt(labels: Dict[str, str]) -> str:
+    if not labels:
+        return ""
+    parts = []
+    for k, v in labels.items():
+        v = str(v).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+        parts.append(f'{k}="{v}"')
+    return "{" + ",".join(parts) + "}"
+
+def render() -> str:
+    """Everything in the Prometheus text exposition format (version 0.0.4)."""
+    with _lock:
+        counters = dict(_counters)
+        gauges = dict(_gauges)
+        hists = {k: list(v) for k, v in _hists.items()}
+    samples: List[Sample] = [(n, "counter", dict(l), v) for (n, l), v in counters.items()]
+    samples += [(n, "gauge", dict(l), v) for (n, l), v in gauges.items()]
+    for collect in _collectors:
+        samples.extend(collect())
+    lines: List[str] = []
+    typed = set()
+    for name, kind, labels, value in sorted(samples, key=lambda s: (s[0], sorted(s[2].items()))):
+        if name not in typed:
+            typed.add(name)
+            if name in _help:
+                lines.append(f"# HELP {name} {_help[name]}")
+            lines.append(f"# TYPE {name} {kind}")
+        lines.append(f"{name}{_fmt(labels)} {value:g}")
+    for (name, lbl), h in sorted(hists.items()):
+        labels = dict(lbl)
+        if name not in typed:
+            typed.add(name)
+            if name in _help:
+                lines.append(f"# HELP {name} {_help[name]}")
+            lines.append(f"# TYPE {name} histogram")
+        for bound, n in zip(BUCKETS, h):
+            lines.append(f"{name}_bucket{_fmt({**labels, 'le': f'{bound:g}'})} {n:g}")
+        lines.append(f"{name}_bucket{_fmt({**labels, 'le': '+Inf'})} {h[-1]:g}")
+        lines.append(f"{name}_sum{_fmt(labels)} {h[-2]:g}")
+        lines.append(f"{name}_count{_fmt(labels)} {h[-1]:g}")
+    return "\n".join(lines) + "\n"
+
+def reset() -> None:
+    with _lock:
+        _counters.clear()
+        _gauges.clear()
+        _hists.clear()
+
+
+describe("stage_seconds", "Time spent per pipeline stage")
@@ -0,0 +1,54 @@
+"""Text analysis shared by BM25 indexing and queries.
+
+Lowercase, ё→е, split on anything that is not a letter or digit, drop
+stopwords, then strip Russian inflection endings with a light suffix
+stemmer, so "Семестр", "семестре" and "семестров" are one term. Bump
+VERSION whenever the output changes: indexes record it and are rebuilt.
+"""
+import re
+from functools import lru_cache
+from typing import List
+from utils import env
+
+VERSION = 1
+
+_TOKEN = re.compile(r"[0-9a-zа-я]+")
+_CYRILLIC = re.compile(r"[а-я]")
+_VOWELS = set("аеиоуыэюя")
+
+STOPWORDS = frozenset("""
+и в во не что он на я с со как а то все она так его но да ты к у же вы за бы по только ее мне было вот от меня еще
+нет о из ему теперь когда даже ну вдруг ли если уже или ни быть был него до вас нибудь опять уж вам ведь там потом
+себя ничего ей может они тут где есть надо ней для мы тебя их чем была сам чтоб без будто чего раз тоже себе под
+будет ж тогда кто этот того потому этого какой совсем ним здесь этом один почти мой тем чтобы нее сейчас были куда
+зачем всех никогда можно при наконец два об другой хоть после над больше тот через эти нас про всего них какая много
+разве три эту моя впрочем хорошо свою этой перед иногда лучше чуть том нельзя такой им более всегда конечно всю между
+какие каких какое сколько это также
+""".split()) | {"ects"}  # "N ECTS" is in every course chunk and only adds noise
+
+# Inflection endings, longest first; a light take on the Snowball Russian
+# noun/adjective/reflexive steps without the verb and derivational ones.
+_ENDINGS = sorted("""
+иями ями ами ией иях ием ого его ому ему ыми ими ее ие ые ое ей ий ый ой ем им ым ом их ых ую юю ая яя ою ею
+ев ов ье еи ии ям ам ах ях ия ья ию ью ся сь а е и й о у ы ь ю я
+""".split(), key=len, reverse=True)
+MIN_STEM = 3
+
+
+@lru_cache(maxsize=int(env("ANALYZER_CACHE", "50000")))
+def stem(word: str) -> str:
+    if not _CYRILLIC.search(word):
+        return word
+    # Only strip inside the part after the first vowel (Snowball's RV region)
+    rv = next((i + 1 for i, ch in enumerate(word) if ch in _VOWELS), len(word))
+    for end in _ENDINGS:
+        if word.endswith(end) and len(word) - len(end) >= max(rv, MIN_STEM):
+            return word[:-len(end)]
+    return word
+
+def tokenize(text: str) -> List[str]:
+    return _TOKEN.findall(text.lower().replace("ё", "е"))
+
+def analyze(text: str) -> List[str]:
+    """Index/query terms of ``text``."""
+    return [stem(t) for t in tokenize(text) if t not in STOPWORDS]
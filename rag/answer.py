@@ -1,5 +1,9 @@
-from typing import Dict, List
-from rag.retrieve import hybrid
+from typing import Dict, List, Optional, Sequence, Tuple
+from rag.retrieve import Retriever, get_retriever
+from rag.answer_cache import AnswerCache, answer_key
+from utils import env
+from workers import run_blocking
+import metrics
 
 ALLOWED_TOPICS = [
     "магистр", "магистратура", "программа", "учебный план", "поступление", "ECTS", "ЗЕТ",
@@ -7,20 +11,31 @@ ALLOWED_TOPICS = [
     "НИР", "лаборатория", "карьера", "требования", "пререквизиты"
 ]
 
+# Fixed queries behind the bot commands; answered once per index version by the indexer.
+COMPARE_QUERY = "чем отличается программа"
+PLAN_QUERY = "план обучения по семестрам"
+CANNED = [(COMPARE_QUERY, "AI"), (COMPARE_QUERY, "AI Product"), (PLAN_QUERY, None)]
+
+cache = AnswerCache(
+    max_size=int(env("ANSWER_CACHE_SIZE", "1024")),
+    ttl=float(env("ANSWER_CACHE_TTL", "600")),
+)
+
 def is_relevant(q: str, min_score: float = 0.8) -> bool:
     ql = q.lower()
     # Strict keyword-based relevancy to avoid false positives on generic queries
     return any(t in ql for t in ALLOWED_TOPICS)
 
-def answer(query: str, program: str | None = None) -> Dict:
-    if not is_relevant(query):
-        return {
-            "text": "Я помогаю только по магистерским программам ИТМО «Искусственный интеллект» и «AI Product»: учебные планы, дисциплины, треки, ECTS, поступление. Задайте, пожалуйста, релевантный вопрос.",
-            "citations": []
-        }
-    hits = hybrid(query, k=6)
-    if program:
-        hits = [h for h in hits if h.get("program") == program]
+OFF_TOPIC = {
+    "text": "Я помогаю только по магистерским программам ИТМО «Искусственный интеллект» и «AI Product»: учебные планы, дисциплины, треки, ECTS, поступление. Задайте, пожалуйста, релевантный вопрос.",
+    "citations": []
+}
+
+def _compose(query: str, program: str | None, retriever: Retriever) -> Dict:
+    # The program filter is pushed down into retrieval, so hits are already scoped
+    return _compose_hits(retriever.hybrid(query, k=6, program=program))
+
+def _compose_hits(hits: List[Dict]) -> Dict:
     if not hits:
         return {
             "text": "Не нашёл ответ в учебных планах. Уточните вопрос или попробуйте иначе сформулировать.",
@@ -32,3 +47,67 @@ def answer(query: str, program: str | None = None) -> Dict:
         bullets.append(f"• {h['text']}  \n  ⮕ Цитата: {h['program']}, {h['source_ref']}")
     txt = "Вот что нашёл в учебных планах:\n" + "\n".join(bullets)
     return {"text": txt, "citations": [ {"source_url": h["source_url"], "source_ref": h["source_ref"]} for h in hits[:4] ]}
+
+def answer(query: str, program: str | None = None, retriever: Optional[Retriever] = None) -> Dict:
+    with metrics.span("answer"):
+        with metrics.span("answer.relevance"):
+            relevant = is_relevant(query)
+        if not relevant:
+            metrics.inc("answers_total", source="off_topic")
+            return {"text": OFF_TOPIC["text"], "citations": []}
+        retriever = retriever or get_retriever()
+        snap = retriever.snapshot()
+        key = answer_key(query, program)
+        res = snap.answers.get(key)
+        source = "canned"
+        if res is None:
+            res = cache.get(key, snap.version)
+            source = "cache"
+        if res is None:
+            res = _compose(query, program, retriever)
+            cache.put(key, snap.version, res)
+            source = "retrieval"
+        metrics.inc("answers_total", source=source)
+        return {"text": res["text"], "citations": list(res["citations"])}
+
+def answer_batch(items: Sequence[Tuple[str, str | None]], retriever: Optional[Retriever] = None) -> List[Dict]:
+    """Answers for (query, program) pairs, in order.
+
+    Canned and cached answers are served as in ``answer``; the remaining
+    distinct queries are retrieved together (one embedding call, one vector
+    query per program, one BM25 matrix pass).
+    """
+    retriever = retriever or get_retriever()
+    snap = retriever.snapshot()
+    out: List[Optional[Dict]] = [None] * len(items)
+    todo: Dict[Tuple[str, str | None], List[int]] = {}
+    for i, (query, program) in enumerate(items):
+        if not is_relevant(query):
+            out[i] = OFF_TOPIC
+            continue
+        key = answer_key(query, program)
+        res = snap.answers.get(key) or cache.get(key, snap.version)
+        if res is None:
+            todo.setdefault((query, program), []).append(i)
+        else:
+            out[i] = res
+    if todo:
+        pairs = list(todo)
+        hits = retriever.hybrid_batch([q for q, _ in pairs], k=6, programs=[p for _, p in pairs])
+        for (query, program), found in zip(pairs, hits):
+            res = _compose_hits(found)
+            cache.put(answer_key(query, program), snap.version, res)
+            for i in todo[(query, program)]:
+                out[i] = res
+    return [{"text": r["text"], "citations": list(r["citations"])} for r in out]
+
+def precompute_answers(retriever: Retriever) -> Dict[str, Dict]:
+    return {answer_key(q, p): _compose(q, p, retriever) for q, p in CANNED}
+
+async def aanswer(query: str, program: str | None = None, block: bool = True) -> Dict:
+    # Retrieval and embedding are blocking; keep them off the event loop
+    return await run_blocking(answer, query, program, block=block)
+
+metrics.register(lambda: [
+    ("answer_cache_size", "gauge", {}, cache.stats()["size"]),
+])
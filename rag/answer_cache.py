@@ -0,0 +1,52 @@
+import threading, time
+from collections import OrderedDict
+from typing import Dict, Optional
+
+
+def answer_key(query: str, program: Optional[str]) -> str:
+    return f"{program or '*'}|{' '.join(query.lower().split())}"
+
+
+class AnswerCache:
+    """LRU cache of answer() results with a TTL, scoped to an index version.
+
+    Entries from an older index version are treated as misses and dropped,
+    so a rebuilt index invalidates everything without an explicit flush.
+    """
+
+    def __init__(self, max_size: int = 1024, ttl: float = 600.0):
+        self.max_size = max_size
+        self.ttl = ttl
+        self._items: "OrderedDict[str, tuple[str, float, Dict]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: str, version: str) -> Optional[Dict]:
+        with self._lock:
+            item = self._items.get(key)
+            if item is not None:
+                v, expires, value = item
+                if v == version and expires > time.monotonic():
+                    self._items.move_to_end(key)
+                    self.hits += 1
+                    return value
+                del self._items[key]
+            self.misses += 1
+            return None
+
+    def put(self, key: str, version: str, value: Dict) -> None:
+        if self.max_size <= 0:
+            return
+        with self._lock:
+            self._items[key] = (version, time.monotonic() + self.ttl, value)
+            self._items.move_to_end(key)
+            while len(self._items) > self.max_size:
+                self._items.popitem(last=False)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._items.clear()
+
+    def stats(self) -> Dict[str, int]:
+        return {"hits": self.hits, "misses": self.misses, "size": len(self._items)}
@@ -0,0 +1,201 @@
+import json, math
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Tuple
+import numpy as np
+from rag import analyzer
+
+# Bump when the on-disk layout changes; older snapshots are then rejected.
+# Indexes also record analyzer.VERSION, since term ids only make sense for the
+# analyzer that produced the vocabulary.
+FORMAT_VERSION = 2
+ARRAYS = ("indptr", "doc_ids", "tf", "weights", "doc_len")
+
+
+class BM25Index:
+    """Okapi BM25 over a term-major sparse matrix.
+
+    Postings are stored CSR-style: for term ``t`` the documents are
+    ``doc_ids[indptr[t]:indptr[t+1]]`` with raw term frequencies in ``tf``
+    and the fully weighted BM25 contribution in ``weights``. Scoring a query
+    is a few slice gathers plus ``np.argpartition``; the maths mirrors
+    ``rank_bm25.BM25Okapi`` so scores are identical.
+    """
+
+    def __init__(self, vocab: List[str], indptr: np.ndarray, doc_ids: np.ndarray, tf: np.ndarray,
+                 doc_len: np.ndarray, k1: float = 1.5, b: float = 0.75, epsilon: float = 0.25,
+                 weights: Optional[np.ndarray] = None):
+        self.vocab = list(vocab)
+        self.term_ids: Dict[str, int] = {t: i for i, t in enumerate(self.vocab)}
+        self.indptr = indptr
+        self.doc_ids = doc_ids
+        self.tf = tf
+        self.doc_len = doc_len
+        self.k1, self.b, self.epsilon = k1, b, epsilon
+        self.n_docs = len(doc_len)
+        self.avgdl = int(doc_len.sum()) / self.n_docs if self.n_docs else 0.0
+        self.idf = self._idf()
+        self.weights = weights if weights is not None else self._weights()
+
+    @classmethod
+    def build(cls, docs: Iterable[List[str]], **params) -> "BM25Index":
+        vocab: Dict[str, int] = {}
+        term, doc, tf, doc_len = _count(docs, vocab, 0)
+        return cls._from_postings(list(vocab), term, doc, tf, doc_len, **params)
+
+    @classmethod
+    def _from_postings(cls, vocab: List[str], term: np.ndarray, doc: np.ndarray, tf: np.ndarray,
+                       doc_len: np.ndarray, **params) -> "BM25Index":
+        order = np.lexsort((doc, term))
+        indptr = np.zeros(len(vocab) + 1, dtype=np.int64)
+        np.cumsum(np.bincount(term, minlength=len(vocab)), out=indptr[1:])
+        return cls(vocab, indptr, doc[order].astype(np.int32), tf[order].astype(np.int32),
+                   doc_len.astype(np.int32), **params)
+
+    def update(self, remove: Iterable[int], docs: Iterable[List[str]]) -> "BM25Index":
+        """Return a new index without the ``remove`` documents and with ``docs`` appended.
+
+        Only the added documents are tokenized and counted; surviving postings
+        are filtered and re-numbered in bulk. Terms that no longer occur are
+        dropped so statistics match a fresh build of the same corpus.
+        """
+        keep = np.ones(self.n_docs, dtype=bool)
+        keep[np.fromiter(remove, dtype=np.int64)] = False
+        remap = np.cumsum(keep) - 1
+        term = np.repeat(np.arange(len(self.vocab), dtype=np.int64), np.diff(self.indptr))
+        alive = keep[self.doc_ids]
+        vocab = dict(self.term_ids)
+        n_term, n_doc, n_tf, n_len = _count(docs, vocab, int(keep.sum()))
+        term = np.concatenate([term[alive], n_term])
+        doc = np.concatenate([remap[self.doc_ids[alive]], n_doc])
+        tf = np.concatenate([self.tf[alive].astype(np.int64), n_tf])
+        doc_len = np.concatenate([self.doc_len[keep].astype(np.int64), n_len])
+        used = np.bincount(term, minlength=len(vocab)) > 0
+        words = list(vocab)
+        term = (np.cumsum(used) - 1)[term]
+        return type(self)._from_postings([w for w, u in zip(words, used.tolist()) if u], term, doc, tf, doc_len,
+                                         k1=self.k1, b=self.b, epsilon=self.epsilon)
+
+    def _idf(self) -> np.ndarray:
+        df = np.diff(self.indptr)
+        idf = np.array([math.log(self.n_docs - n + 0.5) - math.log(n + 0.5) for n in df.tolist()], dtype=np.float64)
+        if len(idf):
+            # Same epsilon floor as rank_bm25 for terms present in most documents
+            eps = self.epsilon * (sum(idf.tolist()) / len(idf))
+            idf[idf < 0] = eps
+        return idf
+
+    def _weights(self) -> np.ndarray:
+        if not len(self.doc_ids):
+            return np.zeros(0, dtype=np.float64)
+        term = np.repeat(np.arange(len(self.vocab)), np.diff(self.indptr))
+        tf = self.tf.astype(np.float64)
+        dl = self.doc_len[self.doc_ids].astype(np.float64)
+        k1, b = self.k1, self.b
+        return self.idf[term] * (tf * (k1 + 1) / (tf + k1 * (1 - b + b * dl / self.avgdl)))
+
+    def encode(self, text: str) -> np.ndarray:
+        """Term ids of a query string; unknown terms are dropped."""
+        return self.query_ids(analyzer.analyze(text))
+
+    def query_ids(self, tokens) -> np.ndarray:
+        if isinstance(tokens, np.ndarray):
+            return tokens.astype(np.int64, copy=False)
+        ids = [self.term_ids.get(t, -1) for t in tokens]
+        return np.asarray([i for i in ids if i >= 0], dtype=np.int64)
+
+    def get_scores(self, tokens: List[str]) -> np.ndarray:
+        scores = np.zeros(self.n_docs, dtype=np.float64)
+        for t in self.query_ids(tokens).tolist():
+            s, e = self.indptr[t], self.indptr[t + 1]
+            scores[self.doc_ids[s:e]] += self.weights[s:e]
+        return scores
+
+    def get_scores_batch(self, queries: List[List[str]]) -> np.ndarray:
+        """(n_queries, n_docs) scores; all postings of all queries are summed in one bincount."""
+        n_q = len(queries)
+        ids = [self.query_ids(tokens) for tokens in queries]
+        terms = np.concatenate(ids) if n_q else np.zeros(0, dtype=np.int64)
+        qrow = np.repeat(np.arange(n_q, dtype=np.int64), [len(t) for t in ids])
+        starts, ends = self.indptr[terms], self.indptr[terms + 1]
+        lens = ends - starts
+        # Positions of every posting of every query term, in query token order
+        pos = np.repeat(starts - np.cumsum(lens) + lens, lens) + np.arange(int(lens.sum()))
+        flat = np.repeat(qrow, lens) * self.n_docs + self.doc_ids[pos]
+        return np.bincount(flat, weights=self.weights[pos], minlength=n_q * self.n_docs).reshape(n_q, self.n_docs)
+
+    def top_k(self, tokens: List[str], k: int, docs: Optional[np.ndarray] = None) -> Tuple[np.ndarray, np.ndarray]:
+        scores = self.get_scores(tokens)
+        return top_k(scores, k, docs), scores
+
+    def top_k_batch(self, queries: List[List[str]], k: int,
+                    docs: Optional[List[Optional[np.ndarray]]] = None) -> Tuple[List[np.ndarray], np.ndarray]:
+        scores = self.get_scores_batch(queries)
+        docs = docs or [None] * len(queries)
+        return [top_k(row, k, d) for row, d in zip(scores, docs)], scores
+
+    def save(self, path: Path) -> None:
+        path = Path(path)
+        path.mkdir(parents=True, exist_ok=True)
+        for name in ARRAYS:
+            np.save(path / f"{name}.npy", getattr(self, name), allow_pickle=False)
+        meta = {
+            "format": FORMAT_VERSION,
+            "analyzer": analyzer.VERSION,
+            "k1": self.k1, "b": self.b, "epsilon": self.epsilon,
+            "n_docs": self.n_docs,
+            "vocab": self.vocab,
+        }
+        (path / "meta.json").write_text(json.dumps(meta, ensure_ascii=False), encoding="utf-8")
+
+    @classmethod
+    def load(cls, path: Path, mmap: bool = False) -> "BM25Index":
+        """Load a saved index; with ``mmap`` the arrays are read-only views of the
+        files, so several processes serving one snapshot share the pages."""
+        path = Path(path)
+        meta = json.loads((path / "meta.json").read_text(encoding="utf-8"))
+        if meta.get("format") != FORMAT_VERSION:
+            raise ValueError(f"Unsupported BM25 index format {meta.get('format')} in {path}")
+        if meta.get("analyzer") != analyzer.VERSION:
+            raise ValueError(f"BM25 index in {path} was built with analyzer {meta.get('analyzer')}, not {analyzer.VERSION}")
+        mode = "r" if mmap else None
+        arr = {name: np.load(path / f"{name}.npy", mmap_mode=mode, allow_pickle=False) for name in ARRAYS}
+        return cls(meta["vocab"], arr["indptr"], arr["doc_ids"], arr["tf"], arr["doc_len"],
+                   k1=meta["k1"], b=meta["b"], epsilon=meta["epsilon"], weights=arr["weights"])
+
+
+def _count(docs: Iterable[List[str]], vocab: Dict[str, int], offset: int):
+    # (term, doc, tf) triples for docs numbered from offset; grows vocab in place
+    rows: List[int] = []
+    cols: List[int] = []
+    freqs: List[int] = []
+    doc_len: List[int] = []
+    for d, tokens in enumerate(docs, start=offset):
+        counts: Dict[int, int] = {}
+        for tok in tokens:
+            tid = vocab.setdefault(tok, len(vocab))
+            counts[tid] = counts.get(tid, 0) + 1
+        for tid, n in counts.items():
+            rows.append(tid)
+            cols.append(d)
+            freqs.append(n)
+        doc_len.append(len(tokens))
+    return (np.asarray(rows, dtype=np.int64), np.asarray(cols, dtype=np.int64),
+            np.asarray(freqs, dtype=np.int64), np.asarray(doc_len, dtype=np.int64))
+
+
+def top_k(scores: np.ndarray, k: int, docs: Optional[np.ndarray] = None) -> np.ndarray:
+    """Indices of the k best scores, highest first, ties in document order.
+
+    ``docs`` (sorted document ids) restricts the candidates, e.g. to one program.
+    """
+    if docs is not None:
+        return docs[top_k(scores[docs], k)]
+    n = len(scores)
+    if k <= 0 or n == 0:
+        return np.zeros(0, dtype=np.int64)
+    if k < n:
+        kth = scores[np.argpartition(scores, n - k)[n - k:]].min()
+        cand = np.flatnonzero(scores >= kth)
+    else:
+        cand = np.arange(n)
+    return cand[np.argsort(-scores[cand], kind="stable")][:k]
@@ -0,0 +1,136 @@
+import hashlib, sqlite3, threading, time, unicodedata
+from collections import OrderedDict
+from pathlib import Path
+from typing import Callable, Dict, List, Sequence
+import numpy as np
+
+
+def normalize_text(text: str) -> str:
+    return " ".join(unicodedata.normalize("NFC", text).split())
+
+
+def cache_key(provider: str, model: str, text: str) -> str:
+    h = hashlib.sha256()
+    h.update(f"{provider}\0{model}\0{normalize_text(text)}".encode("utf-8"))
+    return h.hexdigest()
+
+
+class EmbeddingCache:
+    """Content-addressed embedding store: in-memory LRU in front of SQLite.
+
+    Vectors are stored as raw float32 blobs keyed by (provider, model, text
+    hash). The disk store is bounded to ``max_rows``; the least recently used
+    rows are evicted in bulk when it grows past that.
+    """
+
+    def __init__(self, path: Path, max_rows: int = 200_000, lru_size: int = 4096):
+        self.path = Path(path)
+        self.max_rows = max_rows
+        self.lru_size = lru_size
+        self._lru: "OrderedDict[str, np.ndarray]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._conn = None
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+
+    def _db(self) -> sqlite3.Connection:
+        if self._conn is None:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            conn = sqlite3.connect(str(self.path), check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("CREATE TABLE IF NOT EXISTS embeddings(key TEXT PRIMARY KEY, dim INT, vec BLOB, last_used INT)")
+            conn.execute("CREATE INDEX IF NOT EXISTS embeddings_last_used ON embeddings(last_used)")
+            self._conn = conn
+        return self._conn
+
+    def _remember(self, key: str, vec: np.ndarray) -> None:
+        self._lru[key] = vec
+        self._lru.move_to_end(key)
+        while len(self._lru) > self.lru_size:
+            self._lru.popitem(last=False)
+
+    def get_many(self, keys: Sequence[str]) -> Dict[str, np.ndarray]:
+        found: Dict[str, np.ndarray] = {}
+        with self._lock:
+            missing = []
+            for k in keys:
+                vec = self._lru.get(k)
+                if vec is not None:
+                    self._lru.move_to_end(k)
+                    found[k] = vec
+                else:
+                    missing.append(k)
+            if missing:
+                db = self._db()
+                uniq = list(dict.fromkeys(missing))
+                for i in range(0, len(uniq), 500):
+                    part = uniq[i:i + 500]
+                    rows = db.execute(
+                        f"SELECT key, vec FROM embeddings WHERE key IN ({','.join('?' * len(part))})", part
+                    ).fetchall()
+                    for k, blob in rows:
+                        vec = np.frombuffer(blob, dtype=np.float32)
+                        found[k] = vec
+                        self._remember(k, vec)
+                    if rows:
+                        now = time.time_ns()
+                        db.executemany("UPDATE embeddings SET last_used=? WHERE key=?", [(now, k) for k, _ in rows])
+                db.commit()
+            for k in keys:
+                if k in found:
+                    self.hits += 1
+                else:
+                    self.misses += 1
+            self.disk_hits += sum(1 for k in missing if k in found)
+        return found
+
+    def put_many(self, items: Dict[str, np.ndarray]) -> None:
+        if not items:
+            return
+        with self._lock:
+            db = self._db()
+            now = time.time_ns()
+            rows = []
+            for k, vec in items.items():
+                vec = np.ascontiguousarray(vec, dtype=np.float32)
+                self._remember(k, vec)
+                rows.append((k, int(vec.shape[0]), vec.tobytes(), now))
+            db.executemany("INSERT OR REPLACE INTO embeddings(key, dim, vec, last_used) VALUES (?,?,?,?)", rows)
+            self._evict(db)
+            db.commit()
+
+    def _evict(self, db: sqlite3.Connection) -> None:
+        (count,) = db.execute("SELECT COUNT(*) FROM embeddings").fetchone()
+        if count > self.max_rows:
+            # Trim to 90% so eviction does not run on every insert
+            excess = count - int(self.max_rows * 0.9)
+            db.execute("DELETE FROM embeddings WHERE key IN (SELECT key FROM embeddings ORDER BY last_used LIMIT ?)", (excess,))
+
+    def cached(self, provider: str, model: str, fn: Callable[[List[str]], np.ndarray]) -> Callable[[List[str]], np.ndarray]:
+        """Wrap a batch embedding function so only cache misses reach ``fn``."""
+        def embed(texts: List[str]) -> np.ndarray:
+            keys = [cache_key(provider, model, t) for t in texts]
+            found = self.get_many(keys)
+            todo = list(dict.fromkeys(k for k in keys if k not in found))
+            if todo:
+                first = {}
+                for k, t in zip(keys, texts):
+                    first.setdefault(k, t)
+                vecs = np.asarray(fn([first[k] for k in todo]), dtype=np.float32)
+                fresh = dict(zip(todo, vecs))
+                self.put_many(fresh)
+                found.update(fresh)
+            if not keys:
+                return np.zeros((0, 0), dtype=np.float32)
+            return np.stack([found[k] for k in keys])
+        return embed
+
+    def stats(self) -> Dict[str, int]:
+        return {"hits": self.hits, "disk_hits": self.disk_hits, "misses": self.misses, "lru_size": len(self._lru)}
+
+    def close(self) -> None:
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
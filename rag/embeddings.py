@@ -1,25 +1,190 @@
-import os
-from typing import List
+import os, threading
+from concurrent.futures import ThreadPoolExecutor
+from itertools import islice
+from typing import Iterable, Iterator, List, Optional
+import numpy as np
 from utils import env
+import metrics
+from rag.embed_cache import EmbeddingCache
 
 _provider = env("EMBEDDINGS_PROVIDER", "local").lower()
 
+BATCH_SIZE = int(env("EMBEDDINGS_BATCH_SIZE", "32"))
+# Texts buffered per length-sorted window; bounds memory for streamed corpora.
+WINDOW_BATCHES = int(env("EMBEDDINGS_WINDOW_BATCHES", "16"))
+CONCURRENCY = int(env("EMBEDDINGS_CONCURRENCY", "4"))
+
+
+def _windows(texts: Iterable[str], size: int) -> Iterator[List[str]]:
+    it = iter(texts)
+    while True:
+        window = list(islice(it, size))
+        if not window:
+            return
+        yield window
+
+
+def _length_batches(window: List[str], batch_size: int) -> List[List[int]]:
+    # Longest first so each batch pads to similar lengths
+    order = sorted(range(len(window)), key=lambda i: len(window[i]), reverse=True)
+    return [order[i:i + batch_size] for i in range(0, len(order), batch_size)]
+
+
+_client = None
+# Guards the lazy model/client loads: a background warm-up may race the first request
+_load_lock = threading.Lock()
+
+def _openai_client():
+    global _client
+    if _client is None:
+        with _load_lock:
+            if _client is None:
+                # Lazy client; users must set OPENAI_API_KEY (and OPENAI_BASE_URL for a stub/proxy).
+                from openai import OpenAI
+                _client = OpenAI()
+    return _client
+
+def openai_batches(texts: Iterable[str], client=None, model: str = "text-embedding-3-small",
+                   batch_size: int = 256, concurrency: int = CONCURRENCY) -> Iterator[np.ndarray]:
+    client = client or _openai_client()
+    def request(batch: List[str]) -> np.ndarray:
+        res = client.embeddings.create(input=batch, model=model)
+        data = sorted(res.data, key=lambda d: d.index)
+        return np.asarray([d.embedding for d in data], dtype=np.float32)
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        for window in _windows(texts, batch_size * concurrency):
+            parts = [window[i:i + batch_size] for i in range(0, len(window), batch_size)]
+            yield np.concatenate(list(pool.map(request, parts)))
+
+
+def mock_batches(texts: Iterable[str], batch_size: int = BATCH_SIZE) -> Iterator[np.ndarray]:
+    # Deterministic small vectors for tests/CI without heavyweight downloads.
+    for window in _windows(texts, batch_size):
+        yield np.zeros((len(window), 8), dtype=np.float32)
+
+
+_model = None
+
+def _device() -> str:
+    device = env("EMBEDDINGS_DEVICE", "")
+    if device:
+        return device
+    import torch
+    if torch.cuda.is_available():
+        return "cuda"
+    if getattr(torch.backends, "mps", None) is not None and torch.backends.mps.is_available():
+        return "mps"
+    return "cpu"
+
+def _local_model():
+    global _model
+    if _model is None:
+        with _load_lock:
+            if _model is None:
+                from sentence_transformers import SentenceTransformer
+                _model = SentenceTransformer(MODEL_NAME, device=_device())
+    return _model
+
+def local_batches(texts: Iterable[str], batch_size: int = BATCH_SIZE) -> Iterator[np.ndarray]:
+    import torch
+    from sentence_transformers.util import batch_to_device
+    model = _local_model()
+    dim = model.get_sentence_embedding_dimension()
+    # One tokenizer thread prepares batch i+1 while the model runs batch i
+    with ThreadPoolExecutor(max_workers=1) as tok_pool:
+        for window in _windows(texts, batch_size * WINDOW_BATCHES):
+            batches = _length_batches(window, batch_size)
+            out = np.empty((len(window), dim), dtype=np.float32)
+            pending = tok_pool.submit(model.tokenize, [window[i] for i in batches[0]])
+            for j, idx in enumerate(batches):
+                features = pending.result()
+                if j + 1 < len(batches):
+                    pending = tok_pool.submit(model.tokenize, [window[i] for i in batches[j + 1]])
+                with torch.inference_mode():
+                    emb = model(batch_to_device(features, model.device))["sentence_embedding"]
+                    emb = torch.nn.functional.normalize(emb, p=2, dim=1)
+                out[idx] = emb.float().cpu().numpy()
+            yield out
+
+_onnx = None
+
+def _onnx_encoder():
+    global _onnx
+    if _onnx is None:
+        with _load_lock:
+            if _onnx is None:
+                from rag.onnx_model import OnnxEncoder
+                _onnx = OnnxEncoder()
+    return _onnx
+
+def onnx_batches(texts: Iterable[str], batch_size: int = BATCH_SIZE) -> Iterator[np.ndarray]:
+    enc = _onnx_encoder()
+    for window in _windows(texts, batch_size * WINDOW_BATCHES):
+        out = np.empty((len(window), enc.dim), dtype=np.float32)
+        for idx in _length_batches(window, batch_size):
+            out[idx] = enc.encode([window[i] for i in idx])
+        yield out
+
+
 if _provider == "openai":
-    # Lazy client; users must set OPENAI_API_KEY.
-    from openai import OpenAI
-    client = OpenAI()
-    def embed(texts: List[str]) -> List[List[float]]:
-        res = client.embeddings.create(input=texts, model="text-embedding-3-small")
-        return [d.embedding for d in res.data]
+    MODEL_NAME = "text-embedding-3-small"
+    def embed_batches(texts: Iterable[str], batch_size: Optional[int] = None) -> Iterator[np.ndarray]:
+        return openai_batches(texts, model=MODEL_NAME, batch_size=batch_size or 256)
 elif _provider == "mock":
-    # Deterministic small vectors for tests/CI without heavyweight downloads.
-    def embed(texts: List[str]) -> List[List[float]]:
-        return [[0.0] * 8 for _ in texts]
+    MODEL_NAME = "mock-8"
+    def embed_batches(texts: Iterable[str], batch_size: Optional[int] = None) -> Iterator[np.ndarray]:
+        return mock_batches(texts, batch_size or BATCH_SIZE)
+elif _provider == "onnx":
+    # Same model as "local", exported and int8-quantized by `python -m rag.onnx_model export`
+    MODEL_NAME = "BAAI/bge-m3"
+    def embed_batches(texts: Iterable[str], batch_size: Optional[int] = None) -> Iterator[np.ndarray]:
+        return onnx_batches(texts, batch_size or BATCH_SIZE)
 else:
-    _model = None
-    def embed(texts: List[str]) -> List[List[float]]:
-        global _model
-        if _model is None:
-            from sentence_transformers import SentenceTransformer
-            _model = SentenceTransformer("BAAI/bge-m3")
-        return _model.encode(texts, normalize_embeddings=True).tolist()
+    MODEL_NAME = "BAAI/bge-m3"
+    def embed_batches(texts: Iterable[str], batch_size: Optional[int] = None) -> Iterator[np.ndarray]:
+        return local_batches(texts, batch_size or BATCH_SIZE)
+
+def _embed(texts: List[str]) -> np.ndarray:
+    parts = list(embed_batches(texts))
+    if not parts:
+        return np.zeros((0, 0), dtype=np.float32)
+    return parts[0] if len(parts) == 1 else np.concatenate(parts)
+
+# Content-addressed cache in front of the provider; on by default except for the mock.
+_cache_enabled = env("EMBEDDINGS_CACHE", "0" if _provider == "mock" else "1") not in ("0", "false", "no")
+cache = EmbeddingCache(
+    env("EMBEDDINGS_CACHE_PATH", os.path.join(os.path.dirname(__file__), "..", "data", "cache", "embeddings.sqlite")),
+    max_rows=int(env("EMBEDDINGS_CACHE_MAX_ROWS", "200000")),
+    lru_size=int(env("EMBEDDINGS_CACHE_LRU", "4096")),
+)
+_cached_embed = cache.cached(_provider, MODEL_NAME, _embed)
+
+def embed(texts: List[str]) -> np.ndarray:
+    """Embed texts as a contiguous float32 matrix, one row per text."""
+    with metrics.span("embed"):
+        metrics.inc("embed_texts_total", len(texts))
+        if not _cache_enabled:
+            return _embed(texts)
+        return _cached_embed(texts)
+
+def cache_stats():
+    return cache.stats()
+
+def warm() -> None:
+    """Load the model and run one tiny batch so the first request does not pay for it."""
+    if _provider == "openai":
+        _openai_client()
+        return
+    for _ in embed_batches(["прогрев"]):
+        pass
+
+def _cache_samples():
+    if not _cache_enabled:
+        return []
+    st = cache.stats()
+    return [("embed_cache_lookups_total", "counter", {"result": "lru_hit"}, st["hits"] - st["disk_hits"]),
+            ("embed_cache_lookups_total", "counter", {"result": "disk_hit"}, st["disk_hits"]),
+            ("embed_cache_lookups_total", "counter", {"result": "miss"}, st["misses"]),
+            ("embed_cache_lru_size", "gauge", {}, st["lru_size"])]
+
+metrics.register(_cache_samples)
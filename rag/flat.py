@@ -0,0 +1,87 @@
+import json
+from pathlib import Path
+from typing import List, Optional, Sequence, Tuple
+import numpy as np
+from rag.bm25 import top_k
+
+# Bump when the on-disk layout changes; older snapshots then fall back to Chroma.
+FORMAT_VERSION = 1
+
+
+def normalize(vectors: np.ndarray) -> np.ndarray:
+    """Unit-length float32 rows (all-zero rows stay zero)."""
+    vectors = np.asarray(vectors, dtype=np.float32)
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    return np.ascontiguousarray(vectors / np.maximum(norms, np.float32(1e-12)))
+
+
+class FlatIndex:
+    """Exact cosine search over a contiguous float32 matrix.
+
+    Row ``i`` is the normalized embedding of snapshot chunk ``i``, so program
+    masks and hit metadata come straight from the snapshot. A batch of queries
+    is one matrix product against the (optionally memory-mapped) matrix plus
+    ``top_k`` per row. Distances are squared L2 between unit vectors
+    (``2 - 2 cos``), the same scale Chroma reports with its default space.
+    """
+
+    def __init__(self, vectors: np.ndarray, provider: str = "", model: str = ""):
+        self.vectors = vectors
+        self.provider = provider
+        self.model = model
+
+    def __len__(self) -> int:
+        return len(self.vectors)
+
+    @property
+    def dim(self) -> int:
+        return self.vectors.shape[1] if self.vectors.ndim == 2 else 0
+
+    def search(self, queries: np.ndarray, k: int,
+               docs: Optional[Sequence[Optional[np.ndarray]]] = None) -> List[Tuple[np.ndarray, np.ndarray]]:
+        """(rows, distances) per query; ``docs`` restricts each query to sorted rows."""
+        if not len(queries):
+            return []
+        sims = normalize(queries) @ self.vectors.T
+        docs = docs or [None] * len(queries)
+        out = []
+        for row, d in zip(sims, docs):
+            top = top_k(row, k, d)
+            out.append((top, 2.0 - 2.0 * row[top].astype(np.float64)))
+        return out
+
+    def take(self, rows: np.ndarray) -> "FlatIndex":
+        return FlatIndex(np.ascontiguousarray(self.vectors[rows]), self.provider, self.model)
+
+    def append(self, vectors: np.ndarray) -> "FlatIndex":
+        vectors = normalize(vectors)
+        if len(self.vectors) and len(vectors) and vectors.shape[1] != self.dim:
+            raise ValueError(f"Embedding size changed from {self.dim} to {vectors.shape[1]}")
+        merged = np.concatenate([self.vectors, vectors]) if len(self.vectors) else vectors
+        return FlatIndex(np.ascontiguousarray(merged, dtype=np.float32), self.provider, self.model)
+
+    def save(self, path: Path) -> None:
+        path = Path(path)
+        path.mkdir(parents=True, exist_ok=True)
+        np.save(path / "vectors.npy", np.ascontiguousarray(self.vectors, dtype=np.float32), allow_pickle=False)
+        meta = {"format": FORMAT_VERSION, "rows": len(self), "dim": self.dim,
+                "provider": self.provider, "model": self.model}
+        (path / "meta.json").write_text(json.dumps(meta), encoding="utf-8")
+
+    @classmethod
+    def load(cls, path: Path, mmap: bool = False) -> "FlatIndex":
+        """Load saved vectors; with ``mmap`` worker processes share the pages via the page cache."""
+        path = Path(path)
+        meta = json.loads((path / "meta.json").read_text(encoding="utf-8"))
+        if meta.get("format") != FORMAT_VERSION:
+            raise ValueError(f"Unsupported flat index format {meta.get('format')} in {path}")
+        vectors = np.load(path / "vectors.npy", mmap_mode="r" if mmap else None, allow_pickle=False)
+        return cls(vectors, meta.get("provider", ""), meta.get("model", ""))
+
+    @staticmethod
+    def rows(path: Path) -> int:
+        # Corpus size without touching the matrix, for the backend choice
+        try:
+            return int(json.loads((Path(path) / "meta.json").read_text(encoding="utf-8"))["rows"])
+        except (OSError, ValueError, KeyError):
+            return -1
@@ -0,0 +1,96 @@
+"""Fusion of ranked hit lists (BM25, vector) into one top-k list.
+
+Hits are dicts with an ``id``; inputs are never modified. ``rrf`` is weighted
+reciprocal rank fusion, ``normalized`` min-max scales each list's scores and
+sums them. ``settled`` tells the caller whether fetching deeper lists could
+still change the RRF top k, so hybrid search can stop at depth k when the
+retrievers agree.
+"""
+from typing import Dict, List, Optional, Sequence
+from utils import env
+
+RRF_K = int(env("RRF_K", "60"))
+METHOD = env("FUSION", "rrf")
+WEIGHTS = tuple(float(w) for w in env("FUSION_WEIGHTS", "1,1").split(","))
+
+Hits = Sequence[Dict]
+
+
+def _weights(lists: Sequence[Hits], weights: Optional[Sequence[float]]) -> Sequence[float]:
+    weights = WEIGHTS if weights is None else weights
+    if len(weights) != len(lists):
+        raise ValueError(f"{len(weights)} fusion weights for {len(lists)} lists")
+    return weights
+
+def _merge(lists: Sequence[Hits], scores: Dict[str, float], k: int) -> List[Dict]:
+    # Fresh dicts carrying the fields (and per-retriever scores) of every list that had the hit
+    items: Dict[str, Dict] = {}
+    for hits in lists:
+        for h in hits:
+            if h["id"] in scores:
+                items[h["id"]] = {**h, **items[h["id"]]} if h["id"] in items else dict(h)
+    order = sorted(scores, key=lambda i: scores[i], reverse=True)[:k]
+    return [dict(items[i], score=float(scores[i])) for i in order]
+
+def _rrf_scores(lists: Sequence[Hits], weights: Sequence[float], c: int) -> Dict[str, float]:
+    scores: Dict[str, float] = {}
+    for hits, w in zip(lists, weights):
+        seen = set()
+        for rank, h in enumerate(hits):
+            if h["id"] in seen:
+                continue
+            seen.add(h["id"])
+            scores[h["id"]] = scores.get(h["id"], 0.0) + w / (c + rank + 1)
+    return scores
+
+
+def rrf(lists: Sequence[Hits], k: int, weights: Optional[Sequence[float]] = None, c: int = RRF_K) -> List[Dict]:
+    """Weighted reciprocal rank fusion: sum of ``w / (c + rank)`` over the lists."""
+    return _merge(lists, _rrf_scores(lists, _weights(lists, weights), c), k)
+
+def normalized(lists: Sequence[Hits], keys: Sequence[str], k: int, weights: Optional[Sequence[float]] = None,
+               lower_is_better: Sequence[bool] = ()) -> List[Dict]:
+    """Weighted sum of min-max normalized scores; ``keys`` names the score field of each list."""
+    weights = _weights(lists, weights)
+    scores: Dict[str, float] = {}
+    for n, (hits, key, w) in enumerate(zip(lists, keys, weights)):
+        if not hits:
+            continue
+        flip = n < len(lower_is_better) and lower_is_better[n]
+        vals = [-h[key] if flip else h[key] for h in hits]
+        lo, hi = min(vals), max(vals)
+        for h, v in zip(hits, vals):
+            norm = (v - lo) / (hi - lo) if hi > lo else 1.0
+            scores[h["id"]] = scores.get(h["id"], 0.0) + w * norm
+    return _merge(lists, scores, k)
+
+def settled(lists: Sequence[Hits], k: int, depth: int, weights: Optional[Sequence[float]] = None,
+            c: int = RRF_K) -> bool:
+    """True when no hit below ``depth`` in any list could enter the RRF top k.
+
+    Threshold test: the k-th fused score (counting only ranks seen so far)
+    must be at least the best score any other document could still reach if
+    its missing ranks were just below ``depth``. Lists shorter than ``depth``
+    are exhausted and contribute nothing more.
+    """
+    weights = _weights(lists, weights)
+    scores = _rrf_scores(lists, weights, c)
+    if len(scores) < k:
+        return all(len(hits) < depth for hits in lists)
+    ids = [{h["id"] for h in hits} for hits in lists]
+    tail = [w / (c + depth + 1) if len(hits) >= depth else 0.0 for hits, w in zip(lists, weights)]
+    order = sorted(scores, key=lambda i: scores[i], reverse=True)
+    kth = scores[order[k - 1]]
+    bound = sum(tail)  # a document in no list yet
+    for i in order[k:]:
+        bound = max(bound, scores[i] + sum(t for t, s in zip(tail, ids) if i not in s))
+    return kth >= bound
+
+
+def fuse(lists: Sequence[Hits], k: int, method: str = METHOD, weights: Optional[Sequence[float]] = None) -> List[Dict]:
+    """Fuse [bm25 hits, vector hits] with the configured method."""
+    if method == "rrf":
+        return rrf(lists, k, weights)
+    if method == "score":
+        return normalized(lists, ("score_bm25", "score_vec"), k, weights, lower_is_better=(False, True))
+    raise ValueError(f"Unknown fusion method {method!r}")
@@ -1,27 +1,38 @@
-import json, os, sqlite3
+import hashlib, json, os, shutil, sqlite3, sys, time
 from pathlib import Path
-from typing import List, Dict
+from typing import List, Dict, Optional, Tuple
+import numpy as np
 import chromadb
 from chromadb.config import Settings
-from rank_bm25 import BM25Okapi
+from rag import embeddings
 from rag.embeddings import embed
+from rag.analyzer import analyze
+from rag.bm25 import BM25Index
+from rag.flat import FlatIndex
+from rag.retrieve import Retriever, chunk_id
+from rag.answer import precompute_answers
+from scraper.store import read_plan
 
 BASE = Path(__file__).resolve().parent.parent
 NORM = BASE / "data" / "normalized"
+DB = BASE / "data" / "plans.sqlite"
+PROGRAMS = ["AI", "AI Product"]
 IDX = BASE / "data" / "index"
 IDX.mkdir(parents=True, exist_ok=True)
+UPSERT_BATCH = 512
 
 def load_chunks() -> List[Dict]:
     chunks = []
-    for name in ["AI.json", "AI_Product.json"]:
-        p = NORM / name
-        if not p.exists():
+    for program in PROGRAMS:
+        try:
+            data = read_plan(program, DB, NORM)
+        except FileNotFoundError:
             continue
-        data = json.loads(p.read_text(encoding="utf-8"))
+        seen: Dict[str, int] = {}
         for c in data["courses"]:
             text = f"{c['name']} — {c['module']} — {c['ects']} ECTS — семестр {c['semester']}"
             chunks.append({
-                "id": f"{data['program']}-{c['source_ref']}",
+                "id": chunk_id(data["program"], c["source_ref"], seen),
                 "program": data["program"],
                 "text": text,
                 "source_ref": c["source_ref"],
@@ -29,28 +40,117 @@ def load_chunks() -> List[Dict]:
             })
     return chunks
 
-def build():
+def chunk_hash(ch: Dict) -> str:
+    return hashlib.sha256(json.dumps(ch, sort_keys=True, ensure_ascii=False).encode("utf-8")).hexdigest()
+
+def load_previous() -> Optional[Tuple[List[Dict], Dict[str, str], BM25Index]]:
+    # Chunks, manifest and BM25 of the live snapshot, or None if there is nothing to diff against
+    try:
+        version = (IDX / "VERSION").read_text(encoding="utf-8").strip()
+        snap_dir = IDX / "snapshots" / version
+        chunks = json.loads((snap_dir / "chunks.json").read_text(encoding="utf-8"))
+        manifest = json.loads((snap_dir / "manifest.json").read_text(encoding="utf-8"))
+        return chunks, manifest, BM25Index.load(snap_dir / "bm25")
+    except (OSError, ValueError):
+        return None
+
+def previous_vectors() -> Optional[FlatIndex]:
+    # Flat vectors of the live snapshot, if they came from the current embedding model
+    try:
+        version = (IDX / "VERSION").read_text(encoding="utf-8").strip()
+        flat = FlatIndex.load(IDX / "snapshots" / version / "flat")
+    except (OSError, ValueError):
+        return None
+    if (flat.provider, flat.model) != (embeddings._provider, embeddings.MODEL_NAME):
+        return None
+    return flat
+
+def build(full: bool = False):
     chunks = load_chunks()
     if not chunks:
         print("[!] No normalized JSON found. Run `make scrape` first.")
         return
 
-    # Vector index with Chroma
+    manifest = {ch["id"]: chunk_hash(ch) for ch in chunks}
+    prev = None if full else load_previous()
+    if prev is not None:
+        old_chunks, old_manifest, old_bm25 = prev
+        changed = [ch for ch in chunks if old_manifest.get(ch["id"]) != manifest[ch["id"]]]
+        removed = [cid for cid in old_manifest if cid not in manifest]
+        if not changed and not removed:
+            print(f"[i] Index is up to date ({len(chunks)} chunks)")
+            return
+        drop = set(removed) | {ch["id"] for ch in changed}
+        positions = [i for i, ch in enumerate(old_chunks) if ch["id"] in drop]
+        all_chunks = [ch for ch in old_chunks if ch["id"] not in drop] + changed
+        bm25 = old_bm25.update(positions, (analyze(ch["text"]) for ch in changed))
+        old_flat = previous_vectors()
+        if old_flat is not None and len(old_flat) == len(old_chunks):
+            old_flat = old_flat.take(np.asarray([i for i, ch in enumerate(old_chunks) if ch["id"] not in drop], dtype=np.int64))
+        else:
+            old_flat = None
+    else:
+        changed, removed = chunks, None
+        all_chunks = chunks
+        bm25 = BM25Index.build(analyze(ch["text"]) for ch in chunks)
+        old_flat = None
+
+    # Vector index with Chroma: upsert/delete in place, so live queries never see an empty collection
     client = chromadb.Client(Settings(is_persistent=True, persist_directory=str(IDX)))
     coll = client.get_or_create_collection("itmo_courses")
-    coll.delete(where={})
-    embeddings = embed([ch["text"] for ch in chunks])
-    ids = [ch["id"] for ch in chunks]
-    metadatas = [{"program": ch["program"], "source_ref": ch["source_ref"], "source_url": ch["source_url"]} for ch in chunks]
-    coll.add(ids=ids, embeddings=embeddings, metadatas=metadatas, documents=[ch["text"] for ch in chunks])
-
-    # BM25 index (simple serialized object)
-    corpus = [ch["text"] for ch in chunks]
-    bm25 = BM25Okapi([t.split() for t in corpus])
-    import pickle
-    with open(IDX / "bm25.pkl", "wb") as f:
-        pickle.dump({"bm25": bm25, "chunks": chunks}, f)
-    print(f"[i] Built vector and BM25 indexes with {len(chunks)} chunks")
+    if removed is None:
+        removed = [cid for cid in coll.get(include=[])["ids"] if cid not in manifest]
+    if removed:
+        coll.delete(ids=removed)
+    new_vecs = []
+    for i in range(0, len(changed), UPSERT_BATCH):
+        part = changed[i:i + UPSERT_BATCH]
+        vecs = embed([ch["text"] for ch in part])
+        new_vecs.append(vecs)
+        coll.upsert(
+            ids=[ch["id"] for ch in part],
+            embeddings=vecs,
+            metadatas=[{"program": ch["program"], "source_ref": ch["source_ref"], "source_url": ch["source_url"]} for ch in part],
+            documents=[ch["text"] for ch in part],
+        )
+
+    # BM25 index as versioned CSR arrays next to the chunk list and manifest
+    version = str(time.time_ns())
+    snap_dir = IDX / "snapshots" / version
+    bm25.save(snap_dir / "bm25")
+    # Flat float32 copy of the vectors, row-aligned with chunks.json (see rag.flat)
+    if old_flat is None:
+        kept = all_chunks[:len(all_chunks) - len(changed)]
+        new_vecs = ([embed([ch["text"] for ch in kept])] if kept else []) + new_vecs
+        flat = FlatIndex(np.zeros((0, 0), dtype=np.float32), embeddings._provider, embeddings.MODEL_NAME)
+    else:
+        flat = old_flat
+    if new_vecs:
+        flat = flat.append(np.concatenate(new_vecs))
+    flat.save(snap_dir / "flat")
+    (snap_dir / "chunks.json").write_text(json.dumps(all_chunks, ensure_ascii=False), encoding="utf-8")
+    (snap_dir / "manifest.json").write_text(json.dumps(manifest, ensure_ascii=False), encoding="utf-8")
+    # Answer the fixed bot queries against the new snapshot before publishing it
+    answers = precompute_answers(Retriever(IDX, NORM, version=version))
+    (snap_dir / "answers.json").write_text(json.dumps(answers, ensure_ascii=False), encoding="utf-8")
+    write_version(version)
+    prune_snapshots(keep=2)
+    mode = "full" if prev is None else "incremental"
+    print(f"[i] {mode.capitalize()} index build: {len(changed)} upserted, {len(removed)} removed, "
+          f"{len(all_chunks)} chunks (version {version})")
+
+def write_version(version: str) -> str:
+    # Bumped last, atomically: running retrievers hot-swap when they see it change.
+    tmp = IDX / "VERSION.tmp"
+    tmp.write_text(version, encoding="utf-8")
+    os.replace(tmp, IDX / "VERSION")
+    return version
+
+def prune_snapshots(keep: int = 2) -> None:
+    # Keep the previous snapshot around for retrievers still swapping over
+    snaps = sorted((p for p in (IDX / "snapshots").iterdir() if p.is_dir()), key=lambda p: int(p.name))
+    for p in snaps[:-keep]:
+        shutil.rmtree(p, ignore_errors=True)
 
 if __name__ == "__main__":
-    build()
+    build(full="--full" in sys.argv[1:])
@@ -0,0 +1,112 @@
+"""bge-m3 as an int8 ONNX model for CPU-only hosts (EMBEDDINGS_PROVIDER=onnx).
+
+    python -m rag.onnx_model export [--model BAAI/bge-m3] [--out data/models/bge-m3-int8]
+
+Export needs torch, transformers and onnx (build machine only); serving
+needs just onnxruntime and tokenizers. The artifact directory holds the
+dynamically quantized ``model.onnx``, the fast ``tokenizer.json`` and
+``meta.json``. Embeddings are the CLS vector, L2-normalized, as in the
+SentenceTransformer config of bge-m3.
+"""
+import argparse, json, shutil, tempfile
+from pathlib import Path
+from typing import List
+import numpy as np
+from utils import env
+
+BASE = Path(__file__).resolve().parent.parent
+MODEL = "BAAI/bge-m3"
+MODEL_DIR = Path(env("ONNX_MODEL_DIR", str(BASE / "data" / "models" / "bge-m3-int8")))
+MAX_LENGTH = int(env("ONNX_MAX_LENGTH", "512"))
+# Intra-op threads per session; 0 lets ONNX Runtime use every core. With several
+# API worker threads embedding at once, cores / API_THREADS avoids oversubscription.
+THREADS = int(env("ONNX_THREADS", "0"))
+
+
+class OnnxEncoder:
+    def __init__(self, model_dir: Path = MODEL_DIR, threads: int = THREADS, max_length: int = MAX_LENGTH):
+        import onnxruntime as ort
+        from tokenizers import Tokenizer
+        model_dir = Path(model_dir)
+        if not (model_dir / "model.onnx").exists():
+            raise RuntimeError(f"No ONNX model in {model_dir}; run `python -m rag.onnx_model export` first")
+        self.meta = json.loads((model_dir / "meta.json").read_text(encoding="utf-8"))
+        self.tokenizer = Tokenizer.from_file(str(model_dir / "tokenizer.json"))
+        self.tokenizer.enable_truncation(min(max_length, self.meta["max_length"]))
+        self.tokenizer.enable_padding(pad_id=self.meta["pad_id"], pad_token=self.meta["pad_token"])
+        opts = ort.SessionOptions()
+        opts.intra_op_num_threads = threads
+        opts.inter_op_num_threads = 1
+        opts.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        self.session = ort.InferenceSession(str(model_dir / "model.onnx"), opts, providers=["CPUExecutionProvider"])
+        self.inputs = {i.name for i in self.session.get_inputs()}
+        self.dim = int(self.meta["dim"])
+
+    def encode(self, texts: List[str]) -> np.ndarray:
+        enc = self.tokenizer.encode_batch(texts)
+        feed = {
+            "input_ids": np.asarray([e.ids for e in enc], dtype=np.int64),
+            "attention_mask": np.asarray([e.attention_mask for e in enc], dtype=np.int64),
+        }
+        if "token_type_ids" in self.inputs:
+            feed["token_type_ids"] = np.zeros_like(feed["input_ids"])
+        hidden = self.session.run(None, {k: v for k, v in feed.items() if k in self.inputs})[0]
+        cls = hidden[:, 0].astype(np.float32)
+        return cls / np.maximum(np.linalg.norm(cls, axis=1, keepdims=True), np.float32(1e-12))
+
+
+def export(model: str = MODEL, out: Path = MODEL_DIR, max_length: int = MAX_LENGTH, opset: int = 17) -> Path:
+    """Export ``model`` to ONNX, quantize weights to int8 and cache it under ``out``."""
+    import torch
+    from onnxruntime.quantization import QuantType, quantize_dynamic
+    from transformers import AutoModel, AutoTokenizer
+    out = Path(out)
+    tok = AutoTokenizer.from_pretrained(model)
+    net = AutoModel.from_pretrained(model).eval()
+    sample = tok(["пример", "пример подлиннее"], padding=True, return_tensors="pt")
+    with tempfile.TemporaryDirectory() as tmp:
+        fp32 = Path(tmp) / "model.onnx"
+        print(f"[i] Exporting {model} to ONNX")
+        with torch.inference_mode():
+            torch.onnx.export(
+                net, (sample["input_ids"], sample["attention_mask"]), str(fp32),
+                input_names=["input_ids", "attention_mask"], output_names=["last_hidden_state"],
+                dynamic_axes={"input_ids": {0: "batch", 1: "seq"}, "attention_mask": {0: "batch", 1: "seq"},
+                              "last_hidden_state": {0: "batch", 1: "seq"}},
+                opset_version=opset,
+            )
+        print("[i] Quantizing weights to int8")
+        tmp_out = Path(tmp) / "int8"
+        tmp_out.mkdir()
+        quantize_dynamic(str(fp32), str(tmp_out / "model.onnx"), weight_type=QuantType.QInt8)
+        tok.backend_tokenizer.save(str(tmp_out / "tokenizer.json"))
+        meta = {"model": model, "max_length": max_length, "dim": int(net.config.hidden_size), "opset": opset,
+                "pad_id": int(tok.pad_token_id), "pad_token": tok.pad_token, "pooling": "cls", "quantization": "int8-dynamic"}
+        (tmp_out / "meta.json").write_text(json.dumps(meta, ensure_ascii=False, indent=2), encoding="utf-8")
+        # Built aside and moved into place, so an interrupted export never leaves half an artifact
+        if out.exists():
+            shutil.rmtree(out)
+        out.parent.mkdir(parents=True, exist_ok=True)
+        shutil.move(str(tmp_out), str(out))
+    size = sum(f.stat().st_size for f in out.iterdir()) / 2**20
+    print(f"[i] Wrote {out} ({size:.0f} MiB)")
+    return out
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser()
+    sub = ap.add_subparsers(dest="cmd", required=True)
+    ex = sub.add_parser("export", help="export and quantize the embedding model")
+    ex.add_argument("--model", default=MODEL)
+    ex.add_argument("--out", type=Path, default=MODEL_DIR)
+    ex.add_argument("--max-length", type=int, default=MAX_LENGTH)
+    ex.add_argument("--force", action="store_true", help="re-export even if the artifact exists")
+    args = ap.parse_args(argv)
+    if (args.out / "model.onnx").exists() and not args.force:
+        print(f"[i] {args.out} already exists (use --force to re-export)")
+        return
+    export(args.model, args.out, args.max_length)
+
+
+if __name__ == "__main__":
+    main()
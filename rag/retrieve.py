@@ -1,95 +1,338 @@
-from typing import List, Dict, Tuple
-import json, pickle, os
+from typing import List, Dict, Sequence, Tuple, Optional
+import json, logging, os, threading
+from dataclasses import dataclass, field
 from pathlib import Path
-import chromadb
-from chromadb.config import Settings
+import numpy as np
+from rag import fusion
+from rag.analyzer import analyze
 from rag.embeddings import embed
-from rank_bm25 import BM25Okapi
+from rag.bm25 import BM25Index
+from rag.flat import FlatIndex
+import metrics
 
 BASE = Path(__file__).resolve().parent.parent
 IDX = BASE / "data" / "index"
+NORM = BASE / "data" / "normalized"
+PLAN_FILES = ["AI.json", "AI_Product.json"]
+VERSION_FILE = "VERSION"
+SNAPSHOTS = "snapshots"
+# Memory-map BM25 and flat vector arrays so API worker processes share one copy via the page cache
+MMAP = os.getenv("BM25_MMAP", "1") not in ("0", "false", "no")
+# chroma | flat | auto: auto serves the snapshot's flat vectors up to FLAT_MAX_ROWS chunks, Chroma above
+VECTOR_BACKEND = os.getenv("VECTOR_BACKEND", "auto")
+FLAT_MAX_ROWS = int(os.getenv("FLAT_MAX_ROWS", "200000"))
+log = logging.getLogger(__name__)
+# One program filter (or None) per query of a batch
+Programs = Sequence[Optional[str]]
 
-def bm25_search(query: str, k: int = 8) -> List[Dict]:
-    pkl = IDX / "bm25.pkl"
+
+@dataclass(frozen=True)
+class Snapshot:
+    version: str
+    bm25: Optional[BM25Index]
     chunks: List[Dict]
-    if pkl.exists():
-        with open(pkl, "rb") as f:
-            data = pickle.load(f)
-        bm25 = data["bm25"]
-        chunks = data["chunks"]
-    else:
-        # Lightweight on-the-fly BM25 using normalized JSON if indexes are missing
-        base = BASE
-        norm = base / "data" / "normalized"
-        chunks = []
-        for name in ["AI.json", "AI_Product.json"]:
-            p = norm / name
-            if not p.exists():
-                continue
-            data = json.loads(p.read_text(encoding="utf-8"))
-            for c in data.get("courses", []):
-                text = f"{c['name']} — {c.get('module','')} — {c.get('ects',0)} ECTS — семестр {c.get('semester','')}"
-                chunks.append({
-                    "id": f"{data['program']}-{c['source_ref']}",
-                    "program": data["program"],
-                    "text": text,
-                    "source_ref": c["source_ref"],
-                    "source_url": data.get("source_url", "")
-                })
-        if not chunks:
-            return []
-        corpus_tokens = [ch["text"].split() for ch in chunks]
-        bm25 = BM25Okapi(corpus_tokens)
-    scores = bm25.get_scores(query.split())
-    pairs = sorted(zip(chunks, scores), key=lambda x: x[1], reverse=True)[:k]
-    out = []
-    for ch, sc in pairs:
-        ch2 = dict(ch)
-        ch2["score_bm25"] = float(sc)
-        out.append(ch2)
-    return out
+    collection: object = None
+    # Canned answers precomputed by the indexer for this version (see rag.answer.CANNED)
+    answers: Dict[str, Dict] = field(default_factory=dict)
+    # Flat vector backend; when set, the Chroma collection is not opened
+    vectors: Optional[FlatIndex] = None
+    # Sorted chunk rows per program: the BM25 pre-filter mask
+    programs: Dict[str, np.ndarray] = field(default_factory=dict)
+
+    def __post_init__(self):
+        if not self.programs:
+            rows: Dict[str, List[int]] = {}
+            for i, ch in enumerate(self.chunks):
+                rows.setdefault(ch.get("program", ""), []).append(i)
+            object.__setattr__(self, "programs", {p: np.asarray(r, dtype=np.int64) for p, r in rows.items()})
+
+
+def chunk_id(program: str, source_ref: str, seen: Dict[str, int]) -> str:
+    # source_ref repeats (row numbers restart per PDF table); later copies get their occurrence number
+    n = seen[source_ref] = seen.get(source_ref, 0) + 1
+    return f"{program}-{source_ref}" if n == 1 else f"{program}-{source_ref}#{n}"
+
+def _fallback_chunks(norm: Path) -> List[Dict]:
+    # Lightweight on-the-fly corpus from normalized JSON if indexes are missing
+    chunks = []
+    for name in PLAN_FILES:
+        p = norm / name
+        if not p.exists():
+            continue
+        data = json.loads(p.read_text(encoding="utf-8"))
+        seen: Dict[str, int] = {}
+        for c in data.get("courses", []):
+            text = f"{c['name']} — {c.get('module','')} — {c.get('ects',0)} ECTS — семестр {c.get('semester','')}"
+            chunks.append({
+                "id": chunk_id(data["program"], c["source_ref"], seen),
+                "program": data["program"],
+                "text": text,
+                "source_ref": c["source_ref"],
+                "source_url": data.get("source_url", "")
+            })
+    return chunks
+
+
+class Retriever:
+    """Process-wide, in-memory view of the BM25 and vector indexes.
+
+    Everything is loaded once into an immutable Snapshot. Queries only stat
+    the index VERSION file; when it changes a new snapshot is loaded and
+    swapped in with a single assignment, so in-flight queries keep the old one.
+    Passing ``version`` pins the retriever to one snapshot (used by the indexer
+    to warm a snapshot before publishing it).
+    """
+
+    def __init__(self, idx_dir: Path = IDX, norm_dir: Path = NORM, version: Optional[str] = None,
+                 backend: Optional[str] = None):
+        self.idx_dir = Path(idx_dir)
+        self.norm_dir = Path(norm_dir)
+        self.pinned = version
+        self.backend = backend or VECTOR_BACKEND
+        self._lock = threading.Lock()
+        self._snapshot: Optional[Snapshot] = None
+        self._stamp: Optional[Tuple] = None
+
+    def _current_stamp(self) -> Tuple:
+        if self.pinned is not None:
+            return (self.pinned,)
+        paths = [self.idx_dir / VERSION_FILE] + [self.norm_dir / n for n in PLAN_FILES]
+        stamp = []
+        for p in paths:
+            try:
+                st = os.stat(p)
+                stamp.append((st.st_mtime_ns, st.st_size))
+            except OSError:
+                stamp.append(None)
+        return tuple(stamp)
+
+    def _load(self, stamp: Tuple = ()) -> Snapshot:
+        version_path = self.idx_dir / VERSION_FILE
+        version = self.pinned
+        if version is None and version_path.exists():
+            version = version_path.read_text(encoding="utf-8").strip()
+        if version is not None:
+            snap_dir = self.idx_dir / SNAPSHOTS / version
+            if (snap_dir / "chunks.json").exists():
+                try:
+                    bm25 = BM25Index.load(snap_dir / "bm25", mmap=MMAP)
+                except ValueError as e:
+                    # Written by an older format/analyzer; serve the fallback until the next build
+                    log.warning("%s", e)
+                else:
+                    chunks = json.loads((snap_dir / "chunks.json").read_text(encoding="utf-8"))
+                    answers_path = snap_dir / "answers.json"
+                    answers = json.loads(answers_path.read_text(encoding="utf-8")) if answers_path.exists() else {}
+                    vectors = self._open_flat(snap_dir / "flat", len(chunks))
+                    coll = self._open_collection() if vectors is None else None
+                    return Snapshot(version, bm25, chunks, coll, answers, vectors=vectors)
+        chunks = _fallback_chunks(self.norm_dir)
+        bm25 = BM25Index.build(analyze(ch["text"]) for ch in chunks) if chunks else None
+        # Versioned by the plan files' stamp so answer cache keys change with the data
+        return Snapshot(f"fallback-{hash(stamp) & 0xFFFFFFFFFFFF:012x}", bm25, chunks, self._open_collection())
+
+    def _open_flat(self, path: Path, n_chunks: int) -> Optional[FlatIndex]:
+        if self.backend == "chroma":
+            return None
+        rows = FlatIndex.rows(path)
+        if rows != n_chunks or (self.backend == "auto" and rows > FLAT_MAX_ROWS):
+            return None
+        try:
+            return FlatIndex.load(path, mmap=MMAP)
+        except (OSError, ValueError) as e:
+            log.warning("flat vectors unusable, using Chroma: %s", e)
+            return None
+
+    def _open_collection(self):
+        # chromadb is heavy to import; only pay for it once an index is opened
+        try:
+            import chromadb
+            from chromadb.config import Settings
+        except ImportError:
+            return None
+        try:
+            # Persistent clients are cached per path; drop the cache so a rebuilt
+            # index written by another process is actually re-read.
+            from chromadb.api.client import SharedSystemClient
+            SharedSystemClient.clear_system_cache()
+        except Exception:
+            pass
+        try:
+            client = chromadb.Client(Settings(is_persistent=True, persist_directory=str(self.idx_dir)))
+            return client.get_collection("itmo_courses")
+        except Exception:
+            return None
+
+    def snapshot(self) -> Snapshot:
+        stamp = self._current_stamp()
+        snap = self._snapshot
+        if snap is not None and stamp == self._stamp:
+            return snap
+        with self._lock:
+            if self._snapshot is None or stamp != self._stamp:
+                with metrics.span("index.load"):
+                    self._snapshot = self._load(stamp)
+                self._stamp = stamp
+            return self._snapshot
+
+    def refresh(self) -> Snapshot:
+        return self.snapshot()
+
+    @property
+    def version(self) -> str:
+        return self.snapshot().version
+
+    def bm25_search(self, query: str, k: int = 8, program: Optional[str] = None) -> List[Dict]:
+        return self.bm25_search_batch([query], k, [program])[0]
 
-def vector_search(query: str, k: int = 8) -> List[Dict]:
-    try:
-        client = chromadb.Client(Settings(is_persistent=True, persist_directory=str(IDX)))
-        coll = client.get_collection("itmo_courses")
-    except Exception:
+    def bm25_search_batch(self, queries: List[str], k: int = 8, programs: Optional[Programs] = None) -> List[List[Dict]]:
+        with metrics.span("bm25"):
+            return self._bm25(self.snapshot(), queries, k, programs or [None] * len(queries))
+
+    def _bm25(self, snap: Snapshot, queries: List[str], k: int, programs: Programs) -> List[List[Dict]]:
+        if snap.bm25 is None or not snap.chunks:
+            return [[] for _ in queries]
+        empty = np.zeros(0, dtype=np.int64)
+        docs = [None if p is None else snap.programs.get(p, empty) for p in programs]
+        if len(queries) == 1:
+            top, scores = snap.bm25.top_k(snap.bm25.encode(queries[0]), k, docs[0])
+            tops, rows = [top], [scores]
+        else:
+            tops, rows = snap.bm25.top_k_batch([snap.bm25.encode(q) for q in queries], k, docs)
+        out = []
+        for top, scores in zip(tops, rows):
+            hits = []
+            for i in top.tolist():
+                ch2 = dict(snap.chunks[i])
+                ch2["score_bm25"] = float(scores[i])
+                hits.append(ch2)
+            out.append(hits)
+        return out
+
+    def vector_search(self, query: str, k: int = 8, program: Optional[str] = None) -> List[Dict]:
+        return self.vector_search_batch([query], k, [program])[0]
+
+    def vector_search_batch(self, queries: List[str], k: int = 8, programs: Optional[Programs] = None) -> List[List[Dict]]:
+        with metrics.span("vector"):
+            snap = self.snapshot()
+            if (snap.vectors is None and snap.collection is None) or not queries:
+                return [[] for _ in queries]
+            # One embedding call for the whole batch
+            return self._vector(snap, embed(list(queries)), k, programs or [None] * len(queries))
+
+    def _vector(self, snap: Snapshot, qvecs, k: int, programs: Programs) -> List[List[Dict]]:
+        if snap.vectors is not None:
+            return self._flat(snap, qvecs, k, programs)
+        return self._chroma(snap.collection, qvecs, k, programs)
+
+    def _flat(self, snap: Snapshot, qvecs, k: int, programs: Programs) -> List[List[Dict]]:
+        empty = np.zeros(0, dtype=np.int64)
+        docs = [None if p is None else snap.programs.get(p, empty) for p in programs]
+        with metrics.span("vector.flat"):
+            found = snap.vectors.search(np.asarray(qvecs), k, docs)
+        return [[dict(snap.chunks[i], score_vec=float(d)) for i, d in zip(rows.tolist(), dist.tolist())]
+                for rows, dist in found]
+
+    def _chroma(self, coll, qvecs, k: int, programs: Programs) -> List[List[Dict]]:
+        # One collection query per distinct program filter, pushed down as a metadata ``where``
+        groups: Dict[Optional[str], List[int]] = {}
+        for i, p in enumerate(programs):
+            groups.setdefault(p, []).append(i)
+        out: List[List[Dict]] = [[] for _ in programs]
+        for program, rows in groups.items():
+            where = {"program": program} if program is not None else None
+            with metrics.span("vector.chroma"):
+                res = coll.query(query_embeddings=[qvecs[i] for i in rows], n_results=k, where=where)
+            for q, row in enumerate(rows):
+                for i in range(len(res["ids"][q])):
+                    meta = res["metadatas"][q][i]
+                    out[row].append({
+                        "id": res["ids"][q][i],
+                        "text": res["documents"][q][i],
+                        "source_ref": meta["source_ref"],
+                        "source_url": meta["source_url"],
+                        "program": meta["program"],
+                        "score_vec": float(res["distances"][q][i]) if res.get("distances") else 0.0
+                    })
+        return out
+
+    def hybrid(self, query: str, k: int = 6, program: Optional[str] = None) -> List[Dict]:
+        return self.hybrid_batch([query], k, [program])[0]
+
+    def hybrid_batch(self, queries: List[str], k: int = 6, programs: Optional[Programs] = None) -> List[List[Dict]]:
+        """Fused top k per query, optionally restricted to one program per query.
+
+        BM25 goes 2k deep (every document is scored anyway). Chroma is queried
+        once at 2k, since a second round-trip costs more than the extra rows.
+        The in-memory flat backend first goes k deep and only the queries whose
+        RRF top k could still change (``fusion.settled``) search again at 2k.
+        """
+        with metrics.span("hybrid"):
+            snap = self.snapshot()
+            programs = programs or [None] * len(queries)
+            with metrics.span("bm25"):
+                a = self._bm25(snap, queries, k * 2, programs)
+            b: List[List[Dict]] = [[] for _ in queries]
+            qvecs = None
+            # Only the flat backend is cheap enough to search twice
+            staged = snap.vectors is not None and fusion.METHOD == "rrf"
+            if (snap.vectors is not None or snap.collection is not None) and queries:
+                with metrics.span("vector"):
+                    qvecs = embed(list(queries))
+                    b = self._vector(snap, qvecs, k if staged else k * 2, programs)
+            if staged:
+                with metrics.span("hybrid.fusion"):
+                    deep = [i for i in range(len(queries)) if not fusion.settled([a[i][:k], b[i]], k, k)]
+            else:
+                deep = list(range(len(queries)))
+            if staged and qvecs is not None and deep:
+                with metrics.span("vector"):
+                    for i, hits in zip(deep, self._vector(snap, [qvecs[i] for i in deep], k * 2,
+                                                          [programs[i] for i in deep])):
+                        b[i] = hits
+            metrics.inc("hybrid_queries_total", len(queries) - len(deep), depth="k")
+            metrics.inc("hybrid_queries_total", len(deep), depth="2k")
+            deep_set = set(deep)
+            with metrics.span("hybrid.fusion"):
+                return [fusion.fuse([a[i] if i in deep_set else a[i][:k], b[i]], k) for i in range(len(queries))]
+
+
+def _index_samples():
+    # Sizes of the snapshot the process-wide retriever is serving; never triggers a load
+    snap = _retriever._snapshot if _retriever is not None else None
+    if snap is None:
         return []
-    qvec = embed([query])[0]
-    res = coll.query(query_embeddings=[qvec], n_results=k)
-    out = []
-    for i in range(len(res.get("ids", [[]])[0])):
-        out.append({
-            "id": res["ids"][0][i],
-            "text": res["documents"][0][i],
-            "source_ref": res["metadatas"][0][i]["source_ref"],
-            "source_url": res["metadatas"][0][i]["source_url"],
-            "program": res["metadatas"][0][i]["program"],
-            "score_vec": float(res.get("distances", [[0.0]])[0][i])
-        })
+    out = [("index_chunks", "gauge", {}, len(snap.chunks)), ("index_info", "gauge", {"version": snap.version}, 1)]
+    if snap.bm25 is not None:
+        out += [("bm25_terms", "gauge", {}, len(snap.bm25.vocab)), ("bm25_postings", "gauge", {}, len(snap.bm25.doc_ids))]
+    if snap.vectors is not None:
+        out.append(("index_vectors", "gauge", {"backend": "flat"}, len(snap.vectors)))
+    elif snap.collection is not None:
+        try:
+            out.append(("index_vectors", "gauge", {"backend": "chroma"}, snap.collection.count()))
+        except Exception:
+            pass
     return out
 
-def hybrid(query: str, k: int = 6) -> List[Dict]:
-    a = bm25_search(query, k*2)
-    b = vector_search(query, k*2)
-    # simple fusion by normalized ranks
-    def rank_dict(lst, key):
-        return {lst[i]["id"]: i for i in range(len(lst))}
-    ra = rank_dict(a, "score_bm25") if a else {}
-    rb = rank_dict(b, "score_vec") if b else {}
-    merged = {}
-    for item in (a + b):
-        rid = item["id"]
-        merged.setdefault(rid, {"item": item, "ra": 1e6, "rb": 1e6})
-        if "score_bm25" in item:
-            merged[rid]["ra"] = min(merged[rid]["ra"], ra.get(rid, 1e6))
-        if "score_vec" in item:
-            merged[rid]["rb"] = min(merged[rid]["rb"], rb.get(rid, 1e6))
-    scored = []
-    for rid, v in merged.items():
-        score = 1/(1+v["ra"]) + 1/(1+v["rb"])
-        it = v["item"]
-        it["score"] = float(score)
-        scored.append(it)
-    scored.sort(key=lambda x: x["score"], reverse=True)
-    return scored[:k]
+
+_retriever: Optional[Retriever] = None
+_retriever_lock = threading.Lock()
+
+def get_retriever() -> Retriever:
+    global _retriever
+    if _retriever is None:
+        with _retriever_lock:
+            if _retriever is None:
+                _retriever = Retriever()
+    return _retriever
+
+metrics.register(_index_samples)
+
+def bm25_search(query: str, k: int = 8, program: Optional[str] = None) -> List[Dict]:
+    return get_retriever().bm25_search(query, k, program)
+
+def vector_search(query: str, k: int = 8, program: Optional[str] = None) -> List[Dict]:
+    return get_retriever().vector_search(query, k, program)
+
+def hybrid(query: str, k: int = 6, program: Optional[str] = None) -> List[Dict]:
+    return get_retriever().hybrid(query, k, program)
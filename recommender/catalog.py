@@ -0,0 +1,103 @@
+import os, threading, time
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence, Tuple
+from .rules import KEYWORDS
+from scraper.store import DB, NORM, read_plan
+import metrics
+
+
+@dataclass(frozen=True)
+class ProgramIndex:
+    """One program's plan plus an inverted index KEYWORDS key -> (elective ids, keyword hits)."""
+    plan: Dict
+    electives: List[Dict]
+    postings: Dict[str, List[Tuple[int, int]]]
+
+    def scores(self, keys: Sequence[str]) -> List[int]:
+        # Every matching keyword of every profile key is worth 2, as in the original scan
+        scores = [0] * len(self.electives)
+        for key in keys:
+            for i, hits in self.postings.get(key, ()):
+                scores[i] += 2 * hits
+        return scores
+
+    def ranked(self, keys: Sequence[str]) -> List[Tuple[int, Dict]]:
+        scores = self.scores(keys)
+        # Stable: ties keep plan order, like sorted(..., reverse=True) on the scan results
+        order = sorted(range(len(scores)), key=scores.__getitem__, reverse=True)
+        return [(scores[i], self.electives[i]) for i in order]
+
+
+def build_index(plan: Dict, keywords: Dict[str, List[str]] = KEYWORDS) -> ProgramIndex:
+    electives = [c for c in plan["courses"] if c["type"] == "elective"]
+    names = [c["name"].lower() for c in electives]
+    postings = {}
+    for key, kws in keywords.items():
+        hits = [(i, n) for i, n in enumerate(sum(kw in name for kw in kws) for name in names) if n]
+        if hits:
+            postings[key] = hits
+    return ProgramIndex(plan=plan, electives=electives, postings=postings)
+
+
+class PlanCatalog:
+    """Plans loaded once per process and reloaded when the store or JSON files change.
+
+    File stamps are checked at most every ``check_interval`` seconds per program.
+    """
+
+    def __init__(self, db_path: Path = DB, norm_dir: Path = NORM, keywords: Dict[str, List[str]] = KEYWORDS,
+                 check_interval: float = 1.0):
+        self.db_path = Path(db_path)
+        self.norm_dir = Path(norm_dir)
+        self.keywords = keywords
+        self.check_interval = check_interval
+        self._lock = threading.Lock()
+        self._programs: Dict[str, Tuple[tuple, ProgramIndex]] = {}
+        self._checked: Dict[str, float] = {}
+
+    def _stamp(self, program: str) -> tuple:
+        paths = [self.db_path, Path(f"{self.db_path}-wal"), self.norm_dir / f"{program.replace(' ', '_')}.json"]
+        out = []
+        for p in paths:
+            try:
+                st = os.stat(p)
+                out.append((st.st_mtime_ns, st.st_size))
+            except OSError:
+                out.append(None)
+        return tuple(out)
+
+    def get(self, program: str) -> ProgramIndex:
+        cached = self._programs.get(program)
+        now = time.monotonic()
+        if cached is not None and now - self._checked.get(program, 0.0) < self.check_interval:
+            return cached[1]
+        stamp = self._stamp(program)
+        self._checked[program] = now
+        if cached is not None and cached[0] == stamp:
+            return cached[1]
+        with self._lock:
+            cached = self._programs.get(program)
+            if cached is None or cached[0] != stamp:
+                with metrics.span("catalog.load"):
+                    index = build_index(read_plan(program, self.db_path, self.norm_dir), self.keywords)
+                cached = self._programs[program] = (stamp, index)
+                metrics.gauge("catalog_electives", len(index.electives), program=program)
+        return cached[1]
+
+    def plan(self, program: str) -> Dict:
+        return self.get(program).plan
+
+    def clear(self) -> None:
+        with self._lock:
+            self._programs.clear()
+            self._checked.clear()
+
+
+_catalog: Optional[PlanCatalog] = None
+
+def get_catalog() -> PlanCatalog:
+    global _catalog
+    if _catalog is None:
+        _catalog = PlanCatalog()
+    return _catalog
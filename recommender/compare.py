@@ -0,0 +1,144 @@
+import html, threading
+from collections import defaultdict
+from dataclasses import dataclass
+from typing import Dict, Iterable, List, Optional, Tuple
+from rag.analyzer import analyze
+from .catalog import ProgramIndex, get_catalog
+from workers import run_blocking
+import metrics
+
+PROGRAMS = ("AI", "AI Product")
+LIST_LIMIT = 10  # courses per list in the rendered text
+
+
+def canonical(name: str) -> str:
+    """Match key for course and module names: analyzed (case, ё, punctuation, inflection) terms."""
+    return " ".join(analyze(name)) or name.strip().lower()
+
+def _course(c: Dict) -> Dict:
+    return {k: c.get(k) for k in ("name", "module", "type", "ects", "semester", "source_ref")}
+
+def _totals(courses: Iterable[Dict], key: str) -> Dict[str, float]:
+    out: Dict[str, float] = defaultdict(float)
+    for c in courses:
+        out[str(c.get(key) or "")] += float(c.get("ects") or 0)
+    return dict(sorted(out.items()))
+
+def _ects(courses: Iterable[Dict]) -> float:
+    return sum(float(c.get("ects") or 0) for c in courses)
+
+def _semester(c: Dict) -> int:
+    return c.get("semester") or 0
+
+def _group(plan: Dict) -> Dict[str, List[Dict]]:
+    # Every copy of a repeated course (e.g. a language in several semesters) stays in its group
+    groups: Dict[str, List[Dict]] = defaultdict(list)
+    for c in plan["courses"]:
+        groups[canonical(c["name"])].append(c)
+    return groups
+
+def _modules(courses: List[Dict]) -> set:
+    return {canonical(c.get("module") or "") for c in courses}
+
+
+@dataclass(frozen=True)
+class Comparison:
+    a: str
+    b: str
+    data: Dict
+    text: str
+
+
+def build_comparison(a: str, pa: Dict, b: str, pb: Dict) -> Comparison:
+    """Shared and unique courses by canonical name, and ECTS per semester/module/type of both plans."""
+    ga, gb = _group(pa), _group(pb)
+    # By semester, then plan order (groups keep first-seen order, sorted() is stable)
+    keys = sorted((k for k in ga if k in gb), key=lambda k: _semester(ga[k][0]))
+    shared = [{"name": ga[k][0]["name"], a: [_course(c) for c in ga[k]], b: [_course(c) for c in gb[k]],
+               "same_module": _modules(ga[k]) == _modules(gb[k])} for k in keys]
+    unique = {a: [_course(c) for c in sorted((c for k, cs in ga.items() if k not in gb for c in cs), key=_semester)],
+              b: [_course(c) for c in sorted((c for k, cs in gb.items() if k not in ga for c in cs), key=_semester)]}
+    ects = {}
+    for prog, plan in ((a, pa), (b, pb)):
+        courses = plan["courses"]
+        ects[prog] = {
+            "total": _ects(courses),
+            "by_semester": _totals(courses, "semester"),
+            "by_module": _totals(courses, "module"),
+            "by_type": _totals(courses, "type"),
+        }
+    data = {
+        "programs": [a, b],
+        "versions": {a: pa.get("version", ""), b: pb.get("version", "")},
+        "shared": shared,
+        "unique": unique,
+        "ects": ects,
+        "summary": {
+            "shared": len(shared),
+            "shared_ects": {p: sum(_ects(s[p]) for s in shared) for p in (a, b)},
+            "unique": {p: len(unique[p]) for p in (a, b)},
+            "unique_ects": {p: _ects(unique[p]) for p in (a, b)},
+        },
+    }
+    return Comparison(a, b, data, render(data))
+
+
+def _fmt(x: float) -> str:
+    return f"{x:g}"
+
+def render(data: Dict) -> str:
+    """Bot (HTML) view of a comparison."""
+    a, b = data["programs"]
+    s = data["summary"]
+    esc = html.escape
+    parts = [f"<b>{esc(a)} vs {esc(b)}</b>\nОбщих дисциплин: {s['shared']} "
+             f"({_fmt(s['shared_ects'][a])} ECTS в {esc(a)}, {_fmt(s['shared_ects'][b])} в {esc(b)})"]
+    for prog in (a, b):
+        courses = data["unique"][prog]
+        lines = [f"• {esc(c['name'])} — {_fmt(c['ects'] or 0)} ECTS, семестр {c['semester']}" for c in courses[:LIST_LIMIT]]
+        if len(courses) > LIST_LIMIT:
+            lines.append(f"… и ещё {len(courses) - LIST_LIMIT}")
+        parts.append(f"<b>Только в {esc(prog)}</b> ({len(courses)}, {_fmt(s['unique_ects'][prog])} ECTS)\n" + "\n".join(lines))
+    for title, key, label in (("ECTS по семестрам", "by_semester", "семестр "), ("ECTS по модулям", "by_module", "")):
+        ta, tb = data["ects"][a][key], data["ects"][b][key]
+        rows = [f"{label}{esc(k)}: {_fmt(ta.get(k, 0))} · {_fmt(tb.get(k, 0))}" for k in sorted(set(ta) | set(tb))]
+        parts.append(f"<b>{title}</b> ({esc(a)} · {esc(b)})\n" + "\n".join(rows))
+    return "\n\n".join(parts)
+
+
+class ComparisonCache:
+    """One materialized Comparison per program pair, rebuilt when the catalog reloads either plan."""
+
+    def __init__(self, catalog=None):
+        self._catalog = catalog
+        self._lock = threading.Lock()
+        self._cache: Dict[Tuple[str, str], Tuple[ProgramIndex, ProgramIndex, Comparison]] = {}
+
+    @property
+    def catalog(self):
+        return self._catalog or get_catalog()
+
+    def get(self, a: str = PROGRAMS[0], b: str = PROGRAMS[1]) -> Comparison:
+        ia, ib = self.catalog.get(a), self.catalog.get(b)
+        cached = self._cache.get((a, b))
+        # Catalog indexes are replaced, never mutated, when a plan changes: identity is the version
+        if cached is not None and cached[0] is ia and cached[1] is ib:
+            return cached[2]
+        with self._lock:
+            cached = self._cache.get((a, b))
+            if cached is None or cached[0] is not ia or cached[1] is not ib:
+                with metrics.span("compare.build"):
+                    cached = self._cache[(a, b)] = (ia, ib, build_comparison(a, ia.plan, b, ib.plan))
+            return cached[2]
+
+
+_comparisons: Optional[ComparisonCache] = None
+
+def compare_programs(a: str = PROGRAMS[0], b: str = PROGRAMS[1]) -> Comparison:
+    global _comparisons
+    if _comparisons is None:
+        _comparisons = ComparisonCache()
+    return _comparisons.get(a, b)
+
+async def acompare_programs(a: str = PROGRAMS[0], b: str = PROGRAMS[1], block: bool = True) -> Comparison:
+    return await run_blocking(compare_programs, a, b, block=block)
@@ -1,27 +1,17 @@
-import json
-from pathlib import Path
 from typing import Dict, List
-from .rules import Profile, KEYWORDS
-
-BASE = Path(__file__).resolve().parent.parent
+from .rules import Profile
+from .catalog import get_catalog
+from .planner import build_schedule
+from workers import run_blocking
+import metrics
 
 def load_plan(program: str) -> Dict:
-    p = BASE / "data" / "normalized" / f"{program.replace(' ','_')}.json"
-    return json.loads(p.read_text(encoding="utf-8"))
+    return get_catalog().plan(program)
 
 def pick_electives(profile: Profile, program: str) -> Dict[str, List[Dict]]:
-    plan = load_plan(program)
-    electives = [c for c in plan["courses"] if c["type"] == "elective"]
-    # Score by keyword matches
-    def score_course(c):
-        name = c["name"].lower()
-        score = 0
-        for key in profile.background + profile.interests:
-            for kw in KEYWORDS.get(key, []):
-                if kw in name:
-                    score += 2
-        return score
-    scored = sorted([(score_course(c), c) for c in electives], key=lambda x: x[0], reverse=True)
+    # Score by keyword matches (precomputed postings per profile key)
+    with metrics.span("recommend.pick"):
+        scored = get_catalog().get(program).ranked(profile.background + profile.interests)
     pri = [c for s,c in scored if s>=2][:3]
     sec = [c for s,c in scored if 1<=s<2][:3]
     stretch = [c for s,c in scored if s==0][:3]
@@ -31,3 +21,15 @@ def pick_electives(profile: Profile, program: str) -> Dict[str, List[Dict]]:
         "secondary": sec,
         "stretch": stretch
     }
+
+async def apick_electives(profile: Profile, program: str, block: bool = True) -> Dict[str, List[Dict]]:
+    return await run_blocking(pick_electives, profile, program, block=block)
+
+def plan_electives(profile: Profile, program: str) -> Dict:
+    with metrics.span("recommend.plan"):
+        index = get_catalog().get(program)
+        scores = index.scores(profile.background + profile.interests)
+        return build_schedule(index.plan, index.electives, scores, profile.workload)
+
+async def aplan_electives(profile: Profile, program: str, block: bool = True) -> Dict:
+    return await run_blocking(plan_electives, profile, program, block=block)
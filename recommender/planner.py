@@ -0,0 +1,144 @@
+from typing import Dict, List, Optional, Sequence, Tuple
+
+# ECTS are solved in half-credit units so 1.5-credit courses stay exact
+UNIT = 0.5
+# Share of the (max - min) per-semester ECTS headroom a profile is willing to take on
+WORKLOAD_SLACK = {"low": 0.0, "medium": 0.5, "high": 1.0}
+
+NEG = float("-inf")
+
+
+def _units(ects: float) -> int:
+    return max(0, int(round(float(ects) / UNIT)))
+
+def _knapsack(items: Sequence[Tuple[int, int, float]], cap: int) -> Tuple[List[float], List[List[int]]]:
+    """0/1 knapsack over exact weights 0..cap.
+
+    ``items`` are (index, units, value). Returns best value per exact weight
+    and, for reconstruction, the items taken at each weight.
+    """
+    best = [NEG] * (cap + 1)
+    best[0] = 0.0
+    take: List[List[int]] = [[] for _ in range(cap + 1)]
+    reach = 0
+    for i, w, v in items:
+        if w > cap:
+            continue
+        # Only weights reachable so far can be extended; skips the empty tail of the table
+        top = min(cap, reach + w)
+        for e in range(top, w - 1, -1):
+            prev = best[e - w]
+            if prev != NEG and prev + v > best[e]:
+                best[e] = prev + v
+                take[e] = take[e - w] + [i]
+        reach = top
+    return best, take
+
+
+def _combine(options: List[Dict[int, float]], need: int) -> Optional[List[int]]:
+    # DP over semesters on total elective units, clamped at ``need`` (an at-least constraint)
+    states: Dict[int, Tuple[float, List[int]]] = {0: (0.0, [])}
+    for opts in options:
+        nxt: Dict[int, Tuple[float, List[int]]] = {}
+        for total, (value, picks) in states.items():
+            for e, v in opts.items():
+                t = min(need, total + e)
+                cand = value + v
+                if t not in nxt or cand > nxt[t][0]:
+                    nxt[t] = (cand, picks + [e])
+        states = nxt
+    if need in states:
+        return states[need][1]
+    return None
+
+
+def build_schedule(plan: Dict, electives: List[Dict], scores: Sequence[float], workload: str = "medium") -> Dict:
+    """Elective schedule maximizing relevance under the plan's ECTS rules.
+
+    Per semester, elective ECTS must cover ``min`` minus the required load and
+    stay under ``max`` minus it (narrowed by ``workload``); in total they must
+    reach ``rules.min_electives_ects``. Among equally relevant schedules the
+    one with fewer ECTS wins. Each semester is an exact knapsack; semesters
+    are then combined by a DP over total ECTS.
+    """
+    rules = plan.get("rules") or {}
+    constraints = rules.get("per_semester_constraints") or {}
+    slack = WORKLOAD_SLACK.get(workload, WORKLOAD_SLACK["medium"])
+    required: Dict[int, float] = {}
+    for c in plan["courses"]:
+        if c["type"] != "elective":
+            required[c["semester"]] = required.get(c["semester"], 0.0) + c["ects"]
+
+    by_sem: Dict[int, List[int]] = {}
+    for i, c in enumerate(electives):
+        by_sem.setdefault(c["semester"], []).append(i)
+    semesters = sorted(set(by_sem) | {int(s) for s in constraints})
+    total_units = sum(_units(c["ects"]) for c in electives)
+    # Relevance dominates; the ECTS term only breaks ties towards lighter schedules
+    big = total_units + 1
+
+    bounds, tables = {}, {}
+    for s in semesters:
+        idx = by_sem.get(s, [])
+        avail = sum(_units(electives[i]["ects"]) for i in idx)
+        rule = constraints.get(str(s), {})
+        req = _units(required.get(s, 0.0))
+        lo = max(0, _units(rule["min"]) - req) if "min" in rule else 0
+        hi = max(0, _units(rule["max"]) - req) if "max" in rule else avail
+        hi = min(hi, avail)
+        bounds[s] = (lo, hi, lo + int(slack * max(0, hi - lo)))
+        items = [(i, _units(electives[i]["ects"]), scores[i] * big - _units(electives[i]["ects"])) for i in idx]
+        tables[s] = _knapsack(items, hi)
+
+    warnings, feasible = [], True
+    need = _units(rules.get("min_electives_ects", 0))
+    picks = None
+    for capped in (True, False):
+        options = []
+        for s in semesters:
+            lo, hi, soft = bounds[s]
+            best = tables[s][0]
+            cap = min(soft, hi) if capped else hi
+            opts = {e: best[e] for e in range(lo, cap + 1) if best[e] != NEG}
+            if not opts:
+                # Not enough electives to cover the semester minimum: take the heaviest reachable load
+                e = max(e for e in range(hi + 1) if best[e] != NEG)
+                opts = {e: best[e]}
+                if capped:
+                    feasible = False
+                    warnings.append(f"semester {s}: electives cannot reach the {lo * UNIT:g} ECTS minimum")
+            options.append(opts)
+        picks = _combine(options, need)
+        if picks is not None:
+            if not capped:
+                warnings.append(f"workload '{workload}' raised to reach {need * UNIT:g} elective ECTS")
+            break
+    if picks is None:
+        picks = [max(opts) for opts in options]
+        feasible = False
+        warnings.append(f"electives cannot reach the {need * UNIT:g} ECTS programme minimum")
+
+    out_sem, total_ects, score = {}, 0.0, 0.0
+    for s, e in zip(semesters, picks):
+        chosen = [electives[i] for i in tables[s][1][e]]
+        ects = sum(c["ects"] for c in chosen)
+        rule = constraints.get(str(s), {})
+        out_sem[str(s)] = {
+            "required_ects": required.get(s, 0.0),
+            "elective_ects": ects,
+            "min": rule.get("min"),
+            "max": rule.get("max"),
+            "courses": chosen,
+        }
+        total_ects += ects
+        score += sum(scores[i] for i in tables[s][1][e])
+    return {
+        "program": plan.get("program"),
+        "workload": workload,
+        "semesters": out_sem,
+        "elective_ects": total_ects,
+        "min_electives_ects": rules.get("min_electives_ects"),
+        "score": score,
+        "feasible": feasible,
+        "warnings": warnings,
+    }
@@ -0,0 +1,142 @@
+import asyncio, hashlib, importlib.util, multiprocessing, re, time
+from functools import lru_cache
+from concurrent.futures import Executor, ProcessPoolExecutor
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Tuple
+import pandas as pd
+import pdfplumber
+
+# Optional backends for better table extraction; imported only when a page falls through to them
+@lru_cache(maxsize=None)
+def _available(module: str) -> bool:
+    try:
+        return importlib.util.find_spec(module) is not None
+    except (ImportError, ValueError):
+        return False
+
+PageTables = List[Tuple[int, pd.DataFrame]]
+
+
+def _pdfplumber_tables(pdf_path: Path, page: int) -> List[pd.DataFrame]:
+    with pdfplumber.open(str(pdf_path)) as pdf:
+        return [pd.DataFrame(t) for t in pdf.pages[page - 1].extract_tables() if t]
+
+def _camelot(flavor: str) -> Callable[[Path, int], List[pd.DataFrame]]:
+    def run(pdf_path: Path, page: int) -> List[pd.DataFrame]:
+        import camelot
+        return [t.df for t in camelot.read_pdf(str(pdf_path), pages=str(page), flavor=flavor)]
+    return run
+
+def _tabula(pdf_path: Path, page: int) -> List[pd.DataFrame]:
+    import tabula
+    return list(tabula.read_pdf(str(pdf_path), pages=page, multiple_tables=True))
+
+def _pdfplumber_text(pdf_path: Path, page: int) -> List[pd.DataFrame]:
+    with pdfplumber.open(str(pdf_path)) as pdf:
+        text = pdf.pages[page - 1].extract_text() or ""
+    rows = []
+    for line in text.splitlines():
+        # heuristic split by multiple spaces or tabs
+        parts = re.split(r"\s{2,}|\t", line.strip())
+        if len(parts) >= 4:
+            rows.append(parts)
+    return [pd.DataFrame(rows)] if rows else []
+
+def backends() -> List[Tuple[str, Callable[[Path, int], List[pd.DataFrame]]]]:
+    """Extractors in order of cost; the first one yielding a valid table wins a page."""
+    out = [("pdfplumber", _pdfplumber_tables)]
+    if _available("camelot"):
+        out += [("camelot-lattice", _camelot("lattice")), ("camelot-stream", _camelot("stream"))]
+    if _available("tabula"):
+        out.append(("tabula", _tabula))
+    out.append(("pdfplumber-text", _pdfplumber_text))
+    return out
+
+
+def _cells(df: pd.DataFrame) -> pd.DataFrame:
+    cells = df.fillna("").astype(str).apply(lambda col: col.str.strip())
+    cells = cells.loc[(cells != "").any(axis=1), (cells != "").any(axis=0)]
+    return cells
+
+def is_valid_table(df: pd.DataFrame) -> bool:
+    cells = _cells(df)
+    if cells.shape[0] < 2 or cells.shape[1] < 3:
+        return False
+    return bool((cells != "").to_numpy().mean() >= 0.5)
+
+def dedupe_tables(tables: List[pd.DataFrame]) -> List[pd.DataFrame]:
+    """Drop tables whose non-empty rows repeat or are contained in another table."""
+    rows = [frozenset(tuple(r) for r in _cells(df).itertuples(index=False)) for df in tables]
+    keep = []
+    seen = set()
+    for i, df in enumerate(tables):
+        h = hashlib.sha256(repr(sorted(rows[i])).encode("utf-8")).hexdigest()
+        if h in seen:
+            continue
+        if any(j != i and rows[i] < rows[j] for j in range(len(tables))):
+            continue
+        seen.add(h)
+        keep.append(df)
+    return keep
+
+
+def page_count(pdf_path: Path) -> int:
+    with pdfplumber.open(str(pdf_path)) as pdf:
+        return len(pdf.pages)
+
+def extract_page(pdf_path: Path, page: int) -> Tuple[int, List[pd.DataFrame], Dict]:
+    """Try backends cheapest-first on one page; runs in a worker process."""
+    started = time.perf_counter()
+    report = {"page": page, "backend": None, "tables": 0, "tried": []}
+    for name, fn in backends():
+        t0 = time.perf_counter()
+        try:
+            found = [df for df in fn(pdf_path, page) if is_valid_table(df)]
+        except Exception:
+            found = []
+        report["tried"].append({"backend": name, "seconds": round(time.perf_counter() - t0, 4)})
+        if found:
+            tables = dedupe_tables(found)
+            report.update(backend=name, tables=len(tables))
+            break
+    else:
+        tables = []
+    report["seconds"] = round(time.perf_counter() - started, 4)
+    return page, tables, report
+
+def _collect(results: List[Tuple[int, List[pd.DataFrame], Dict]]) -> Tuple[PageTables, List[Dict]]:
+    tables: PageTables = []
+    report = []
+    for page, dfs, rep in sorted(results, key=lambda r: r[0]):
+        tables.extend((page, df) for df in dfs)
+        report.append(rep)
+    return tables, report
+
+async def extract_tables_async(pdf_path: Path, pool: Executor) -> Tuple[PageTables, List[Dict]]:
+    loop = asyncio.get_running_loop()
+    n = await loop.run_in_executor(pool, page_count, pdf_path)
+    results = await asyncio.gather(*(loop.run_in_executor(pool, extract_page, pdf_path, p) for p in range(1, n + 1)))
+    return _collect(list(results))
+
+def process_pool(max_workers: Optional[int] = None) -> ProcessPoolExecutor:
+    # Spawned, not forked: the parent may already run threads (Chroma, ONNX Runtime, executor
+    # threads), and a fork can copy one of their held locks into a worker that then never starts.
+    return ProcessPoolExecutor(max_workers=max_workers, mp_context=multiprocessing.get_context("spawn"))
+
+def extract_tables(pdf_path: Path, max_workers: Optional[int] = None) -> Tuple[PageTables, List[Dict]]:
+    n = page_count(pdf_path)
+    with process_pool(max_workers) as pool:
+        results = list(pool.map(extract_page, [pdf_path] * n, range(1, n + 1)))
+    return _collect(results)
+
+def format_report(report: List[Dict]) -> str:
+    lines = []
+    for r in report:
+        lines.append(f"    page {r['page']:>3}: {r['backend'] or '-':<16} {r['seconds']:.3f}s, {r['tables']} table(s)")
+    total = sum(r["seconds"] for r in report)
+    wins: Dict[str, int] = {}
+    for r in report:
+        if r["backend"]:
+            wins[r["backend"]] = wins.get(r["backend"], 0) + 1
+    lines.append(f"    total {total:.3f}s of page work, backends: {wins or 'none'}")
+    return "\n".join(lines)
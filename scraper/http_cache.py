@@ -0,0 +1,47 @@
+import json, os
+from pathlib import Path
+from typing import Dict, Optional
+
+
+class HttpCache:
+    """Per-URL validators (ETag / Last-Modified) and content hashes for raw artifacts.
+
+    Stored as JSON next to the raw files so a scrape can issue conditional GETs
+    and tell whether a downloaded file actually changed.
+    """
+
+    def __init__(self, path: Path):
+        self.path = Path(path)
+        try:
+            self.entries: Dict[str, Dict] = json.loads(self.path.read_text(encoding="utf-8"))
+        except (OSError, ValueError):
+            self.entries = {}
+
+    def conditional_headers(self, url: str, dest: Path) -> Dict[str, str]:
+        entry = self.entries.get(url)
+        if not entry or not Path(dest).exists():
+            return {}
+        headers = {}
+        if entry.get("etag"):
+            headers["If-None-Match"] = entry["etag"]
+        if entry.get("last_modified"):
+            headers["If-Modified-Since"] = entry["last_modified"]
+        return headers
+
+    def sha256(self, url: str) -> Optional[str]:
+        return self.entries.get(url, {}).get("sha256")
+
+    def update(self, url: str, headers, sha256: str, dest: Path) -> None:
+        self.entries[url] = {
+            "etag": headers.get("etag"),
+            "last_modified": headers.get("last-modified"),
+            "sha256": sha256,
+            "path": str(dest),
+        }
+
+    def save(self) -> None:
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = self.path.with_suffix(".tmp")
+        tmp.write_text(json.dumps(self.entries, ensure_ascii=False, indent=2), encoding="utf-8")
+        os.replace(tmp, self.path)
+
@@ -0,0 +1,104 @@
+import re
+from functools import lru_cache
+from typing import Dict, List, Optional, Sequence, Tuple
+import numpy as np
+import pandas as pd
+from pydantic import TypeAdapter
+from scraper.schema import Course
+
+# Header aliases matched against table column names (first pass)
+COLUMN_ALIASES = {
+    "name": ["наименование", "дисцип", "name"],
+    "semester": ["сем", "semester"],
+    "ects": ["зет", "ects", "кредит"],
+    "type": ["тип", "type"],
+    "module": ["модул", "module"],
+    "code": ["код", "code"],
+}
+# Stricter aliases used when the header is the first data row (second pass)
+ROW_ALIASES = {
+    "name": [r"^наим", "дисцип"],
+    "semester": ["сем"],
+    "ects": ["зет", "кредит", "ects"],
+    "type": ["тип"],
+    "module": ["модул"],
+    "code": ["код"],
+}
+
+def _compile(aliases: Dict[str, List[str]]) -> Dict[str, re.Pattern]:
+    return {f: re.compile("|".join(a if a.startswith("^") else re.escape(a) for a in subs)) for f, subs in aliases.items()}
+
+_COLUMN_INDEX = _compile(COLUMN_ALIASES)
+_ROW_INDEX = _compile(ROW_ALIASES)
+_courses = TypeAdapter(List[Course])
+
+
+@lru_cache(maxsize=256)
+def _resolve(header: Tuple[str, ...], second_pass: bool) -> Dict[str, Optional[int]]:
+    # Position of the first column matching each field; tables on later pages share headers
+    index = _ROW_INDEX if second_pass else _COLUMN_INDEX
+    lowered = [h.lower() for h in header]
+    return {f: next((i for i, h in enumerate(lowered) if pat.search(h)), None) for f, pat in index.items()}
+
+DEFAULTS = {"name": "", "semester": "1", "ects": "0", "type": "", "module": "", "code": ""}
+
+def _columns(page, df: pd.DataFrame) -> Optional[Dict[str, np.ndarray]]:
+    # Raw cells of the canonical columns for one table (header resolved once per table)
+    cols = _resolve(tuple(str(c).strip() for c in df.columns), False)
+    # If name/ects/semester not found, try row 0 as header
+    if (cols["name"] is None or cols["ects"] is None or cols["semester"] is None) and len(df) > 1:
+        first = tuple(str(x).strip() for x in df.iloc[0].tolist())
+        if len(first) == df.shape[1]:
+            df = df.iloc[1:]
+            cols = _resolve(first, True)
+    n = len(df)
+    if n == 0:
+        return None
+    values = df.to_numpy(dtype=object)
+    out = {f: values[:, pos] if pos is not None else np.full(n, DEFAULTS[f], dtype=object) for f, pos in cols.items()}
+    out["page"] = np.full(n, str(page), dtype=object)
+    out["row"] = df.index.to_numpy(dtype=object)
+    return out
+
+def _records(cells: pd.DataFrame) -> List[Dict]:
+    # str() per cell keeps exactly the legacy rendering of NaN/None/floats
+    text = {f: cells[f].map(str) for f in DEFAULTS}
+    name = text["name"].str.strip()
+    keep = (name.str.len() >= 3) & ~name.str.lower().str.startswith("наименование")
+    if not keep.any():
+        return []
+    text = {f: s[keep] for f, s in text.items()}
+    cells, name = cells[keep], name[keep]
+
+    sem_tok = text["semester"].str.strip().str.split().str[0]
+    sem_ok = sem_tok.str.fullmatch(r"[+-]?[0-9]+", na=False)
+    semester = pd.to_numeric(sem_tok.where(sem_ok), errors="coerce").fillna(1).astype("int64")
+
+    ects_tok = text["ects"].str.replace(",", ".", regex=False).str.split().str[0]
+    ects = pd.to_numeric(ects_tok, errors="coerce").astype("float64")
+    literal_nan = ects_tok.str.lower().isin(["nan", "+nan", "-nan"])
+    ects = ects.where(ects.notna() | literal_nan, 0.0)
+
+    ctype = np.where(text["type"].str.lower().str.contains("выбор", regex=False), "elective", "required")
+    module = text["module"].str.strip().replace("", "Unknown")
+    code = text["code"].str.strip()
+    refs = "pdf:page=" + cells["page"] + ",row=" + cells["row"].map(str)
+
+    return [
+        {"code": c or None, "name": n, "semester": s, "ects": e, "type": t, "module": m, "source_ref": r}
+        for c, n, s, e, t, m, r in zip(code.tolist(), name.tolist(), semester.tolist(), ects.tolist(),
+                                       ctype.tolist(), module.tolist(), refs.tolist())
+    ]
+
+def normalize_tables(tables: Sequence[Tuple[int, pd.DataFrame]]) -> List[Course]:
+    """Column-oriented normalization.
+
+    Headers are resolved once per table; the canonical columns of all tables
+    are then concatenated and parsed with vectorized pandas string/numeric ops
+    in a single pass, and validated as one list.
+    """
+    parts = [c for c in (_columns(page, df) for page, df in tables) if c is not None]
+    if not parts:
+        return []
+    cells = pd.DataFrame({f: np.concatenate([p[f] for p in parts]) for f in parts[0]})
+    return _courses.validate_python(_records(cells))
@@ -20,7 +20,7 @@ class Rules(BaseModel):
     per_semester_constraints: Dict[str, Dict[str, int]]
 
 class Plan(BaseModel):
-    program: Literal["AI", "AI Product"]
+    program: str
     version: str
     source_url: str
     courses: List[Course]
@@ -0,0 +1,251 @@
+import hashlib, json, sqlite3, threading, time
+from pathlib import Path
+from typing import Dict, List, Optional
+from scraper.schema import Plan
+
+BASE = Path(__file__).resolve().parent.parent
+DB = BASE / "data" / "plans.sqlite"
+NORM = BASE / "data" / "normalized"
+SCHEMA_VERSION = 2
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS meta(key TEXT PRIMARY KEY, value INTEGER NOT NULL);
+CREATE TABLE IF NOT EXISTS plans(
+    id INTEGER PRIMARY KEY,
+    program TEXT NOT NULL,
+    version TEXT NOT NULL,
+    source_url TEXT NOT NULL,
+    rules TEXT NOT NULL,
+    content_hash TEXT NOT NULL,
+    created_at REAL NOT NULL,
+    active INTEGER NOT NULL DEFAULT 0,
+    UNIQUE(program, content_hash)
+);
+CREATE INDEX IF NOT EXISTS plans_program_active ON plans(program, active);
+CREATE TABLE IF NOT EXISTS courses(
+    plan_id INTEGER NOT NULL REFERENCES plans(id) ON DELETE CASCADE,
+    program TEXT NOT NULL,
+    ord INTEGER NOT NULL,
+    code TEXT,
+    name TEXT NOT NULL,
+    semester INTEGER NOT NULL,
+    ects REAL NOT NULL,
+    type TEXT NOT NULL,
+    module TEXT NOT NULL,
+    prerequisites TEXT NOT NULL,
+    notes TEXT,
+    source_ref TEXT NOT NULL,
+    UNIQUE(plan_id, ord)
+);
+CREATE INDEX IF NOT EXISTS courses_program_type_semester ON courses(program, type, semester);
+CREATE INDEX IF NOT EXISTS courses_plan ON courses(plan_id, ord);
+"""
+
+COURSE_COLUMNS = "code, name, semester, ects, type, module, prerequisites, notes, source_ref"
+_SELECT_COURSES = "SELECT c.program, " + ", ".join("c." + col.strip() for col in COURSE_COLUMNS.split(","))
+
+
+def plan_hash(plan: Plan) -> str:
+    body = plan.model_dump(exclude={"version"})
+    return hashlib.sha256(json.dumps(body, sort_keys=True, ensure_ascii=False).encode("utf-8")).hexdigest()
+
+
+class PlanStore:
+    """SQLite store of normalized plans (WAL, bulk inserts, FTS5 over course names/modules).
+
+    Several versions of a program's plan live side by side; exactly one is
+    active and readers only ever see active plans. Saving a plan and switching
+    the active version each happen in a single transaction.
+    """
+
+    def __init__(self, path: Path):
+        self.path = Path(path)
+        self._local = threading.local()
+        self.fts = True
+        self._migrate()
+
+    def _conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            conn = sqlite3.connect(str(self.path), timeout=30, isolation_level=None)
+            conn.row_factory = sqlite3.Row
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute("PRAGMA foreign_keys=ON")
+            self._local.conn = conn
+        return conn
+
+    def _migrate(self) -> None:
+        conn = self._conn()
+        (version,) = conn.execute("PRAGMA user_version").fetchone()
+        if version > SCHEMA_VERSION:
+            raise RuntimeError(f"{self.path} has schema v{version}, this code knows v{SCHEMA_VERSION}")
+        if version < SCHEMA_VERSION:
+            # Pre-store databases had a flat unindexed `courses` table; it is rebuilt from JSON by the scraper.
+            cols = {r["name"] for r in conn.execute("PRAGMA table_info(courses)")}
+            before, after = "", ""
+            if cols and "plan_id" not in cols:
+                before = "DROP TABLE courses;"
+            elif cols:
+                # v1 keyed courses by source_ref, which repeats across tables of a page: re-key by ord
+                before = ("ALTER TABLE courses RENAME TO courses_v1;"
+                          "DROP INDEX IF EXISTS courses_program_type_semester;DROP INDEX IF EXISTS courses_plan;")
+                after = (f"INSERT INTO courses(rowid, plan_id, program, ord, {COURSE_COLUMNS}) "
+                         f"SELECT rowid, plan_id, program, ord, {COURSE_COLUMNS} FROM courses_v1;DROP TABLE courses_v1;")
+            conn.executescript(f"BEGIN IMMEDIATE;{before}{SCHEMA}{after}PRAGMA user_version={SCHEMA_VERSION};COMMIT;")
+        try:
+            conn.execute("CREATE VIRTUAL TABLE IF NOT EXISTS courses_fts USING fts5(name, module, tokenize='unicode61')")
+        except sqlite3.OperationalError:
+            self.fts = False
+
+    def _bump(self, conn: sqlite3.Connection) -> None:
+        conn.execute("INSERT INTO meta(key, value) VALUES('revision', 1) "
+                     "ON CONFLICT(key) DO UPDATE SET value = value + 1")
+
+    def revision(self) -> int:
+        """Monotonic counter bumped by every save/activate; cheap change detection for readers."""
+        row = self._conn().execute("SELECT value FROM meta WHERE key='revision'").fetchone()
+        return row["value"] if row else 0
+
+    def save_plan(self, plan: Plan, activate: bool = True) -> int:
+        conn = self._conn()
+        digest = plan_hash(plan)
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            plan_id = conn.execute(
+                "INSERT INTO plans(program, version, source_url, rules, content_hash, created_at) VALUES (?,?,?,?,?,?) "
+                "ON CONFLICT(program, content_hash) DO UPDATE SET version=excluded.version, source_url=excluded.source_url "
+                "RETURNING id",
+                (plan.program, plan.version, plan.source_url, plan.rules.model_dump_json(), digest, time.time()),
+            ).fetchone()[0]
+            rows = [
+                (plan_id, plan.program, i, c.code, c.name, c.semester, c.ects, c.type, c.module,
+                 json.dumps(c.prerequisites, ensure_ascii=False), c.notes, c.source_ref)
+                for i, c in enumerate(plan.courses)
+            ]
+            # Re-saving the same content rewrites its rows; source_ref is not unique, so rows are keyed by ord
+            if self.fts:
+                conn.execute("DELETE FROM courses_fts WHERE rowid IN (SELECT rowid FROM courses WHERE plan_id=?)", (plan_id,))
+            conn.execute("DELETE FROM courses WHERE plan_id=?", (plan_id,))
+            conn.executemany(
+                f"INSERT INTO courses(plan_id, program, ord, {COURSE_COLUMNS}) VALUES (?,?,?,?,?,?,?,?,?,?,?,?)", rows)
+            if self.fts:
+                conn.execute("INSERT INTO courses_fts(rowid, name, module) SELECT rowid, name, module FROM courses WHERE plan_id=?", (plan_id,))
+            if activate:
+                self._activate(conn, plan.program, plan_id)
+            self._bump(conn)
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        return plan_id
+
+    def _activate(self, conn: sqlite3.Connection, program: str, plan_id: int) -> None:
+        conn.execute("UPDATE plans SET active=0 WHERE program=? AND active=1", (program,))
+        if conn.execute("UPDATE plans SET active=1 WHERE program=? AND id=?", (program, plan_id)).rowcount != 1:
+            raise KeyError(f"No plan {plan_id} for {program}")
+
+    def activate(self, program: str, plan_id: int) -> None:
+        conn = self._conn()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            self._activate(conn, program, plan_id)
+            self._bump(conn)
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+
+    def versions(self, program: str) -> List[Dict]:
+        rows = self._conn().execute(
+            "SELECT id, version, content_hash, created_at, active FROM plans WHERE program=? ORDER BY id", (program,))
+        return [dict(r) for r in rows]
+
+    def programs(self) -> List[str]:
+        return [r["program"] for r in self._conn().execute("SELECT program FROM plans WHERE active=1 ORDER BY program")]
+
+    def _course(self, row: sqlite3.Row) -> Dict:
+        c = {k: row[k] for k in ("code", "name", "semester", "ects", "type", "module", "notes", "source_ref")}
+        c["prerequisites"] = json.loads(row["prerequisites"])
+        return c
+
+    def courses(self, program: str, type: Optional[str] = None, semester: Optional[int] = None) -> List[Dict]:
+        sql = (f"SELECT {COURSE_COLUMNS} FROM courses WHERE program=? "
+               "AND plan_id=(SELECT id FROM plans WHERE program=? AND active=1)")
+        args: list = [program, program]
+        if type is not None:
+            sql += " AND type=?"
+            args.append(type)
+        if semester is not None:
+            sql += " AND semester=?"
+            args.append(semester)
+        return [self._course(r) for r in self._conn().execute(sql + " ORDER BY ord", args)]
+
+    def load_plan(self, program: str) -> Optional[Dict]:
+        """Active plan in the same shape as data/normalized/<program>.json."""
+        row = self._conn().execute(
+            "SELECT id, program, version, source_url, rules FROM plans WHERE program=? AND active=1", (program,)).fetchone()
+        if row is None:
+            return None
+        return {
+            "program": row["program"],
+            "version": row["version"],
+            "source_url": row["source_url"],
+            "courses": self.courses(program),
+            "rules": json.loads(row["rules"]),
+        }
+
+    def search(self, query: str, program: Optional[str] = None, limit: int = 20) -> List[Dict]:
+        """Full-text search over active course names/modules (prefix match per word)."""
+        words = "".join(ch if ch.isalnum() else " " for ch in query).split()
+        if not words:
+            return []
+        active = "c.plan_id IN (SELECT id FROM plans WHERE active=1)"
+        args: list = []
+        if self.fts:
+            sql = f"{_SELECT_COURSES} FROM courses_fts f JOIN courses c ON c.rowid=f.rowid WHERE courses_fts MATCH ? AND {active}"
+            args.append(" ".join(f'"{w}"*' for w in words))
+        else:
+            sql = f"{_SELECT_COURSES} FROM courses c WHERE {active}"
+            for w in words:
+                sql += " AND (c.name LIKE ? OR c.module LIKE ?)"
+                args += [f"%{w}%", f"%{w}%"]
+        if program is not None:
+            sql += " AND c.program=?"
+            args.append(program)
+        sql += " ORDER BY f.rank LIMIT ?" if self.fts else " ORDER BY c.rowid LIMIT ?"
+        args.append(limit)
+        out = []
+        for r in self._conn().execute(sql, args):
+            c = self._course(r)
+            c["program"] = r["program"]
+            out.append(c)
+        return out
+
+    def close(self) -> None:
+        conn = getattr(self._local, "conn", None)
+        if conn is not None:
+            conn.close()
+            self._local.conn = None
+
+
+_stores: Dict[Path, PlanStore] = {}
+_stores_lock = threading.Lock()
+
+def open_store(path: Path = DB) -> PlanStore:
+    path = Path(path)
+    with _stores_lock:
+        store = _stores.get(path)
+        if store is None:
+            store = _stores[path] = PlanStore(path)
+        return store
+
+def read_plan(program: str, db_path: Path = DB, norm_dir: Path = NORM) -> Dict:
+    """Active plan from the store; falls back to normalized JSON (a fresh checkout ships only JSON)."""
+    if Path(db_path).exists():
+        plan = open_store(db_path).load_plan(program)
+        if plan is not None:
+            return plan
+    p = Path(norm_dir) / f"{program.replace(' ', '_')}.json"
+    return json.loads(p.read_text(encoding="utf-8"))
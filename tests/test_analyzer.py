@@ -0,0 +1,13 @@
+from rag.analyzer import analyze, stem
+
+def test_inflections_share_a_term():
+    assert analyze("Семестр") == analyze("семестре") == analyze("семестров") == ["семестр"]
+    assert analyze("машинного обучения") == analyze("Машинное обучение")
+
+def test_noise_is_dropped():
+    assert analyze("Какие курсы есть — 6 ECTS?") == ["курс", "6"]
+    assert analyze("ёлка") == analyze("елка")
+
+def test_short_and_latin_words_are_kept():
+    assert stem("nlp") == "nlp" and stem("mlops") == "mlops"
+    assert stem("мы") == "мы" and stem("она") == "она"
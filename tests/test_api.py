@@ -0,0 +1,71 @@
+import json
+import pytest
+from fastapi.testclient import TestClient
+from api import main as api_main
+from rag.answer import answer
+
+ITEMS = [{"query": "какие выборные доступны?"}, {"query": "погода в Питере?"},
+         {"query": "какие выборные доступны?", "program": "AI"}, {"query": "семестр 3 ECTS"}]
+PROFILE = {"background": ["product"], "level": "junior", "interests": ["analytics"], "workload": "medium"}
+
+def test_ask_batch_matches_single_answers():
+    with TestClient(api_main.app) as client:
+        res = client.post("/ask/batch", json={"items": ITEMS})
+    assert res.status_code == 200
+    assert res.json() == [answer(i["query"], i.get("program")) for i in ITEMS]
+
+def test_batches_stream_ndjson_in_order(monkeypatch):
+    monkeypatch.setattr(api_main, "STREAM_CHUNK", 3)
+    items = [dict(PROFILE, program=p) for p in ["AI", "AI Product", "nope", "AI", "AI Product"]]
+    with TestClient(api_main.app) as client:
+        res = client.post("/recommend/batch?stream=true", json={"items": items})
+        single = client.post("/recommend", json=items[0]).json()
+    assert res.headers["content-type"].startswith("application/x-ndjson")
+    lines = [json.loads(l) for l in res.text.splitlines()]
+    assert [l["index"] for l in lines] == list(range(5))
+    assert "error" in lines[2] and {k: v for k, v in lines[0].items() if k != "index"} == single
+
+def test_batch_size_limits(monkeypatch):
+    monkeypatch.setattr(api_main, "BATCH_MAX", 2)
+    with TestClient(api_main.app) as client:
+        assert client.post("/ask/batch", json={"items": ITEMS}).status_code == 413
+        res = client.post("/ask/batch", json={"items": ITEMS}, headers={"accept": "application/x-ndjson"})
+    assert res.status_code == 200 and len(res.text.splitlines()) == len(ITEMS)
+
+def test_healthz_reports_warm_up():
+    with TestClient(api_main.app) as client:
+        res = client.get("/healthz")
+    body = res.json()
+    assert res.status_code == 200 and body["ready"]
+    assert {"embeddings", "retriever", "catalog:AI", "compare"} <= set(body["warmup"])
+
+def test_sheds_load_with_503_when_saturated(monkeypatch):
+    import threading
+    from workers import BoundedExecutor
+    release, started = threading.Event(), threading.Event()
+    def slow(query, program):
+        started.set()
+        release.wait(5)
+        return {"text": "ok", "citations": []}
+    with TestClient(api_main.app) as client:
+        monkeypatch.setattr(api_main, "executor", BoundedExecutor(max_workers=1, max_queue=0, name="test"))
+        monkeypatch.setattr(api_main, "answer", slow)
+        first = []
+        t = threading.Thread(target=lambda: first.append(client.post("/ask", json={"query": "q"})))
+        t.start()
+        assert started.wait(5)
+        shed = client.post("/ask", json={"query": "q"})
+        release.set()
+        t.join(5)
+    assert shed.status_code == 503 and shed.headers["retry-after"] == "1"
+    assert first[0].status_code == 200
+
+def test_compare_serves_the_materialized_comparison(monkeypatch):
+    from recommender import compare
+    with TestClient(api_main.app) as client:
+        res = client.get("/compare")
+        monkeypatch.setattr(api_main, "compare_programs", lambda a, b: pytest.fail(f"reached the catalog with {a!r}"))
+        bad = [client.get("/compare", params=p) for p in
+               ({"b": "nope"}, {"a": "../../etc/passwd"}, {"a": "AI/Product"}, {"b": "x" * 5000})]
+    assert res.status_code == 200 and res.json() == compare.compare_programs("AI", "AI Product").data
+    assert [r.status_code for r in bad] == [404] * 4
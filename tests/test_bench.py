@@ -0,0 +1,20 @@
+import json
+from bench.compare import compare
+from bench.run import PLAN_FILES, NORM, scaled_plans, summarize
+
+def test_scaled_plans_multiply_corpus(tmp_path):
+    scaled_plans(tmp_path, 3)
+    for name in PLAN_FILES:
+        base = json.loads((NORM / name).read_text(encoding="utf-8"))["courses"]
+        courses = json.loads((tmp_path / name).read_text(encoding="utf-8"))["courses"]
+        assert len(courses) == 3 * len(base)
+        assert len({c["source_ref"] for c in courses}) == len(courses)
+
+def test_summary_and_regression_check():
+    stats = summarize([0.001] * 98 + [0.1, 0.2], elapsed=1.0)
+    assert stats["n"] == 100 and stats["qps"] == 100 and stats["p50_ms"] == 1.0 and stats["p99_ms"] > 90
+    old = {"functions": {"hybrid": {"p95_ms": 2.0, "qps": 500}}, "indexer": {"1": {"build_s": 1.0}}}
+    new = {"functions": {"hybrid": {"p95_ms": 3.0, "qps": 450}}, "indexer": {"1": {"build_s": 1.1}}}
+    rows, regressed = compare(old, new, "p95_ms", 0.2)
+    assert regressed and [r[0] for r in rows if r[-1]] == ["functions:hybrid"]
+    assert not compare(old, new, "qps", 0.2)[1]
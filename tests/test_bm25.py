@@ -0,0 +1,71 @@
+import pathlib
+import numpy as np
+import pytest
+from rag.analyzer import analyze
+from rag.bm25 import BM25Index, top_k
+from rag.retrieve import _fallback_chunks
+
+BASE = pathlib.Path(__file__).resolve().parents[1]
+QUERIES = ["какие выборные доступны?", "Машинное обучение — core", "семестр 3", "6 ECTS", "нет такого слова"]
+
+def _corpus():
+    return [analyze(ch["text"]) for ch in _fallback_chunks(BASE / "data" / "normalized")]
+
+def test_scores_match_rank_bm25():
+    rank_bm25 = pytest.importorskip("rank_bm25")
+    corpus = _corpus()
+    ref = rank_bm25.BM25Okapi(corpus)
+    idx = BM25Index.build(corpus)
+    for q in QUERIES:
+        assert np.array_equal(idx.get_scores(analyze(q)), ref.get_scores(analyze(q)))
+
+def test_top_k_matches_full_sort():
+    idx = BM25Index.build(_corpus())
+    for q in QUERIES:
+        scores = idx.get_scores(analyze(q))
+        full = sorted(range(len(scores)), key=lambda i: scores[i], reverse=True)[:5]
+        assert top_k(scores, 5).tolist() == full
+
+def test_batch_scores_match_single_queries():
+    idx = BM25Index.build(_corpus())
+    queries = [analyze(q) for q in QUERIES] + [[]]
+    batch = idx.get_scores_batch(queries)
+    for row, q in zip(batch, queries):
+        assert np.array_equal(row, idx.get_scores(q))
+    tops, _ = idx.top_k_batch(queries, 3)
+    assert [t.tolist() for t in tops] == [idx.top_k(q, 3)[0].tolist() for q in queries]
+
+def test_save_load_roundtrip(tmp_path):
+    idx = BM25Index.build(_corpus())
+    idx.save(tmp_path / "bm25")
+    loaded = BM25Index.load(tmp_path / "bm25")
+    assert loaded.vocab == idx.vocab
+    assert np.array_equal(loaded.encode(QUERIES[2]), idx.encode(QUERIES[2]))
+    assert np.array_equal(loaded.get_scores(QUERIES[0].split()), idx.get_scores(QUERIES[0].split()))
+    mapped = BM25Index.load(tmp_path / "bm25", mmap=True)
+    assert isinstance(mapped.weights, np.memmap)
+    assert np.array_equal(mapped.get_scores_batch([analyze(q) for q in QUERIES]), idx.get_scores_batch([analyze(q) for q in QUERIES]))
+
+def test_update_matches_fresh_build():
+    corpus = _corpus()
+    idx = BM25Index.build(corpus)
+    changed = [analyze("Новый курс — elective — 3 ECTS — семестр 2")]
+    removed = [0, 5, 7]
+    updated = idx.update(removed, changed)
+    expected = BM25Index.build([d for i, d in enumerate(corpus) if i not in removed] + changed)
+    assert sorted(updated.vocab) == sorted(expected.vocab)
+    for q in QUERIES + ["Новый курс"]:
+        assert np.allclose(updated.get_scores(analyze(q)), expected.get_scores(analyze(q)))
+
+def test_queries_are_term_id_arrays():
+    idx = BM25Index.build(_corpus())
+    ids = idx.encode("Семестры, семестре — ECTS?")
+    assert ids.dtype == np.int64 and len(ids) == 2 and ids[0] == ids[1] == idx.term_ids["семестр"]
+    assert np.array_equal(idx.get_scores(ids), idx.get_scores(["семестр", "семестр"]))
+
+def test_load_rejects_other_analyzer(tmp_path, monkeypatch):
+    from rag import analyzer
+    BM25Index.build(_corpus()).save(tmp_path / "bm25")
+    monkeypatch.setattr(analyzer, "VERSION", analyzer.VERSION + 1)
+    with pytest.raises(ValueError):
+        BM25Index.load(tmp_path / "bm25")
@@ -0,0 +1,40 @@
+import itertools, json, os
+from recommender.catalog import PlanCatalog
+from recommender.rules import KEYWORDS
+
+NAMES = ["Статистика и вероятность", "Обработка естественного языка", "Продуктовая аналитика и метрики",
+         "Компьютерное зрение", "Философия", "MLOps и инфраструктура", "Рекомендательные системы", "История"]
+
+def _write(norm, names):
+    courses = [{"name": n, "semester": 2, "ects": 3, "type": "elective", "module": "M", "source_ref": f"r{i}"}
+               for i, n in enumerate(names)]
+    courses.append({"name": "Статистика (обяз.)", "semester": 1, "ects": 6, "type": "required", "module": "M", "source_ref": "req"})
+    (norm / "AI.json").write_text(json.dumps({"program": "AI", "courses": courses}, ensure_ascii=False), encoding="utf-8")
+
+def _scan(plan, keys):
+    # The original nested-loop scoring
+    out = []
+    for c in plan["courses"]:
+        if c["type"] != "elective":
+            continue
+        name = c["name"].lower()
+        out.append((sum(2 for key in keys for kw in KEYWORDS.get(key, []) if kw in name), c))
+    return sorted(out, key=lambda x: x[0], reverse=True)
+
+def test_postings_match_scan(tmp_path):
+    _write(tmp_path, NAMES)
+    catalog = PlanCatalog(tmp_path / "plans.sqlite", tmp_path)
+    index = catalog.get("AI")
+    keys = list(KEYWORDS) + ["unknown"]
+    for combo in itertools.chain(itertools.combinations(keys, 2), [("product", "analytics", "product")]):
+        assert index.ranked(list(combo)) == _scan(index.plan, combo)
+
+def test_reloads_when_plan_changes(tmp_path):
+    _write(tmp_path, NAMES)
+    catalog = PlanCatalog(tmp_path / "plans.sqlite", tmp_path, check_interval=0)
+    first = catalog.get("AI")
+    assert catalog.get("AI") is first
+    _write(tmp_path, NAMES[:3])
+    st = os.stat(tmp_path / "AI.json")
+    os.utime(tmp_path / "AI.json", ns=(st.st_atime_ns, st.st_mtime_ns + 10**9))
+    assert len(catalog.get("AI").electives) == 3
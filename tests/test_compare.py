@@ -0,0 +1,55 @@
+import json, os
+from recommender.catalog import PlanCatalog
+from recommender.compare import ComparisonCache, build_comparison, canonical
+
+def _plan(program, courses):
+    return {"program": program, "version": "v1", "courses": [
+        {"name": n, "module": m, "type": t, "ects": e, "semester": s, "source_ref": f"{program}:{i}"}
+        for i, (n, m, t, e, s) in enumerate(courses)]}
+
+AI = _plan("AI", [("Машинное обучение", "Основы ML", "core", 6, 1), ("Компьютерное зрение", "CV", "elective", 3, 2),
+                  ("Глубокое обучение", "Основы ML", "core", 6, 2), ("Английский язык", "Языки", "core", 3, 1)])
+PRODUCT = _plan("AI Product", [("Машинное  обучение.", "основы ml", "core", 5, 1), ("Продуктовая аналитика", "Продукт", "core", 6, 1),
+                               ("английский ЯЗЫК", "Языки", "core", 3, 2)])
+
+def test_canonical_ignores_case_punctuation_and_inflection():
+    assert canonical("Машинное  обучение.") == canonical("машинного обучения") == canonical("МАШИННОЕ ОБУЧЕНИЕ")
+    assert canonical("Машинное обучение") != canonical("Глубокое обучение")
+
+def test_shared_unique_and_totals():
+    data = build_comparison("AI", AI, "AI Product", PRODUCT).data
+    assert [s["name"] for s in data["shared"]] == ["Машинное обучение", "Английский язык"]
+    ml = data["shared"][0]
+    assert ml["AI"][0]["ects"] == 6 and ml["AI Product"][0]["ects"] == 5 and ml["same_module"]
+    assert [c["name"] for c in data["unique"]["AI"]] == ["Компьютерное зрение", "Глубокое обучение"]
+    assert [c["name"] for c in data["unique"]["AI Product"]] == ["Продуктовая аналитика"]
+    assert data["ects"]["AI"] == {"total": 18, "by_semester": {"1": 9, "2": 9},
+                                  "by_module": {"CV": 3, "Основы ML": 12, "Языки": 3}, "by_type": {"core": 15, "elective": 3}}
+    assert data["summary"] == {"shared": 2, "shared_ects": {"AI": 9, "AI Product": 8},
+                               "unique": {"AI": 2, "AI Product": 1}, "unique_ects": {"AI": 9, "AI Product": 6}}
+
+def test_repeated_courses_keep_every_copy():
+    ai = _plan("AI", [(c["name"], c["module"], c["type"], c["ects"], c["semester"]) for c in AI["courses"]]
+               + [("Английский язык", "Языки", "core", 3, 2), ("Компьютерное зрение", "CV", "elective", 3, 3)])
+    data = build_comparison("AI", ai, "AI Product", PRODUCT).data
+    english = next(s for s in data["shared"] if s["name"] == "Английский язык")
+    assert [c["semester"] for c in english["AI"]] == [1, 2] and len(english["AI Product"]) == 1
+    assert [c["semester"] for c in data["unique"]["AI"]] == [2, 2, 3]
+    s = data["summary"]
+    for p in ("AI", "AI Product"):
+        assert s["shared_ects"][p] + s["unique_ects"][p] == data["ects"][p]["total"]
+
+def test_materialized_once_per_plan_version(tmp_path):
+    for plan in (AI, PRODUCT):
+        (tmp_path / f"{plan['program'].replace(' ', '_')}.json").write_text(json.dumps(plan, ensure_ascii=False), encoding="utf-8")
+    cache = ComparisonCache(PlanCatalog(tmp_path / "plans.sqlite", tmp_path, check_interval=0))
+    first = cache.get("AI", "AI Product")
+    assert cache.get("AI", "AI Product") is first
+    assert "<b>Только в AI Product</b> (1, 6 ECTS)" in first.text
+    plan = dict(PRODUCT, courses=PRODUCT["courses"] + [dict(AI["courses"][1], source_ref="p:cv")])
+    path = tmp_path / "AI_Product.json"
+    path.write_text(json.dumps(plan, ensure_ascii=False), encoding="utf-8")
+    st = os.stat(path)
+    os.utime(path, ns=(st.st_atime_ns, st.st_mtime_ns + 10**9))
+    second = cache.get("AI", "AI Product")
+    assert second is not first and second.data["summary"]["shared"] == 3
@@ -0,0 +1,31 @@
+import numpy as np
+from rag.embed_cache import EmbeddingCache
+
+def _fake_model(calls):
+    def fn(texts):
+        calls.extend(texts)
+        return [[float(len(t)), 1.0] for t in texts]
+    return fn
+
+def test_repeated_texts_skip_model(tmp_path):
+    calls = []
+    cache = EmbeddingCache(tmp_path / "emb.sqlite")
+    embed = cache.cached("local", "m", _fake_model(calls))
+    out = embed(["план", "курс", "план"])
+    assert out.dtype == np.float32 and out.shape == (3, 2)
+    assert calls == ["план", "курс"]
+    embed(["курс", "  план "])
+    assert calls == ["план", "курс"]
+    assert cache.stats()["hits"] == 2 and cache.stats()["misses"] == 3
+
+def test_disk_store_survives_restart_and_is_bounded(tmp_path):
+    calls = []
+    first = EmbeddingCache(tmp_path / "emb.sqlite", max_rows=10)
+    first.cached("local", "m", _fake_model(calls))([f"t{i}" for i in range(5)])
+    first.close()
+    second = EmbeddingCache(tmp_path / "emb.sqlite", max_rows=10)
+    second.cached("local", "m", _fake_model(calls))(["t1", "t2"])
+    assert len(calls) == 5 and second.stats()["disk_hits"] == 2
+    second.cached("local", "other-model", _fake_model(calls))([f"t{i}" for i in range(20)])
+    (count,) = second._db().execute("SELECT COUNT(*) FROM embeddings").fetchone()
+    assert count <= 10
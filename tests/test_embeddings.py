@@ -0,0 +1,45 @@
+import numpy as np
+import pytest
+from rag import embeddings, openai_stub
+
+def test_embed_returns_float32_matrix():
+    out = embeddings.embed(["план", "курс", "семестр"])
+    assert isinstance(out, np.ndarray) and out.dtype == np.float32 and out.shape[0] == 3
+
+def test_length_batches_cover_window_in_length_order():
+    window = ["a", "ccc", "bb", "dddd", "e"]
+    batches = embeddings._length_batches(window, 2)
+    assert [len(window[i]) for b in batches for i in b] == [4, 3, 2, 1, 1]
+    assert sorted(i for b in batches for i in b) == list(range(5))
+
+def test_openai_batches_against_stub():
+    openai = pytest.importorskip("openai")
+    server = openai_stub.serve()
+    try:
+        host, port = server.server_address
+        client = openai.OpenAI(base_url=f"http://{host}:{port}/v1", api_key="stub")
+        texts = [f"курс {i}" for i in range(25)]
+        parts = list(embeddings.openai_batches(texts, client=client, batch_size=4, concurrency=3))
+        assert [p.shape[0] for p in parts] == [12, 12, 1]
+        out = np.concatenate(parts)
+        assert out.dtype == np.float32
+        assert np.allclose(out[7], openai_stub.fake_embedding(texts[7]))
+    finally:
+        server.shutdown()
+
+def test_onnx_int8_parity_with_pytorch():
+    # Needs the exported artifact (python -m rag.onnx_model export) and the PyTorch model to compare with
+    from rag import onnx_model
+    if not (onnx_model.MODEL_DIR / "model.onnx").exists():
+        pytest.skip("no exported ONNX model")
+    pytest.importorskip("onnxruntime")
+    pytest.importorskip("tokenizers")
+    st = pytest.importorskip("sentence_transformers")
+    texts = ["Машинное обучение — 6 ECTS — семестр 1", "какие выборные курсы есть по NLP?",
+             "Компьютерное зрение", "Product management for AI", "семестр 3"]
+    ref = st.SentenceTransformer(onnx_model.MODEL, device="cpu").encode(texts, normalize_embeddings=True)
+    out = onnx_model.OnnxEncoder(threads=2).encode(texts)
+    cos = np.sum(out * ref, axis=1)
+    # int8 dynamic quantization drifts a little; ranking-relevant structure must survive
+    assert cos.min() > 0.98 and cos.mean() > 0.99
+    assert np.array_equal(np.argsort(-(out @ out[1])), np.argsort(-(ref @ ref[1])))
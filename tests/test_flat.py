@@ -0,0 +1,96 @@
+import hashlib, json, pathlib
+import numpy as np
+import pytest
+from rag import indexer, retrieve
+from rag.flat import FlatIndex, normalize
+from rag.retrieve import Retriever
+
+BASE = pathlib.Path(__file__).resolve().parents[1]
+
+def _embed(texts):
+    # Bag of hashed words: distinct, deterministic vectors (the mock provider returns zeros)
+    out = np.zeros((len(texts), 64), dtype=np.float32)
+    for i, t in enumerate(texts):
+        for w in t.lower().split():
+            out[i, int(hashlib.md5(w.encode()).hexdigest(), 16) % 64] += 1
+    return normalize(out)
+
+@pytest.fixture
+def index(tmp_path, monkeypatch):
+    norm, idx = tmp_path / "normalized", tmp_path / "index"
+    norm.mkdir()
+    idx.mkdir()
+    for name in ("AI.json", "AI_Product.json"):
+        plan = json.loads((BASE / "data" / "normalized" / name).read_text(encoding="utf-8"))
+        (norm / name).write_text(json.dumps(plan, ensure_ascii=False), encoding="utf-8")
+    for mod, attr in ((indexer, "NORM"), (indexer, "IDX"), (indexer, "DB")):
+        monkeypatch.setattr(mod, attr, {"NORM": norm, "IDX": idx, "DB": tmp_path / "plans.sqlite"}[attr])
+    monkeypatch.setattr(indexer, "embed", _embed)
+    monkeypatch.setattr(retrieve, "embed", _embed)
+    indexer.build(full=True)
+    return norm, idx
+
+def test_search_matches_brute_force(tmp_path):
+    rng = np.random.default_rng(0)
+    vecs = rng.normal(size=(200, 16)).astype(np.float32)
+    flat = FlatIndex(normalize(vecs))
+    flat.save(tmp_path / "flat")
+    mapped = FlatIndex.load(tmp_path / "flat", mmap=True)
+    assert isinstance(mapped.vectors, np.memmap)
+    q = rng.normal(size=(3, 16)).astype(np.float32)
+    docs = np.arange(0, 200, 3)
+    for (rows, dist), (mrows, _), qv in zip(flat.search(q, 5), mapped.search(q, 5, [docs] * 3), q):
+        sims = normalize(vecs) @ normalize(qv[None])[0]
+        assert rows.tolist() == np.argsort(-sims)[:5].tolist()
+        assert np.allclose(dist, 2 - 2 * sims[rows], atol=1e-5)
+        assert mrows.tolist() == docs[np.argsort(-sims[docs])[:5]].tolist()
+
+def test_flat_agrees_with_chroma(index):
+    norm, idx = index
+    flat, chroma = Retriever(idx, norm, backend="flat"), Retriever(idx, norm, backend="chroma")
+    assert flat.snapshot().vectors is not None and flat.snapshot().collection is None
+    assert chroma.snapshot().vectors is None
+    for q, p in [("машинное обучение", None), ("компьютерное зрение", "AI"), ("продукт", "AI Product")]:
+        a, b = flat.vector_search(q, 5, p), chroma.vector_search(q, 5, p)
+        da, db = [h["score_vec"] for h in a], [h["score_vec"] for h in b]
+        assert np.allclose(da, db, atol=1e-4)
+        # Same hits up to ties at the cut-off distance
+        assert {h["id"] for h in a if h["score_vec"] < da[-1] - 1e-4} == {h["id"] for h in b if h["score_vec"] < da[-1] - 1e-4}
+        assert {h["program"] for h in a} <= {p or "AI", p or "AI Product"}
+
+def test_incremental_build_keeps_rows_aligned(index):
+    norm, idx = index
+    plan = json.loads((norm / "AI.json").read_text(encoding="utf-8"))
+    plan["courses"][0]["name"] = "Совсем новый курс"
+    plan["courses"].pop()
+    (norm / "AI.json").write_text(json.dumps(plan, ensure_ascii=False), encoding="utf-8")
+    indexer.build()
+    snap = Retriever(idx, norm, backend="flat").snapshot()
+    assert len(snap.vectors) == len(snap.chunks)
+    assert np.allclose(snap.vectors.vectors, _embed([ch["text"] for ch in snap.chunks]), atol=1e-6)
+
+def test_auto_falls_back_to_chroma_for_large_corpora(index, monkeypatch):
+    norm, idx = index
+    monkeypatch.setattr(retrieve, "FLAT_MAX_ROWS", 10)
+    snap = Retriever(idx, norm, backend="auto").snapshot()
+    assert snap.vectors is None and snap.collection is not None
+
+def test_hybrid_queries_chroma_once(index, monkeypatch):
+    norm, idx = index
+    queries = ["машинное обучение", "компьютерное зрение", "продукт", "семестр 3"]
+    calls = []
+    for backend, name in (("chroma", "_chroma"), ("flat", "_flat")):
+        r = Retriever(idx, norm, backend=backend)
+        search = getattr(r, name)
+        def counted(store, qvecs, k, programs, backend=backend, search=search):
+            calls.append((backend, len(qvecs), k))
+            return search(store, qvecs, k, programs)
+        monkeypatch.setattr(r, name, counted)
+        fused = r.hybrid_batch(queries, 3)
+        if backend == "chroma":
+            # One round-trip at 2k, fused exactly like the full-depth lists
+            assert calls == [("chroma", 4, 6)]
+            assert fused == [retrieve.fusion.fuse([a, b], 3) for a, b in
+                             zip(r.bm25_search_batch(queries, 6), r.vector_search_batch(queries, 6))]
+    flat = [c for c in calls if c[0] == "flat"]
+    assert flat[0] == ("flat", 4, 3) and all(c[2] == 6 and c[1] <= 4 for c in flat[1:]) and len(flat) <= 2
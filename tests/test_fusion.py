@@ -0,0 +1,44 @@
+import copy, json, pathlib
+from rag import fusion, indexer
+from rag.retrieve import Retriever
+
+BASE = pathlib.Path(__file__).resolve().parents[1]
+
+def _hits(ids, key):
+    return [{"id": i, "text": i, key: float(n)} for n, i in enumerate(ids)]
+
+def test_rrf_is_weighted_and_leaves_inputs_alone():
+    a, b = _hits("abcd", "score_bm25"), _hits("dcba", "score_vec")
+    before = copy.deepcopy([a, b])
+    out = fusion.rrf([a, b], 3, weights=(2, 1))
+    assert [h["id"] for h in out] == ["a", "b", "c"]
+    assert "score_bm25" in out[0] and "score_vec" in out[0]
+    assert [a, b] == before
+    assert [h["id"] for h in fusion.normalized([a, b], ("score_bm25", "score_vec"), 2, (1, 3), (True, True))] == ["d", "c"]
+
+def test_settled_only_when_retrievers_agree():
+    a = _hits("abcdef", "score_bm25")
+    assert fusion.settled([a[:3], _hits("bac", "score_vec")], 3, 3)
+    assert not fusion.settled([a[:3], _hits("xyz", "score_vec")], 3, 3)
+    # An exhausted list cannot produce new candidates
+    assert fusion.settled([a[:2], []], 3, 3)
+
+def test_program_filter_is_pushed_down(tmp_path, monkeypatch):
+    norm, idx = tmp_path / "normalized", tmp_path / "index"
+    norm.mkdir()
+    idx.mkdir()
+    for name in ("AI.json", "AI_Product.json"):
+        plan = json.loads((BASE / "data" / "normalized" / name).read_text(encoding="utf-8"))
+        (norm / name).write_text(json.dumps(plan, ensure_ascii=False), encoding="utf-8")
+    monkeypatch.setattr(indexer, "NORM", norm)
+    monkeypatch.setattr(indexer, "IDX", idx)
+    monkeypatch.setattr(indexer, "DB", tmp_path / "plans.sqlite")
+    indexer.build(full=True)
+    r = Retriever(idx_dir=idx, norm_dir=norm)
+    for program in ("AI", "AI Product"):
+        assert {h["program"] for h in r.bm25_search("курс", 5, program)} == {program}
+        assert {h["program"] for h in r.vector_search("курс", 5, program)} == {program}
+        hits = r.hybrid("машинное обучение", 6, program)
+        assert len(hits) == 6 and {h["program"] for h in hits} == {program}
+    queries, programs = ["машинное обучение", "семестр 3"], ["AI", None]
+    assert r.hybrid_batch(queries, 6, programs) == [r.hybrid(q, 6, p) for q, p in zip(queries, programs)]
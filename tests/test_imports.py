@@ -0,0 +1,27 @@
+import json, os, subprocess, sys
+from pathlib import Path
+import pytest
+
+BASE = Path(__file__).resolve().parent.parent
+HEAVY = ["chromadb", "openai", "sentence_transformers", "torch", "camelot", "tabula", "pandas", "pdfplumber"]
+# Seconds an entrypoint may add on top of its web framework's own import
+BUDGET = float(os.getenv("IMPORT_BUDGET_S", "0.6"))
+
+def _import(module: str) -> dict:
+    code = (
+        "import json, sys, time\n"
+        f"t0 = time.perf_counter(); import {module}; took = time.perf_counter() - t0\n"
+        f"print(json.dumps({{'took': took, 'loaded': [m for m in {HEAVY!r} if m in sys.modules]}}))"
+    )
+    env = dict(os.environ, EMBEDDINGS_PROVIDER="mock", TELEGRAM_TOKEN="dummy")
+    out = subprocess.run([sys.executable, "-c", code], cwd=BASE, env=env, capture_output=True, text=True, check=True)
+    return json.loads(out.stdout.splitlines()[-1])
+
+@pytest.mark.parametrize("module,framework", [("api.main", "fastapi"), ("bot.main", "aiogram")])
+def test_entrypoint_import_is_slim(module, framework):
+    pytest.importorskip(framework)
+    # Best of two runs to keep a cold disk cache out of the number
+    runs = [_import(module) for _ in range(2)]
+    base = min(_import(framework)["took"] for _ in range(2))
+    assert runs[0]["loaded"] == []
+    assert min(r["took"] for r in runs) - base < BUDGET
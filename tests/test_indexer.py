@@ -0,0 +1,60 @@
+import json, pathlib
+from rag import indexer
+from rag.answer import answer, COMPARE_QUERY
+from rag.answer_cache import answer_key
+from rag.retrieve import Retriever
+
+BASE = pathlib.Path(__file__).resolve().parents[1]
+
+def test_incremental_build_only_touches_changed_chunks(tmp_path, monkeypatch, capsys):
+    norm, idx = tmp_path / "normalized", tmp_path / "index"
+    norm.mkdir()
+    idx.mkdir()
+    plan = json.loads((BASE / "data" / "normalized" / "AI.json").read_text(encoding="utf-8"))
+    (norm / "AI.json").write_text(json.dumps(plan, ensure_ascii=False), encoding="utf-8")
+    monkeypatch.setattr(indexer, "NORM", norm)
+    monkeypatch.setattr(indexer, "IDX", idx)
+    monkeypatch.setattr(indexer, "DB", tmp_path / "plans.sqlite")
+    indexer.build()
+    assert "Full index build" in capsys.readouterr().out
+    retriever = Retriever(idx_dir=idx, norm_dir=norm)
+    assert answer_key(COMPARE_QUERY, "AI") in retriever.snapshot().answers
+    assert "Цитата: AI" in answer(COMPARE_QUERY, "AI", retriever=retriever)["text"]
+    queries = [COMPARE_QUERY, "какие выборные доступны?", "семестр 3"]
+    assert retriever.hybrid_batch(queries) == [retriever.hybrid(q) for q in queries]
+
+    plan["courses"][0]["ects"] = 3
+    removed = plan["courses"].pop()
+    (norm / "AI.json").write_text(json.dumps(plan, ensure_ascii=False), encoding="utf-8")
+    indexer.build()
+    assert "1 upserted, 1 removed" in capsys.readouterr().out
+
+    chunks, manifest, bm25 = indexer.load_previous()
+    assert len(chunks) == len(plan["courses"]) == bm25.n_docs
+    assert f"AI-{removed['source_ref']}" not in manifest
+    indexer.build()
+    assert "up to date" in capsys.readouterr().out
+
+def test_repeated_source_refs_get_distinct_chunks(tmp_path, monkeypatch, capsys):
+    norm, idx = tmp_path / "normalized", tmp_path / "index"
+    norm.mkdir()
+    idx.mkdir()
+    plan = json.loads((BASE / "data" / "normalized" / "AI.json").read_text(encoding="utf-8"))
+    # Two tables on one page: row numbers, and so source_ref, repeat
+    plan["courses"][1]["source_ref"] = plan["courses"][0]["source_ref"]
+    (norm / "AI.json").write_text(json.dumps(plan, ensure_ascii=False), encoding="utf-8")
+    monkeypatch.setattr(indexer, "NORM", norm)
+    monkeypatch.setattr(indexer, "IDX", idx)
+    monkeypatch.setattr(indexer, "DB", tmp_path / "plans.sqlite")
+    indexer.build()
+    chunks, manifest, bm25 = indexer.load_previous()
+    assert len(chunks) == len(manifest) == len(plan["courses"]) == bm25.n_docs
+    assert len({ch["id"] for ch in Retriever(idx_dir=tmp_path / "none", norm_dir=norm).snapshot().chunks}) == len(chunks)
+
+    plan["courses"][1]["ects"] = 1
+    (norm / "AI.json").write_text(json.dumps(plan, ensure_ascii=False), encoding="utf-8")
+    capsys.readouterr()
+    indexer.build()
+    assert "1 upserted, 0 removed" in capsys.readouterr().out
+    second = next(ch for ch in indexer.load_previous()[0] if ch["id"].endswith("#2"))
+    assert "— 1 ECTS —" in second["text"]
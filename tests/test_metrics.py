@@ -0,0 +1,47 @@
+import asyncio
+import metrics
+from workers import BoundedExecutor
+
+def test_render_prometheus_text():
+    metrics.reset()
+    metrics.inc("answers_total", source="cache")
+    metrics.inc("answers_total", 2, source="cache")
+    metrics.observe("stage_seconds", 0.003, stage="bm25")
+    text = metrics.render()
+    assert 'answers_total{source="cache"} 3' in text
+    assert 'stage_seconds_bucket{stage="bm25",le="0.0025"} 0' in text
+    assert 'stage_seconds_bucket{stage="bm25",le="0.005"} 1' in text
+    assert 'stage_seconds_count{stage="bm25"} 1' in text
+    assert "# TYPE stage_seconds histogram" in text
+
+def test_trace_follows_work_into_executor_threads():
+    def work():
+        with metrics.span("inner"):
+            return 1
+    async def main():
+        with metrics.trace() as spans:
+            await BoundedExecutor(max_workers=1, max_queue=1).run(work)
+        return spans
+    spans = asyncio.run(main())
+    assert [name for name, _ in spans] == ["inner"]
+
+def test_disabled_is_a_no_op(monkeypatch):
+    metrics.reset()
+    monkeypatch.setattr(metrics, "enabled", False)
+    with metrics.trace() as spans:
+        with metrics.span("answer"):
+            metrics.inc("answers_total", source="cache")
+    assert spans == [] and "answers_total" not in metrics.render()
+
+def test_metrics_endpoint_covers_answer_stages():
+    import uuid
+    from fastapi.testclient import TestClient
+    from api.main import app
+    with TestClient(app) as client:
+        # A fresh query so the answer cache cannot short-circuit retrieval
+        client.post("/ask", json={"query": f"какие выборные курсы есть {uuid.uuid4().hex}?", "program": "AI"})
+        text = client.get("/metrics").text
+    for stage in ("answer", "answer.relevance", "hybrid", "bm25", "hybrid.fusion"):
+        assert f'stage_seconds_count{{stage="{stage}"}}' in text
+    assert 'http_requests_total{method="POST",path="/ask",status="200"}' in text
+    assert "index_chunks" in text
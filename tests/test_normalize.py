@@ -0,0 +1,133 @@
+import json, pathlib
+import numpy as np
+import pandas as pd
+from typing import List, Tuple
+from scraper.schema import Course
+from scraper.normalize import normalize_tables
+
+BASE = pathlib.Path(__file__).resolve().parents[1]
+
+# Row-by-row implementation this module replaced; kept as the reference for equivalence.
+def legacy_normalize_tables(tables: List[Tuple[int, 'pandas.DataFrame']]) -> List[Course]:
+    import pandas as pd
+    cols_candidates = [
+        ["code", "name", "semester", "ects", "type", "module"],
+        ["Код", "Дисциплина", "Семестр", "ЗЕТ", "Тип", "Модуль"],
+        ["Наименование", "Сем", "Кредиты", "Тип"],
+    ]
+    courses: List[Course] = []
+
+    def normalize_type(x: str) -> str:
+        x = (x or "").lower()
+        if "выбор" in x:
+            return "elective"
+        return "required"
+
+    for page, df in tables:
+        # Clean header row heuristically
+        df = df.copy()
+        df.columns = [str(c).strip() for c in df.columns]
+        # Try to guess columns
+        name_col = None
+        sem_col = None
+        ects_col = None
+        type_col = None
+        module_col = None
+        code_col = None
+
+        # Heuristic matching
+        for c in df.columns:
+            lc = str(c).lower()
+            if name_col is None and ("наименование" in lc or "дисцип" in lc or "name" in lc):
+                name_col = c
+            if sem_col is None and ("сем" in lc or "semester" in lc):
+                sem_col = c
+            if ects_col is None and ("зет" in lc or "ects" in lc or "кредит" in lc):
+                ects_col = c
+            if type_col is None and ("тип" in lc or "type" in lc):
+                type_col = c
+            if module_col is None and ("модул" in lc or "module" in lc):
+                module_col = c
+            if code_col is None and ("код" in lc or "code" in lc):
+                code_col = c
+
+        # If name/ects/semester not found, try row 0 as header
+        if name_col is None or ects_col is None or sem_col is None:
+            if len(df) > 1:
+                header = [str(x).strip() for x in df.iloc[0].tolist()]
+                df2 = df.iloc[1:].copy()
+                if len(header) == len(df2.columns):
+                    df2.columns = header
+                    df = df2
+                    # retry
+                    name_col = next((c for c in df.columns if str(c).lower().startswith("наим") or "дисцип" in str(c).lower()), None)
+                    sem_col = next((c for c in df.columns if "сем" in str(c).lower()), None)
+                    ects_col = next((c for c in df.columns if "зет" in str(c).lower() or "кредит" in str(c).lower() or "ects" in str(c).lower()), None)
+                    type_col = next((c for c in df.columns if "тип" in str(c).lower()), None)
+                    module_col = next((c for c in df.columns if "модул" in str(c).lower()), None)
+                    code_col = next((c for c in df.columns if "код" in str(c).lower()), None)
+
+        for ridx, row in df.iterrows():
+            name = str(row.get(name_col, "")).strip()
+            if not name or name.lower().startswith("наименование") or len(name) < 3:
+                continue
+            try:
+                semester = int(str(row.get(sem_col, "1")).strip().split()[0])
+            except Exception:
+                semester = 1
+            try:
+                ects = float(str(row.get(ects_col, "0")).replace(",", ".").split()[0])
+            except Exception:
+                ects = 0.0
+            ctype = normalize_type(str(row.get(type_col, "")))
+            module = str(row.get(module_col, "")).strip() or "Unknown"
+            code = str(row.get(code_col, "")).strip() or None
+            source_ref = f"pdf:page={page},row={ridx}"
+
+            course = Course(
+                code=code, name=name, semester=semester, ects=ects,
+                type=ctype, module=module, prerequisites=[], notes=None,
+                source_ref=source_ref
+            )
+            courses.append(course)
+    return courses
+
+
+HEADER = ["Код", "Наименование", "Семестр", "ЗЕТ", "Тип", "Модуль"]
+
+def _plan_tables():
+    tables = []
+    for page, name in enumerate(["AI.json", "AI_Product.json"], start=1):
+        data = json.loads((BASE / "data" / "normalized" / name).read_text(encoding="utf-8"))
+        rows = [[c["source_ref"], c["name"], str(c["semester"]), str(c["ects"]),
+                 "Выборная" if c["type"] == "elective" else "Обязательная", c["module"]] for c in data["courses"]]
+        tables.append((page, pd.DataFrame([HEADER] + rows)))
+        tables.append((page + 10, pd.DataFrame(rows, columns=["code", "name", "semester", "ects", "type", "module"])))
+    return tables
+
+def _messy_tables():
+    rows = [
+        HEADER,
+        ["X1", "Наименование дисциплины", "Семестр", "ЗЕТ", "Тип", "Модуль"],
+        ["X2", "ИИ", "1", "3", "", ""],
+        ["X3", "Статистика", "3 семестр", "6,0 ЗЕТ", "Дисциплина по выбору", " Модуль 2 "],
+        ["", "Оптимизация", "1.0", "nan", None, None],
+        [None, np.nan, "2", "4", "выбор", "M"],
+        ["X5", "  Этика ИИ  ", "", "", "обяз", ""],
+        ["X6", "Практика", "+2", "1e1", "Выборная", "Практика"],
+    ]
+    df = pd.DataFrame(rows)
+    return [(3, df), (4, pd.DataFrame([["a", "b", "c"]])), (5, pd.DataFrame(rows[1:], columns=[" Код", "Дисциплина ", "Сем.", "Кредиты", "Тип", "Модуль"]))]
+
+def _dump(courses):
+    return json.dumps([c.model_dump() for c in courses], ensure_ascii=False, sort_keys=True)
+
+def test_matches_rowwise_normalizer_on_normalized_plans():
+    tables = _plan_tables()
+    new = normalize_tables(tables)
+    assert len(new) == sum(len(df) for page, df in tables if page > 10) * 2
+    assert _dump(new) == _dump(legacy_normalize_tables(tables))
+
+def test_matches_rowwise_normalizer_on_messy_cells():
+    tables = _messy_tables()
+    assert _dump(normalize_tables(tables)) == _dump(legacy_normalize_tables(tables))
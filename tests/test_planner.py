@@ -0,0 +1,64 @@
+import itertools, random, time
+from recommender.planner import UNIT, WORKLOAD_SLACK, build_schedule
+
+def _plan(n, seed, min_electives=12):
+    rnd = random.Random(seed)
+    electives = [{"name": f"e{i}", "semester": 1 + i % 3, "ects": rnd.choice([1.5, 2, 3, 4, 6]), "type": "elective",
+                  "module": "m", "source_ref": f"r{i}"} for i in range(n)]
+    required = [{"name": f"r{s}", "semester": s, "ects": 20, "type": "required", "module": "m", "source_ref": f"q{s}"}
+                for s in (1, 2, 3)]
+    rules = {"min_electives_ects": min_electives, "per_semester_constraints": {"1": {"min": 24, "max": 30}, "2": {"min": 22, "max": 32}}}
+    scores = [rnd.choice([0, 0, 2, 4, 6]) for _ in electives]
+    return {"program": "X", "courses": required + electives, "rules": rules}, electives, scores
+
+def _brute(plan, electives, scores, workload):
+    # Best (relevance, -ECTS) over all subsets that satisfy the capped constraints
+    rules, slack = plan["rules"], WORKLOAD_SLACK[workload]
+    best = None
+    for mask in itertools.product([0, 1], repeat=len(electives)):
+        per_sem = {1: 0.0, 2: 0.0, 3: 0.0}
+        for take, c in zip(mask, electives):
+            per_sem[c["semester"]] += c["ects"] * take
+        ok = sum(per_sem.values()) >= rules["min_electives_ects"]
+        for s, rule in rules["per_semester_constraints"].items():
+            avail = sum(c["ects"] for c in electives if c["semester"] == int(s))
+            lo, hi = rule["min"] - 20, min(rule["max"] - 20, avail)
+            soft = lo + int(slack * (hi - lo) / UNIT) * UNIT
+            ok = ok and lo <= per_sem[int(s)] <= soft
+        if ok:
+            key = (sum(s * t for s, t in zip(scores, mask)), -sum(per_sem.values()))
+            best = key if best is None or key > best else best
+    return best
+
+def test_matches_brute_force():
+    for seed in range(6):
+        plan, electives, scores = _plan(12, seed)
+        for workload in ("low", "high"):
+            res = build_schedule(plan, electives, scores, workload)
+            expected = _brute(plan, electives, scores, workload)
+            if expected is None:
+                continue
+            assert res["feasible"] and not res["warnings"]
+            assert (res["score"], -res["elective_ects"]) == expected
+
+def test_respects_constraints_and_workload():
+    plan, electives, scores = _plan(60, 1, min_electives=6)
+    low = build_schedule(plan, electives, scores, "low")
+    high = build_schedule(plan, electives, scores, "high")
+    assert low["semesters"]["1"]["elective_ects"] == 4 and low["semesters"]["2"]["elective_ects"] == 2
+    assert high["score"] >= low["score"] and high["elective_ects"] >= low["elective_ects"]
+    for res in (low, high):
+        assert res["elective_ects"] >= 6 and not res["warnings"]
+        assert res["semesters"]["1"]["elective_ects"] <= 10 and res["semesters"]["2"]["elective_ects"] <= 12
+
+def test_reports_infeasible_plan():
+    plan, electives, scores = _plan(3, 2, min_electives=100)
+    res = build_schedule(plan, electives, scores, "medium")
+    assert not res["feasible"] and res["warnings"]
+
+def test_hundreds_of_electives_in_milliseconds():
+    plan, electives, scores = _plan(600, 3, min_electives=40)
+    start = time.perf_counter()
+    res = build_schedule(plan, electives, scores, "high")
+    assert time.perf_counter() - start < 0.5
+    assert res["feasible"]
@@ -10,3 +10,14 @@ def test_relevancy_filter():
 def test_answer_contains_source_refs():
     res = answer("какие выборные доступны?")
     assert "Цитата:" in res["text"]
+
+def test_answer_cache_is_scoped_to_index_version():
+    from rag.answer_cache import AnswerCache
+    cache = AnswerCache(max_size=2, ttl=60)
+    cache.put("q", "v1", {"text": "a", "citations": []})
+    assert cache.get("q", "v1")["text"] == "a"
+    assert cache.get("q", "v2") is None
+    assert cache.get("q", "v1") is None
+    for key in ["a", "b", "c"]:
+        cache.put(key, "v1", {"text": key, "citations": []})
+    assert cache.get("a", "v1") is None and cache.stats()["size"] == 2
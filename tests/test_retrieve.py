@@ -0,0 +1,39 @@
+import json, pathlib
+from rag.bm25 import BM25Index
+from rag.retrieve import Retriever
+
+BASE = pathlib.Path(__file__).resolve().parents[1]
+
+def test_retriever_reuses_snapshot(tmp_path):
+    r = Retriever(idx_dir=tmp_path / "index", norm_dir=BASE / "data" / "normalized")
+    snap = r.snapshot()
+    assert snap.version.startswith("fallback-") and snap.chunks
+    assert r.snapshot() is snap
+    assert r.bm25_search("Компьютерное зрение", k=1)[0]["program"] == "AI"
+
+def test_retriever_hot_swaps_on_version_change(tmp_path):
+    idx = tmp_path / "index"
+    idx.mkdir()
+    r = Retriever(idx_dir=idx, norm_dir=tmp_path)
+    assert r.snapshot().chunks == []
+    chunks = [{"id": "X-1", "program": "AI", "text": "Квантовые вычисления", "source_ref": "X-1", "source_url": ""}]
+    snap = idx / "snapshots" / "v1"
+    BM25Index.build(c["text"].split() for c in chunks).save(snap / "bm25")
+    (snap / "chunks.json").write_text(json.dumps(chunks), encoding="utf-8")
+    (idx / "VERSION").write_text("v1", encoding="utf-8")
+    assert r.version == "v1"
+    assert r.bm25_search("Квантовые", k=1)[0]["id"] == "X-1"
+
+def test_fallback_version_follows_plan_files(tmp_path):
+    import os
+    plan = json.loads((BASE / "data" / "normalized" / "AI.json").read_text(encoding="utf-8"))
+    path = tmp_path / "AI.json"
+    path.write_text(json.dumps(plan, ensure_ascii=False), encoding="utf-8")
+    r = Retriever(idx_dir=tmp_path / "index", norm_dir=tmp_path)
+    before, n = r.version, len(r.snapshot().chunks)
+    plan["courses"] = plan["courses"][:1]
+    path.write_text(json.dumps(plan, ensure_ascii=False), encoding="utf-8")
+    st = os.stat(path)
+    os.utime(path, ns=(st.st_atime_ns, st.st_mtime_ns + 10**9))
+    assert before.startswith("fallback-") and r.version != before
+    assert len(r.snapshot().chunks) < n
@@ -1,4 +1,6 @@
-import json, os, pathlib
+import asyncio, hashlib, json, os, pathlib, sys, threading, types
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import pytest
 
 BASE = pathlib.Path(__file__).resolve().parents[1]
 
@@ -12,3 +14,131 @@ def test_total_ects_reasonable():
         data = json.loads((BASE / "data" / "normalized" / name).read_text(encoding="utf-8"))
         total = sum(c["ects"] for c in data["courses"])
         assert total >= 100, f"ECTS too low in {name}: {total}"
+
+FIXTURES = BASE / "tests" / "fixtures"
+
+class _StandIn(BaseHTTPRequestHandler):
+    # Local stand-in for abit.itmo.ru program pages and the plan PDF API
+    routes = {
+        "/program/master/ai": ("text/html; charset=utf-8", FIXTURES / "program_page.html"),
+        "/program/master/ai_product": ("text/html; charset=utf-8", FIXTURES / "program_page.html"),
+        "/programs/10033/plan/abit/pdf": ("application/pdf", FIXTURES / "plan_sample.pdf"),
+    }
+    hits = []
+
+    def do_GET(self):
+        route = self.routes.get(self.path)
+        if route is None:
+            self.send_error(404)
+            return
+        body = route[1].read_bytes()
+        etag = '"%s"' % hashlib.sha256(body).hexdigest()[:16]
+        if self.headers.get("If-None-Match") == etag:
+            type(self).hits.append((self.path, 304))
+            self.send_response(304)
+            self.end_headers()
+            return
+        type(self).hits.append((self.path, 200))
+        self.send_response(200)
+        self.send_header("Content-Type", route[0])
+        self.send_header("Content-Length", str(len(body)))
+        self.send_header("ETag", etag)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+@pytest.fixture
+def standin(tmp_path, monkeypatch):
+    from scraper import main as scraper_main
+    server = ThreadingHTTPServer(("127.0.0.1", 0), _StandIn)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    base = f"http://127.0.0.1:{server.server_address[1]}"
+    for name in ["raw", "normalized"]:
+        (tmp_path / name).mkdir()
+    monkeypatch.setattr(scraper_main, "RAW", tmp_path / "raw")
+    monkeypatch.setattr(scraper_main, "NORM", tmp_path / "normalized")
+    monkeypatch.setattr(scraper_main, "DB", tmp_path / "plans.sqlite")
+    monkeypatch.setattr(scraper_main, "PLAN_API", base)
+    _StandIn.hits = []
+    yield scraper_main, base, tmp_path
+    server.shutdown()
+
+def test_scrape_all_against_local_standin(standin):
+    scraper_main, base, out = standin
+    pages = {"AI": f"{base}/program/master/ai", "AI Product": f"{base}/program/master/ai_product"}
+    plans = asyncio.run(scraper_main.scrape_all(pages=pages, plan_pdfs={}))
+    assert sorted(p.program for p in plans) == ["AI", "AI Product"]
+    assert [c.name for c in plans[0].courses if c.type == "elective"] == [
+        "Компьютерное зрение", "Обработка естественного языка", "Продуктовая аналитика"]
+    for key in pages:
+        assert (out / "raw" / f"{key.replace(' ', '_')}.pdf").read_bytes() == (FIXTURES / "plan_sample.pdf").read_bytes()
+        assert json.loads((out / "normalized" / f"{key.replace(' ', '_')}.json").read_text(encoding="utf-8"))["program"] == key
+    assert _StandIn.hits.count(("/programs/10033/plan/abit/pdf", 200)) == 2
+
+def test_unchanged_plan_is_not_reparsed(standin):
+    scraper_main, base, out = standin
+    pages = {"AI": f"{base}/program/master/ai"}
+    asyncio.run(scraper_main.scrape_all(pages=pages, plan_pdfs={}))
+    out_json = out / "normalized" / "AI.json"
+    before = out_json.stat().st_mtime_ns
+    plans = asyncio.run(scraper_main.scrape_all(pages=pages, plan_pdfs={}))
+    assert [p.program for p in plans] == ["AI"]
+    assert out_json.stat().st_mtime_ns == before
+    assert _StandIn.hits[-1] == ("/programs/10033/plan/abit/pdf", 304)
+
+def test_extract_tables_reports_backend_per_page():
+    from scraper.extract import extract_tables
+    tables, report = extract_tables(FIXTURES / "plan_sample.pdf", max_workers=2)
+    assert [p for p, _ in tables] == [1, 2]
+    assert [r["backend"] for r in report] == ["pdfplumber", "pdfplumber"]
+    assert all(r["seconds"] >= 0 and r["tried"] for r in report)
+
+def test_dedupe_drops_repeated_and_contained_tables():
+    import pandas as pd
+    from scraper.extract import dedupe_tables
+    full = pd.DataFrame([["a", "b", "c"], ["d", "e", "f"], ["g", "h", "i"]])
+    part = pd.DataFrame([["a", "b", "c"], ["d", "e", "f"]])
+    other = pd.DataFrame([["x", "y", "z"], ["u", "v", "w"]])
+    kept = dedupe_tables([full, full.copy(), part, other])
+    assert len(kept) == 2 and kept[0] is full and kept[1] is other
+
+def test_failed_plan_is_reparsed_on_next_run(standin, monkeypatch):
+    scraper_main, base, out = standin
+    pages = {"AI": f"{base}/program/master/ai"}
+    write_plan = scraper_main.write_plan
+    def broken(plan):
+        raise OSError("disk full")
+    monkeypatch.setattr(scraper_main, "write_plan", broken)
+    assert asyncio.run(scraper_main.scrape_all(pages=pages, plan_pdfs={})) == []
+    monkeypatch.setattr(scraper_main, "write_plan", write_plan)
+    plans = asyncio.run(scraper_main.scrape_all(pages=pages, plan_pdfs={}))
+    assert [p.program for p in plans] == ["AI"] and (out / "normalized" / "AI.json").exists()
+    assert _StandIn.hits[-1] == ("/programs/10033/plan/abit/pdf", 200)
+
+def _loaded(module):
+    return module in sys.modules
+
+def test_scrape_all_from_a_threaded_process(standin, monkeypatch):
+    # Forked workers inherit the parent's threads' state (Chroma, ONNX Runtime, executor threads)
+    # and hung mid-parse; workers must start from a fresh interpreter instead
+    from concurrent.futures import ThreadPoolExecutor
+    from scraper.extract import process_pool
+    scraper_main, base, out = standin
+    monkeypatch.setitem(sys.modules, "_parent_only", types.ModuleType("_parent_only"))
+    stop = threading.Event()
+    def churn():
+        while not stop.is_set():
+            json.dumps([str(i) for i in range(200)])
+    busy = ThreadPoolExecutor(4)
+    for _ in range(4):
+        busy.submit(churn)
+    try:
+        with process_pool(1) as pool:
+            assert pool.submit(_loaded, "_parent_only").result(timeout=60) is False
+        plans = asyncio.run(scraper_main.scrape_all(pages={"AI": f"{base}/program/master/ai"}, plan_pdfs={}))
+    finally:
+        stop.set()
+        busy.shutdown()
+    assert [p.program for p in plans] == ["AI"]
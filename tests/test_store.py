@@ -0,0 +1,104 @@
+import json, pathlib, sqlite3
+from scraper.schema import Course, Plan, Rules
+from scraper.store import PlanStore, SCHEMA_VERSION, read_plan
+
+BASE = pathlib.Path(__file__).resolve().parents[1]
+
+def _plan() -> Plan:
+    names = ["Машинное обучение", "Глубокое обучение", "Компьютерное зрение", "Обработка естественного языка"]
+    courses = [
+        Course(code=f"C{i}", name=n, semester=1 + i % 2, ects=3 + i, type="elective" if i % 2 else "required",
+               module="Модуль", source_ref=f"pdf:page=1,row={i}")
+        for i, n in enumerate(names)
+    ]
+    return Plan(program="AI", version="2025-2025", source_url="https://example.org/ai", courses=courses,
+                rules=Rules(total_ects=120, min_electives_ects=12, per_semester_constraints={"1": {"min": 24, "max": 36}}))
+
+def test_roundtrip_matches_json(tmp_path):
+    plan = _plan()
+    store = PlanStore(tmp_path / "plans.sqlite")
+    store.save_plan(plan)
+    loaded = store.load_plan("AI")
+    assert loaded == json.loads(plan.model_dump_json())
+    assert store.programs() == ["AI"]
+    electives = store.courses("AI", type="elective")
+    assert electives and all(c["type"] == "elective" for c in electives)
+    sem = electives[0]["semester"]
+    assert all(c["semester"] == sem for c in store.courses("AI", type="elective", semester=sem))
+    conn = sqlite3.connect(str(tmp_path / "plans.sqlite"))
+    assert conn.execute("PRAGMA journal_mode").fetchone()[0] == "wal"
+    assert conn.execute("PRAGMA user_version").fetchone()[0] == SCHEMA_VERSION
+
+def test_versions_side_by_side_and_activation(tmp_path):
+    store = PlanStore(tmp_path / "plans.sqlite")
+    old = _plan()
+    old_id = store.save_plan(old)
+    assert store.save_plan(old) == old_id  # same content, same version row
+    new = old.model_copy(deep=True)
+    new.courses = new.courses[:-1]
+    rev = store.revision()
+    new_id = store.save_plan(new)
+    assert store.revision() > rev
+    assert [v["active"] for v in store.versions("AI")] == [0, 1]
+    assert len(store.load_plan("AI")["courses"]) == len(old.courses) - 1
+
+    store.activate("AI", old_id)
+    assert len(store.load_plan("AI")["courses"]) == len(old.courses)
+    assert [v["id"] for v in store.versions("AI") if v["active"]] == [old_id]
+    assert new_id != old_id
+
+def test_search_only_sees_active_plans(tmp_path):
+    store = PlanStore(tmp_path / "plans.sqlite")
+    plan = _plan()
+    target = plan.courses[0].name
+    word = next(w for w in target.split() if len(w) > 3)
+    store.save_plan(plan)
+    hits = store.search(word.lower(), program="AI")
+    assert any(c["name"] == target for c in hits)
+    assert store.search(word, program="AI Product") == []
+
+def test_read_plan_falls_back_to_json(tmp_path):
+    plan = read_plan("AI", tmp_path / "missing.sqlite", BASE / "data" / "normalized")
+    assert plan["program"] == "AI" and plan["courses"]
+
+def test_migrates_legacy_flat_table(tmp_path):
+    db = tmp_path / "plans.sqlite"
+    conn = sqlite3.connect(str(db))
+    conn.execute("CREATE TABLE courses(program TEXT, version TEXT, name TEXT, semester INT, ects REAL, type TEXT, module TEXT, source_ref TEXT)")
+    conn.execute("INSERT INTO courses VALUES ('AI','x','n',1,1.0,'required','m','r')")
+    conn.commit()
+    conn.close()
+    store = PlanStore(db)
+    store.save_plan(_plan())
+    assert store.load_plan("AI")["courses"]
+
+def test_keeps_courses_with_the_same_source_ref(tmp_path):
+    # Row numbers restart per table, so two tables on one page repeat source_ref
+    import pandas as pd
+    from scraper.normalize import normalize_tables
+    head = ["Дисциплина", "Семестр", "ЗЕТ", "Тип"]
+    first = pd.DataFrame([["Машинное обучение", "1", "6", "обяз"], ["Глубокое обучение", "2", "6", "обяз"]], columns=head)
+    second = pd.DataFrame([["Компьютерное зрение", "3", "3", "выбор"], ["Робототехника", "3", "3", "выбор"]], columns=head)
+    plan = _plan()
+    plan.courses = normalize_tables([(1, first), (1, second)])
+    assert len({c.source_ref for c in plan.courses}) < len(plan.courses)
+    store = PlanStore(tmp_path / "plans.sqlite")
+    store.save_plan(plan)
+    store.save_plan(plan)
+    assert [c["name"] for c in store.load_plan("AI")["courses"]] == [c.name for c in plan.courses]
+
+def test_migrates_v1_course_keys(tmp_path, monkeypatch):
+    from scraper import store as store_mod
+    db = tmp_path / "plans.sqlite"
+    with monkeypatch.context() as m:
+        m.setattr(store_mod, "SCHEMA", store_mod.SCHEMA.replace("UNIQUE(plan_id, ord)", "UNIQUE(plan_id, source_ref)"))
+        m.setattr(store_mod, "SCHEMA_VERSION", 1)
+        v1 = PlanStore(db)
+        v1.save_plan(_plan())
+        v1.close()
+    store = PlanStore(db)
+    assert store.load_plan("AI") == json.loads(_plan().model_dump_json())
+    assert store.search("машинное", program="AI")
+    conn = sqlite3.connect(str(db))
+    assert conn.execute("PRAGMA user_version").fetchone()[0] == SCHEMA_VERSION
+    assert "UNIQUE(plan_id, ord)" in conn.execute("SELECT sql FROM sqlite_master WHERE name='courses'").fetchone()[0]
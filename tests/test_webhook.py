@@ -0,0 +1,40 @@
+import asyncio
+from aiohttp import ClientSession, web
+from aiogram import Dispatcher
+from aiogram.types import Message
+from bench.bot import FakeTelegram, TOKEN, replay, synthetic_updates
+from bench.run import free_port
+from bot.webhook import PATH, build_app
+
+def test_webhook_replay_answers_every_update():
+    res = asyncio.run(replay("webhook", 24, concurrency=4, timeout=60))
+    assert res["replies"] == 24 and res["calls"]["sendMessage"] == 24
+
+def test_shutdown_drains_inflight_updates():
+    done = []
+    dp = Dispatcher()
+
+    @dp.message()
+    async def slow(m: Message):
+        await asyncio.sleep(0.3)
+        done.append(m.message_id)
+
+    async def main():
+        fake = await FakeTelegram().start()
+        from bot.main import make_bot
+        runner = web.AppRunner(build_app(dp, make_bot(TOKEN, api=fake.url), limit=1, backlog=1))
+        await runner.setup()
+        port = free_port()
+        await web.TCPSite(runner, "127.0.0.1", port).start()
+        async with ClientSession() as client:
+            codes = []
+            for update in synthetic_updates(3):
+                async with client.post(f"http://127.0.0.1:{port}{PATH}", json=update) as r:
+                    codes.append(r.status)
+        await runner.cleanup()
+        await fake.stop()
+        return codes
+    codes = asyncio.run(main())
+    # One running, one waiting, the third is shed; both accepted ones finish before exit
+    assert codes == [200, 200, 503]
+    assert sorted(done) == [1, 2]
@@ -0,0 +1,62 @@
+import asyncio, threading, time
+import pytest
+from workers import BoundedExecutor, Overloaded
+
+def test_blocking_calls_do_not_stall_the_loop():
+    ex = BoundedExecutor(max_workers=2, max_queue=0)
+
+    async def scenario():
+        ticks = 0
+        async def ticker():
+            nonlocal ticks
+            while True:
+                await asyncio.sleep(0.01)
+                ticks += 1
+        t = asyncio.create_task(ticker())
+        results = await asyncio.gather(ex.run(time.sleep, 0.2), ex.run(time.sleep, 0.2))
+        t.cancel()
+        return ticks, results
+
+    ticks, results = asyncio.run(scenario())
+    assert ticks >= 5 and results == [None, None]
+    assert ex.stats()["completed"] == 2
+
+def test_saturated_executor_sheds_non_blocking_calls():
+    ex = BoundedExecutor(max_workers=1, max_queue=1)
+    gate = threading.Event()
+
+    async def scenario():
+        running = [asyncio.create_task(ex.run(gate.wait)) for _ in range(2)]
+        await asyncio.sleep(0.05)
+        assert ex.stats()["running"] == 1 and ex.stats()["queued"] == 1
+        with pytest.raises(Overloaded):
+            await ex.run(gate.wait, block=False)
+        gate.set()
+        await asyncio.gather(*running)
+
+    asyncio.run(scenario())
+    assert ex.stats()["rejected"] == 1
+
+def test_cancelled_waiters_release_their_queue_slot():
+    ex = BoundedExecutor(max_workers=1, max_queue=1)
+    gate = threading.Event()
+
+    async def scenario():
+        running = asyncio.create_task(ex.run(gate.wait))
+        await asyncio.sleep(0.05)
+        try:
+            for _ in range(3):
+                waiting = asyncio.create_task(ex.run(time.sleep, 0))
+                await asyncio.sleep(0.05)
+                assert ex.stats()["queued"] == 1
+                waiting.cancel()
+                with pytest.raises(asyncio.CancelledError):
+                    await waiting
+                assert ex.stats()["queued"] == 0 and not ex.saturated()
+        finally:
+            gate.set()
+        await running
+        assert await ex.run(lambda: 1, block=False) == 1
+
+    asyncio.run(scenario())
+    assert ex.stats()["running"] == 0 and ex.stats()["queued"] == 0
@@ -1,5 +1,6 @@
 import os
 import logging
+import structlog
 from dotenv import load_dotenv
 
 load_dotenv()
@@ -9,5 +10,12 @@ logging.basicConfig(
     format="%(asctime)s %(levelname)s %(name)s - %(message)s"
 )
 
+# structlog events go through the stdlib handlers above as key=value lines
+structlog.configure(
+    processors=[structlog.processors.KeyValueRenderer(key_order=["event"], sort_keys=True)],
+    logger_factory=structlog.stdlib.LoggerFactory(),
+    cache_logger_on_first_use=True,
+)
+
 def env(name: str, default: str = "") -> str:
     return os.getenv(name, default)
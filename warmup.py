@@ -0,0 +1,33 @@
+import logging, time
+from typing import Dict, Sequence, Tuple
+
+log = logging.getLogger("warmup")
+PROGRAMS = ["AI", "AI Product"]
+
+
+def warm(programs: Sequence[str] = PROGRAMS) -> Tuple[Dict[str, float], Dict[str, str]]:
+    """Load the embedding model, the index snapshot, the plan catalog and the comparison.
+
+    Imports stay lazy so that importing the bot or API is cheap; this is the
+    one place that pays for the heavy backends, at startup or in the background.
+    Returns per-step seconds and the errors of failed steps.
+    """
+    from rag import embeddings
+    from rag.retrieve import get_retriever
+    from recommender.catalog import get_catalog
+    from recommender.compare import compare_programs
+    steps = [("embeddings", embeddings.warm), ("retriever", lambda: get_retriever().refresh())]
+    steps += [(f"catalog:{p}", lambda p=p: get_catalog().get(p)) for p in programs]
+    if len(programs) > 1:
+        steps.append(("compare", lambda: compare_programs(programs[0], programs[1])))
+    timings: Dict[str, float] = {}
+    errors: Dict[str, str] = {}
+    for name, step in steps:
+        t0 = time.perf_counter()
+        try:
+            step()
+        except Exception as e:
+            log.exception("warm-up step %s failed", name)
+            errors[name] = repr(e)
+        timings[name] = round(time.perf_counter() - t0, 3)
+    return timings, errors
@@ -0,0 +1,104 @@
+import asyncio, contextvars, threading, weakref
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, Optional, TypeVar
+from utils import env
+
+T = TypeVar("T")
+
+
+class Overloaded(RuntimeError):
+    """Raised when the executor queue is full and the caller asked not to wait."""
+
+
+class BoundedExecutor:
+    """Thread pool for blocking work (retrieval, inference, file reads) with a bounded queue.
+
+    At most ``max_workers`` calls run at once and at most ``max_queue`` more
+    wait for a thread. Callers beyond that either wait for a slot
+    (backpressure) or get ``Overloaded`` immediately with ``block=False``.
+    """
+
+    def __init__(self, max_workers: int = 4, max_queue: int = 64, name: str = "worker"):
+        self.max_workers = max_workers
+        self.max_queue = max_queue
+        self._pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix=name)
+        # One semaphore per event loop: asyncio primitives are loop-bound
+        self._slots: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, asyncio.Semaphore]" = weakref.WeakKeyDictionary()
+        self._lock = threading.Lock()
+        self.queued = 0
+        self.running = 0
+        self.completed = 0
+        self.rejected = 0
+
+    def _semaphore(self) -> asyncio.Semaphore:
+        loop = asyncio.get_running_loop()
+        slots = self._slots.get(loop)
+        if slots is None:
+            slots = self._slots[loop] = asyncio.Semaphore(self.max_workers + self.max_queue)
+        return slots
+
+    def _call(self, job: Dict[str, bool], fn: Callable[..., T], *args, **kwargs) -> T:
+        with self._lock:
+            # A waiter that was cancelled has already taken the job off the queue count
+            if not job["dequeued"]:
+                job["dequeued"] = True
+                self.queued -= 1
+            self.running += 1
+        try:
+            return fn(*args, **kwargs)
+        finally:
+            with self._lock:
+                self.running -= 1
+                self.completed += 1
+
+    async def run(self, fn: Callable[..., T], *args, block: bool = True, **kwargs) -> T:
+        slots = self._semaphore()
+        if not block and slots.locked():
+            self.rejected += 1
+            raise Overloaded(f"{self.running} running, {self.queued} queued")
+        async with slots:
+            job = {"dequeued": False}
+            with self._lock:
+                self.queued += 1
+            loop = asyncio.get_running_loop()
+            # Carry context variables (e.g. the request's metrics trace) into the worker thread
+            ctx = contextvars.copy_context()
+            try:
+                return await loop.run_in_executor(self._pool, lambda: ctx.run(self._call, job, fn, *args, **kwargs))
+            finally:
+                # Cancelled before a thread picked it up: the job never runs, so _call never dequeues it
+                with self._lock:
+                    if not job["dequeued"]:
+                        job["dequeued"] = True
+                        self.queued -= 1
+
+    def saturated(self) -> bool:
+        return self.running + self.queued >= self.max_workers + self.max_queue
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "running": self.running,
+            "queued": self.queued,
+            "completed": self.completed,
+            "rejected": self.rejected,
+            "max_workers": self.max_workers,
+            "max_queue": self.max_queue,
+        }
+
+    def shutdown(self, wait: bool = True) -> None:
+        self._pool.shutdown(wait=wait)
+
+
+_executor: Optional[BoundedExecutor] = None
+
+def get_executor() -> BoundedExecutor:
+    global _executor
+    if _executor is None:
+        _executor = BoundedExecutor(
+            max_workers=int(env("WORKERS", "4")),
+            max_queue=int(env("WORKER_QUEUE", "64")),
+        )
+    return _executor
+
+async def run_blocking(fn: Callable[..., T], *args, block: bool = True, **kwargs) -> T:
+    return await get_executor().run(fn, *args, block=block, **kwargs)